@@ -1,52 +1,270 @@
-from faster_whisper import WhisperModel
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any, List, Literal, Optional
+from typing import TYPE_CHECKING, Dict, Any, Iterator, List, Literal, Optional, Tuple
 import json
+import numpy as np
 from .probe import get_duration_sec
+from .manifest import read_checkpoint, open_checkpoint
+from .export import srt_entry
+from .audio import SAMPLE_RATE, load_pcm, pcm_duration
+from . import metrics
 
-Preset = Literal["auto", "short", "standard", "long"]
+if TYPE_CHECKING:
+    from faster_whisper import BatchedInferencePipeline    # imported lazily at runtime
+
+Preset = Literal["auto", "short", "standard", "long", "adaptive"]
+Choice = Literal["short", "standard", "long", "adaptive"]
 
 # Tweak these thresholds if you like:
 SHORT_MAX_S = 15          # ≤ 15s => "short"
 LONG_MIN_S  = 30 * 60     # ≥ 30 min => "long"
 
+CLIP_GAP_S  = 1.0         # silence between packed clips in a batch (keeps boundaries unambiguous)
+CLIP_MAX_S  = 30.0        # a batched clip is decoded as one Whisper window; longer ones decode on their own
+CHUNK_TARGET_S = 5 * 60   # chunk-parallel decoding: aim for windows about this long
+
+# "adaptive": a greedy segment is re-decoded with beam search when it looks unreliable
+LOGPROB_MIN     = -1.0    # avg_logprob below this...
+COMPRESSION_MAX = 2.4     # ...or compression_ratio above this (repetition loops)
+NO_SPEECH_MAX   = 0.6     # but not when the model thinks it's silence anyway
+
+# auto + throughput target: most accurate first, each step cheaper than the one before
+RTF_LADDER = ("long", "adaptive", "standard")
+
+def preset_for_duration(dur: float | None, preset: Preset) -> Choice:
+    """Resolve "auto" from a known duration (None => "standard"); forced presets pass through."""
+    if preset != "auto":
+        return preset if preset in ("short", "long", "adaptive") else "standard"
+    if dur is None:
+        # fallback: let model detect later; balanced params
+        return "standard"
+    if dur <= SHORT_MAX_S:
+        return "short"
+    if dur >= LONG_MIN_S:
+        return "long"
+    return "standard"
+
+def meet_target(choice: Choice, rtf: Dict[str, float], target: float) -> Choice:
+    """
+    Step a duration-based choice down RTF_LADDER until its recorded real-time factor
+    (decode seconds per audio second) meets `target`. Unmeasured presets are taken as-is.
+    """
+    if target <= 0 or choice not in RTF_LADDER:
+        return choice
+    for p in RTF_LADDER[RTF_LADDER.index(choice):]:
+        if rtf.get(p) is None or rtf[p] <= target:
+            return p
+    return RTF_LADDER[-1]
+
 # Public helper for CLI dry-run (no model load)
 def choose_preset_for(path: Path, preset: Preset) -> tuple[str, float | None]:
     """
     Returns (preset_used, duration_seconds_or_None) without loading the ASR model.
     """
-    if preset != "auto":
-        forced = "short" if preset == "short" else ("long" if preset == "long" else "standard")
-        dur = get_duration_sec(path)
-        return forced, dur
     dur = get_duration_sec(path)
-    if dur is None:
-        return "standard", None
-    if dur <= SHORT_MAX_S:
-        return "short", dur
-    if dur >= LONG_MIN_S:
-        return "long", dur
-    return "standard", dur
+    return preset_for_duration(dur, preset), dur
+
+
+def decode_kwargs(
+    choice: Choice,
+    vad: bool = True,
+    language: Optional[str] = None,
+    long_beam_size: int = 3,
+    long_best_of: int = 3,
+    words: bool = False,
+) -> Dict[str, Any]:
+    """faster-whisper decoding kwargs for a resolved preset."""
+    # Base kwargs common to all
+    kw = dict(
+        vad_filter=vad,
+        word_timestamps=words,
+        temperature=0.0,
+    )
+    if language:
+        kw["language"] = language
+
+    if choice == "short":
+        kw.update(
+            dict(
+                vad_parameters=dict(min_silence_duration_ms=150),
+                beam_size=1,                        # GREEDY
+                best_of=1,
+                condition_on_previous_text=False,
+                no_speech_threshold=0.6,
+                log_prob_threshold=-1.0,
+            )
+        )
+    elif choice == "long":
+        kw.update(
+            dict(
+                vad_parameters=dict(min_silence_duration_ms=400),
+                beam_size=long_beam_size,           # BEAM (tunable)
+                best_of=long_best_of,               # BEAM (tunable)
+                condition_on_previous_text=True,
+                #patience=1.0,   # patience omitted -> use library default (must be > 0 when beam_size > 1)
+            )
+        )
+    else:  # "standard"; "adaptive" is its greedy first pass
+        kw.update(
+            dict(
+                vad_parameters=dict(min_silence_duration_ms=400 if choice == "adaptive" else 250),
+                beam_size=1,                        # GREEDY by default for speed
+                best_of=1,
+                condition_on_previous_text=True,
+            )
+        )
+    return kw
+
+
+def redecode_kwargs(language: Optional[str], long_beam_size: int = 3, long_best_of: int = 3,
+                    words: bool = False) -> Dict[str, Any]:
+    """Second "adaptive" pass over one low-confidence region (clip_timestamps replaces VAD)."""
+    kw = decode_kwargs("long", False, language, long_beam_size, long_best_of, words)
+    kw.pop("vad_parameters")
+    kw["condition_on_previous_text"] = False
+    return kw
+
+
+def seg_dict(s, offset: float = 0.0) -> dict:
+    """faster-whisper Segment -> transcript segment, shifted by `offset`; "words" only if they were decoded."""
+    seg = {"start": s.start + offset, "end": s.end + offset, "text": s.text.strip()}
+    if getattr(s, "words", None):
+        seg["words"] = [[round(w.start + offset, 3), round(w.end + offset, 3), w.word.strip()] for w in s.words]
+    return seg
+
+
+def low_confidence(s) -> bool:
+    """True for a faster-whisper Segment that is worth a beam-search second look."""
+    if s.no_speech_prob > NO_SPEECH_MAX and s.avg_logprob < LOGPROB_MIN:
+        return False            # silence/noise: beam search won't find words there either
+    return s.avg_logprob < LOGPROB_MIN or s.compression_ratio > COMPRESSION_MAX
+
+
+def _mean_logprob(segs) -> float:
+    """Duration-weighted avg_logprob of a run of segments."""
+    total = sum(max(s.end - s.start, 1e-3) for s in segs)
+    return sum(s.avg_logprob * max(s.end - s.start, 1e-3) for s in segs) / total if segs else float("-inf")
+
+
+def plan_windows(speech: List[Tuple[float, float]], total_s: float, target_s: float = CHUNK_TARGET_S) -> List[Tuple[float, float]]:
+    """
+    Split [0, total_s] into contiguous windows of roughly target_s, cutting only in the middle
+    of a silence between two speech spans (so no word is split across windows). A window is
+    closed when the next span would overshoot target_s and it already holds half of it.
+    """
+    windows, w0 = [], 0.0
+    for (_, end), (nxt, nxt_end) in zip(speech, speech[1:]):
+        if nxt > end and nxt_end - w0 > target_s and end - w0 >= target_s / 2:
+            cut = (end + nxt) / 2
+            windows.append((w0, cut))
+            w0 = cut
+    windows.append((w0, total_s))
+    return windows
+
+
+def _norm(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def stitch(parts: List[List[dict]]) -> List[dict]:
+    """
+    Concatenate per-window segments (absolute timestamps) in window order. At each boundary a
+    segment that overlaps the previous one and repeats its text is dropped; other overlaps are
+    clamped so start times never go backwards, matching the sequential decode order.
+    """
+    out: List[dict] = []
+    for part in parts:
+        for seg in part:
+            if out and seg["start"] < out[-1]["end"]:
+                prev = out[-1]
+                a, b = _norm(seg["text"]), _norm(prev["text"])
+                if a and (a in b or b in a):
+                    if len(a.split()) > len(b.split()):     # keep whichever saw the whole phrase
+                        out[-1] = {**seg, "start": prev["start"], "end": max(prev["end"], seg["end"])}
+                    continue
+                seg = {**seg, "start": prev["end"]}
+                if seg["end"] < seg["start"]:
+                    seg["end"] = seg["start"]
+            out.append(seg)
+    return out
+
+
+def speech_windows(audio: np.ndarray, target_s: float = CHUNK_TARGET_S) -> List[Tuple[float, float]]:
+    """Silero VAD over the whole buffer, then plan_windows on the detected speech spans."""
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+    spans = get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=400, speech_pad_ms=100))
+    speech = [(s["start"] / SAMPLE_RATE, s["end"] / SAMPLE_RATE) for s in spans]
+    return plan_windows(speech, pcm_duration(audio), target_s)
+
+
+def transcribe_chunked(
+    asr,                                # ASR or WorkerPool: anything with transcribe_window/detect_language
+    path: Path,
+    parallel: int,
+    audio: Optional[np.ndarray] = None,
+    preset: Preset = "long",
+    target_s: float = CHUNK_TARGET_S,
+    **kw,                               # vad / language / long_beam_size / long_best_of
+) -> Dict[str, Any]:
+    """
+    Chunk-parallel decode of one long file: split at VAD silences, decode up to `parallel`
+    windows at once, stitch back in timeline order. Same result shape as transcribe_path.
+    Without a language hint, it is detected once (on the first window) and every window is
+    decoded in it, as the sequential path does.
+    """
+    if audio is None:
+        audio = load_pcm(path)
+    windows = speech_windows(audio, target_s)
+    choice = preset_for_duration(pcm_duration(audio), preset)
+    if not kw.get("language"):
+        a = int(windows[0][0] * SAMPLE_RATE)
+        kw["language"] = asr.detect_language(audio[a:a + int(CLIP_MAX_S * SAMPLE_RATE)])
+
+    def one(w):
+        a, b = (int(t * SAMPLE_RATE) for t in w)
+        return asr.transcribe_window(audio[a:b], w[0], preset=choice, **kw)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(parallel, len(windows)))) as pool:
+        results = list(pool.map(one, windows))     # map keeps window order
+    return {
+        "language": kw["language"],
+        "duration": pcm_duration(audio),
+        "segments": stitch([r["segments"] for r in results]),
+        "preset_used": choice,
+        "chunks": len(windows),
+    }
 
 
 class ASR:
-    def __init__(self, model_name: str, device: str, compute_type: str):
-        self.model = WhisperModel(model_name, device=device, compute_type=compute_type)
+    def __init__(self, model_name: str, device: str, compute_type: str, device_index: int = 0, cpu_threads: int = 0,
+                 num_workers: int = 1):
+        from faster_whisper import WhisperModel     # ctranslate2/PyAV load only when a model does
+        self._batched = None
+        with metrics.span("model_load", model=model_name, device=f"{device}:{device_index}"):
+            self.model = WhisperModel(
+                model_name,
+                device=device,
+                device_index=device_index,
+                compute_type=compute_type,
+                cpu_threads=cpu_threads,    # 0 -> library default
+                num_workers=num_workers,    # >1 lets threads decode concurrently (chunk-parallel)
+            )
+
+    @property
+    def batched(self) -> "BatchedInferencePipeline":
+        if self._batched is None:
+            from faster_whisper import BatchedInferencePipeline
+            self._batched = BatchedInferencePipeline(model=self.model)
+        return self._batched
 
-    def _choose_preset(self, path: Path, preset: Preset) -> Literal["short","standard","long"]:
+    def _choose_preset(self, path: Path, preset: Preset, audio: Optional[np.ndarray] = None) -> Choice:
         if preset != "auto":
-            return "short" if preset == "short" else ("long" if preset == "long" else "standard")
-        dur = get_duration_sec(path)
-        if dur is None:
-            # fallback: let model detect later; balanced params
-            return "standard"
-        if dur <= SHORT_MAX_S:
-            return "short"
-        if dur >= LONG_MIN_S:
-            return "long"
-        return "standard"
+            return preset_for_duration(None, preset)
+        dur = pcm_duration(audio) if audio is not None else get_duration_sec(path)
+        return preset_for_duration(dur, preset)
 
-    def transcribe_path(
+    def stream_path(
         self,
         path: Path,
         vad: bool = True,
@@ -54,64 +272,164 @@ class ASR:
         language: Optional[str] = None,     # e.g. "en" to skip autodetect
         long_beam_size: int = 3,            # default beam for long files
         long_best_of: int = 3,              # default best_of for long files
+        batch_size: int = 0,                # >0 -> batched VAD chunks for standard/long
+        checkpoint: Optional[Path] = None,  # JSONL; segments are appended as they are decoded
+        audio: Optional[np.ndarray] = None, # 16 kHz mono float32 already decoded from `path`
+        words: bool = False,                # word-level timestamps (segments gain "words")
+    ) -> Tuple[Dict[str, Any], Iterator[dict]]:
+        """
+        Returns (info, segments) where segments is lazy: decoding happens while it is iterated.
+        info = {"language", "duration", "preset_used"}.
+        """
+        choice = self._choose_preset(path, preset, audio)
+        source = audio if audio is not None else str(path)
+
+        kw = decode_kwargs(choice, vad, language, long_beam_size, long_best_of, words)
+        header, done = read_checkpoint(Path(checkpoint) if checkpoint else None)
+        batched = batch_size > 0 and choice != "short"
+        if done and not batched:
+            # pick up right after the last checkpointed segment (VAD is skipped for the remainder)
+            kw["clip_timestamps"] = [done[-1]["end"]]
+            kw["language"] = header.get("language") or language
+        else:
+            done = []
+
+        if batched:
+            # batched pipeline decodes VAD chunks independently, batch_size at a time
+            kw["vad_filter"] = True
+            segments, info = self.batched.transcribe(source, batch_size=batch_size, **kw)
+        else:
+            segments, info = self.model.transcribe(source, **kw)
+        meta = {"language": info.language, "duration": info.duration, "preset_used": choice}
+        if choice == "adaptive":
+            if audio is None:
+                audio = load_pcm(path)      # regions are re-decoded from the buffer
+            beam = redecode_kwargs(info.language, long_beam_size, long_best_of, words)
+            segments = self._adaptive(audio, segments, beam, meta)
+
+        def gen():
+            sink = open_checkpoint(Path(checkpoint), meta, done) if checkpoint else None
+            try:
+                yield from done
+                for s in segments:
+                    seg = seg_dict(s)
+                    if sink:
+                        sink.write(json.dumps(seg, ensure_ascii=False) + "\n")
+                        sink.flush()
+                    yield seg
+            finally:
+                if sink:
+                    sink.close()
+
+        return meta, gen()
+
+    def _adaptive(self, audio: np.ndarray, segments, beam: Dict[str, Any], meta: Dict[str, Any]):
+        """
+        Pass greedy segments through; each run of low-confidence ones is re-decoded with beam
+        search over exactly its time span and replaced if the beam output scores better.
+        Still lazy, so streaming and checkpoints behave as with the other presets.
+        """
+        meta["redecoded_s"] = 0.0
+        run = []
+        for s in segments:
+            if low_confidence(s):
+                run.append(s)
+                continue
+            if run:
+                yield from self._redecode(audio, run, beam, meta)
+                run = []
+            yield s
+        if run:
+            yield from self._redecode(audio, run, beam, meta)
+
+    def _redecode(self, audio: np.ndarray, run: list, beam: Dict[str, Any], meta: Dict[str, Any]):
+        a, b = run[0].start, run[-1].end
+        segs, _ = self.model.transcribe(audio, clip_timestamps=[a, b], **beam)
+        segs = [s for s in segs if s.text.strip()]
+        meta["redecoded_s"] += b - a
+        if segs and _mean_logprob(segs) > _mean_logprob(run):
+            return segs
+        return run
+
+    def transcribe_path(self, path: Path, **kw) -> Dict[str, Any]:
+        """Same options as stream_path, fully decoded: {"language","duration","segments","preset_used"}."""
+        meta, segments = self.stream_path(path, **kw)
+        return {**meta, "segments": list(segments)}
+
+    def detect_language(self, audio: np.ndarray) -> str:
+        """Most likely language of the first 30 s of a PCM buffer."""
+        language, _, _ = self.model.detect_language(audio)
+        return language
+
+    def transcribe_window(
+        self,
+        audio: np.ndarray,
+        offset: float,
+        preset: Choice = "long",
+        vad: bool = True,
+        language: Optional[str] = None,
+        long_beam_size: int = 3,
+        long_best_of: int = 3,
+        words: bool = False,
     ) -> Dict[str, Any]:
+        """Decode one chunk of a longer file; timestamps are shifted by `offset` seconds."""
+        kw = decode_kwargs(preset, vad, language, long_beam_size, long_best_of, words)
+        segments, info = self.model.transcribe(audio, **kw)
+        segs = [seg_dict(s, offset) for s in segments]
+        return {"language": info.language, "segments": segs}
 
-        choice = self._choose_preset(path, preset)
+    def transcribe_clips(
+        self,
+        paths: List[Path | np.ndarray],    # media paths or already-decoded 16 kHz PCM
+        batch_size: int = 16,
+        language: Optional[str] = None,
+        words: bool = False,
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Batched "short" path: packs several clips into one buffer and decodes them as independent
+        batch items. One result per path, timestamps relative to the clip. Each batch item is a
+        single Whisper window, so clips longer than CLIP_MAX_S are not packed; their result is
+        None and the caller decodes them on their own. Without a language hint, each clip's
+        language is detected and clips are packed per language (one batched decode each).
+        """
+        groups: Dict[str, List[tuple[int, np.ndarray]]] = {}
+        for i, p in enumerate(paths):
+            audio = p if isinstance(p, np.ndarray) else load_pcm(p)
+            if len(audio) > CLIP_MAX_S * SAMPLE_RATE:
+                continue
+            lang = language or self.detect_language(audio)
+            groups.setdefault(lang, []).append((i, audio))
+        out: List[Optional[Dict[str, Any]]] = [None] * len(paths)
+        for lang, group in groups.items():
+            self._decode_packed(group, out, batch_size, lang, words)
+        return out
 
-        # Base kwargs common to all
-        kw = dict(
-            vad_filter=vad,
-            word_timestamps=False,
-            temperature=0.0,
+    def _decode_packed(self, group: List[tuple[int, np.ndarray]], out: List[Optional[Dict[str, Any]]],
+                       batch_size: int, language: str, words: bool):
+        """Decode `group`'s (index, clip) pairs in one packed buffer into `out[index]`."""
+        gap = np.zeros(int(CLIP_GAP_S * SAMPLE_RATE), dtype=np.float32)
+        parts, clips, offset = [], [], 0
+        for _, audio in group:
+            n = len(audio)
+            clips.append({"start": offset / SAMPLE_RATE, "end": (offset + n) / SAMPLE_RATE})
+            parts += [audio, gap]
+            offset += n + len(gap)
+        kw = decode_kwargs("short", vad=False, language=language, words=words)
+        kw.pop("vad_parameters", None)
+        segments, info = self.batched.transcribe(
+            np.concatenate(parts), clip_timestamps=clips, batch_size=batch_size, **kw
         )
-        if language:
-            kw["language"] = language
-
-        if choice == "short":
-            kw.update(
-                dict(
-                    vad_parameters=dict(min_silence_duration_ms=150),
-                    beam_size=1,                        # GREEDY
-                    best_of=1,
-                    condition_on_previous_text=False,
-                    no_speech_threshold=0.6,
-                    log_prob_threshold=-1.0,
-                )
-            )
-        elif choice == "long":
-            kw.update(
-                dict(
-                    vad_parameters=dict(min_silence_duration_ms=400),
-                    beam_size=long_beam_size,           # BEAM (tunable)
-                    best_of=long_best_of,               # BEAM (tunable)
-                    condition_on_previous_text=True,
-                    #patience=1.0,   # patience omitted -> use library default (must be > 0 when beam_size > 1)
-                )
-            )
-        else:  # "standard"
-            kw.update(
-                dict(
-                    vad_parameters=dict(min_silence_duration_ms=250),
-                    beam_size=1,                        # GREEDY by default for speed
-                    best_of=1,
-                    condition_on_previous_text=True,
-                )
-            )
-
-        segments, info = self.model.transcribe(str(path), **kw)
-        out = []
+        packed = [i for i, _ in group]
+        starts = [c["start"] for c in clips]
+        for i, c in zip(packed, clips):
+            out[i] = {"language": info.language, "duration": c["end"] - c["start"], "segments": [], "preset_used": "short"}
         for s in segments:
-            out.append({"start": s.start, "end": s.end, "text": s.text.strip()})
-        return {"language": info.language, "duration": info.duration, "segments": out, "preset_used": choice}
+            k = max(0, bisect_right(starts, s.start) - 1)
+            base, res = clips[k]["start"], out[packed[k]]
+            seg = seg_dict(s, -base)
+            seg["start"] = round(max(0.0, seg["start"]), 3)
+            seg["end"] = round(min(res["duration"], seg["end"]), 3)
+            res["segments"].append(seg)
 
 def to_srt(segments: List[dict]) -> str:
-    def fmt(t):
-        h = int(t//3600); m = int((t%3600)//60); s = int(t%60); ms = int((t - int(t))*1000)
-        return f"{h:02}:{m:02}:{s:02},{ms:03}"
-    lines=[]
-    for i,s in enumerate(segments, start=1):
-        lines += [str(i), f"{fmt(s['start'])} --> {fmt(s['end'])}", s['text'], ""]
-    return "\n".join(lines)
-
-def to_jsonl(segments: List[dict]) -> str:
-    return "\n".join(json.dumps(s, ensure_ascii=False) for s in segments)
+    return "".join(srt_entry(i, s) for i, s in enumerate(segments, start=1))
@@ -0,0 +1,96 @@
+"""
+Single-pass audio ingestion: decode any media once to 16 kHz mono float32 PCM.
+
+ffmpeg (when on PATH) streams raw samples through a pipe straight into the buffer; otherwise
+PyAV via faster-whisper's decode_audio does the same in-process. The array is what the model
+consumes, so decoding the container again inside `transcribe` is avoided.
+"""
+import shutil, subprocess, tempfile, threading, wave
+from pathlib import Path
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+_READ = 1 << 20
+
+
+def load_pcm(path: Path, sampling_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode the first audio stream of `path` to mono float32 at `sampling_rate` (video is ignored)."""
+    if shutil.which("ffmpeg") is None:
+        from faster_whisper import decode_audio
+        return decode_audio(str(path), sampling_rate=sampling_rate)
+    cmd = ["ffmpeg", "-nostdin", "-v", "error", "-i", str(path), "-vn", "-map", "0:a:0",
+           "-ac", "1", "-ar", str(sampling_rate), "-f", "f32le", "-"]
+    # stderr goes to a file: a pipe we only read afterwards can fill up and stall ffmpeg (and us)
+    with tempfile.TemporaryFile() as errf:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errf)
+        buf = bytearray()
+        with proc.stdout:
+            while chunk := proc.stdout.read(_READ):
+                buf += chunk
+        if proc.wait() != 0:
+            errf.seek(0)
+            raise RuntimeError(f"ffmpeg failed on {path}: {errf.read().decode(errors='replace').strip()}")
+    return np.frombuffer(buf, dtype=np.float32)
+
+
+class PcmBudget:
+    """
+    Caps how many decoded buffers are held ahead of the model (~64 kB per second of audio
+    each): `load()` waits while `buffers` are out, `release()` returns one once the model has
+    taken it or its file was dropped. `close()` lifts the cap, e.g. when a run aborts and
+    nothing will be released any more.
+    """
+
+    def __init__(self, buffers: int):
+        self._free = max(1, buffers)
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def load(self, path: Path) -> np.ndarray:
+        with self._cond:
+            self._cond.wait_for(lambda: self._free > 0 or self._closed)
+            self._free -= 1
+        try:
+            return load_pcm(path)
+        except BaseException:
+            self.release()
+            raise
+
+    def release(self):
+        with self._cond:
+            self._free += 1
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+def pcm_duration(pcm: np.ndarray, sampling_rate: int = SAMPLE_RATE) -> float:
+    return len(pcm) / sampling_rate
+
+
+def write_audio_copy(pcm: np.ndarray, dest: Path, sampling_rate: int = SAMPLE_RATE) -> Path:
+    """
+    Compact audio-only copy of already-decoded PCM: FLAC via ffmpeg, else 16-bit WAV.
+    Returns the written path (its suffix tells which one).
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if shutil.which("ffmpeg") is not None:
+        dest = dest.with_suffix(".flac")
+        cmd = ["ffmpeg", "-nostdin", "-v", "error", "-y", "-f", "f32le", "-ar", str(sampling_rate),
+               "-ac", "1", "-i", "-", "-c:a", "flac", str(dest)]
+        proc = subprocess.run(cmd, input=memoryview(np.ascontiguousarray(pcm, dtype=np.float32)),
+                              capture_output=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed writing {dest}: {proc.stderr.decode(errors='replace').strip()}")
+        return dest
+    dest = dest.with_suffix(".wav")
+    with wave.open(str(dest), "w") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sampling_rate)
+        wf.writeframes((np.clip(pcm, -1, 1) * 32767).astype("<i2").tobytes())
+    return dest
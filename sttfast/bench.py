@@ -0,0 +1,310 @@
+"""
+Micro-benchmarks behind `sttfast bench`: decode real-time factor per preset, sentiment
+throughput, DB insert rate, exact/fuzzy search latency and index sizes on synthetic data.
+Everything is generated locally; results are plain JSON so runs from different versions can be diffed.
+"""
+import json, math, platform, random, re, statistics, sys, tempfile, time, wave
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from . import __version__
+
+WORDS = ("budget meeting project deadline customer support maybe definitely happy sorry "
+         "frustrated report quarter growth risk plan team schedule review launch issue").split()
+
+
+def synth_wav(path: Path, seconds: float, rate: int = 16000, seed: int = 0) -> Path:
+    """Speech-like test signal: amplitude-modulated harmonics in bursts separated by short silences."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate)) / rate
+    f0 = 120 + 40 * np.sin(2 * np.pi * 0.3 * t)
+    sig = sum(np.sin(2 * np.pi * k * np.cumsum(f0) / rate) / k for k in range(1, 6))
+    bursts = (np.sin(2 * np.pi * 0.25 * t) > -0.3).astype(np.float32)      # ~60% "voiced"
+    sig = 0.3 * sig * bursts * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t)) + 0.01 * rng.standard_normal(len(t))
+    pcm = (np.clip(sig, -1, 1) * 32767).astype("<i2")
+    with wave.open(str(path), "w") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(pcm.tobytes())
+    return path
+
+
+def synth_segments(n: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    out, t = [], 0.0
+    for _ in range(n):
+        dur = rng.uniform(1.5, 8.0)
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 18)))
+        if rng.random() < 0.1:
+            text += "?"
+        out.append({"start": round(t, 2), "end": round(t + dur, 2), "text": text})
+        t += dur
+    return out
+
+
+def synth_words(seg: dict) -> dict:
+    """The segment with evenly spaced word timings, as --words decoding would attach them."""
+    toks = seg["text"].split()
+    step = (seg["end"] - seg["start"]) / len(toks)
+    return {**seg, "words": [[round(seg["start"] + i * step, 2), round(seg["start"] + (i + 0.8) * step, 2), w]
+                             for i, w in enumerate(toks)]}
+
+
+def _pct(xs: list[float], q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(math.ceil(q * len(xs))) - 1)]
+
+
+def bench_decode(model_name: str = "tiny", device: str = "cpu", compute_type: str = "int8",
+                 seconds: float = 20.0, presets=("short", "standard", "long"),
+                 long_beam: int = 3, long_best_of: int = 3, batch_size: int = 0) -> dict[str, Any]:
+    """
+    Real-time factor (decode wall time / audio time) per preset; model load time reported
+    separately. With "standard" among the presets, "standard+words" repeats it with word timestamps.
+    """
+    from .asr import ASR
+    t0 = time.perf_counter()
+    asr = ASR(model_name, device, compute_type)
+    out: dict[str, Any] = {"model_load_s": time.perf_counter() - t0, "audio_s": seconds, "presets": {}}
+    with tempfile.TemporaryDirectory() as d:
+        wav = synth_wav(Path(d) / "bench.wav", seconds)
+        asr.transcribe_path(wav, preset="short", language="en")        # warm-up
+        for p in presets:
+            t0 = time.perf_counter()
+            res = asr.transcribe_path(wav, preset=p, language="en", long_beam_size=long_beam,
+                                      long_best_of=long_best_of, batch_size=batch_size)
+            dt = time.perf_counter() - t0
+            out["presets"][p] = {"seconds": dt, "rtf": dt / seconds, "segments": len(res["segments"])}
+        if "standard" in presets:
+            t0 = time.perf_counter()
+            res = asr.transcribe_path(wav, preset="standard", language="en", words=True)
+            dt = time.perf_counter() - t0
+            out["presets"]["standard+words"] = {"seconds": dt, "rtf": dt / seconds, "segments": len(res["segments"]),
+                                                "vs_segments": dt / out["presets"]["standard"]["seconds"]}
+    return out
+
+
+def baseline_label(text: str) -> dict:
+    """
+    The labelling path before memoization and merged tone patterns, kept as the benchmark's
+    baseline: VADER on every call and one IGNORECASE re.search per tone pattern.
+    """
+    from .sentiment import MAX_TONES, TONE_PATTERNS, _analyzer, _sentiment
+    txt = (text or "").strip()
+    t = txt.lower()
+    tones = [label for label, patterns in TONE_PATTERNS.items()
+             if any(re.search(p, t, flags=re.IGNORECASE) for p in patterns)]
+    return {"sentiment": _sentiment(_analyzer().polarity_scores(txt)["compound"]), "tones": tones[:MAX_TONES]}
+
+
+def bench_sentiment(n: int = 2000, workers: int = 1) -> dict[str, Any]:
+    """
+    The pre-memoization baseline vs. label_text one segment at a time vs. the batched
+    label_texts (memo cleared before each); speedups are relative to the baseline.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from .sentiment import _label, label_text, label_texts
+    texts = [s["text"] for s in synth_segments(n)]
+    baseline_label("warm-up")                      # loads the VADER lexicon outside the timings
+    t0 = time.perf_counter()
+    for t in texts:
+        baseline_label(t)
+    dt_base = time.perf_counter() - t0
+    _label.cache_clear()
+    t0 = time.perf_counter()
+    for t in texts:
+        label_text(t)
+    dt = time.perf_counter() - t0
+    _label.cache_clear()
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            label_texts(texts[:workers], pool=pool, min_parallel=1)    # spawn the workers first
+            t0 = time.perf_counter()
+            label_texts(texts, pool=pool, min_parallel=1)
+            dt_batch = time.perf_counter() - t0
+    else:
+        t0 = time.perf_counter()
+        label_texts(texts)
+        dt_batch = time.perf_counter() - t0
+    return {"segments": n, "workers": workers,
+            "baseline_seconds": dt_base, "baseline_segments_per_s": n / dt_base,
+            "seconds": dt, "segments_per_s": n / dt, "speedup": dt_base / dt,
+            "batch_seconds": dt_batch, "batch_segments_per_s": n / dt_batch, "batch_speedup": dt_base / dt_batch}
+
+
+def bench_insert(rows: int = 20000, per_file: int = 500) -> dict[str, Any]:
+    from .db import open_db, insert_file, insert_segments
+    from .sentiment import label_text
+    segs = [{**s, **label_text(s["text"])} for s in synth_segments(per_file)]
+    with tempfile.TemporaryDirectory() as d:
+        con = open_db(Path(d) / "bench.sqlite")
+        t0 = time.perf_counter()
+        for i in range(max(1, rows // per_file)):
+            fid = insert_file(con, Path(d) / f"{i}.wav", Path(d), segs[-1]["end"], "en")
+            insert_segments(con, fid, segs)
+        dt = time.perf_counter() - t0
+        con.close()
+    n = max(1, rows // per_file) * per_file
+    return {"rows": n, "seconds": dt, "rows_per_s": n / dt}
+
+
+def bench_words(rows: int = 20000, per_file: int = 500) -> dict[str, Any]:
+    """Store size and insert rate of segment-only rows vs. the same rows with packed word timings."""
+    from .db import open_db, insert_file, insert_segments
+    plain = synth_segments(per_file)
+    timed = [synth_words(s) for s in plain]
+    out: dict[str, Any] = {"rows": max(1, rows // per_file) * per_file,
+                           "words_per_segment": sum(len(s["words"]) for s in timed) / len(timed)}
+    with tempfile.TemporaryDirectory() as d:
+        for name, segs in (("segments", plain), ("words", timed)):
+            con = open_db(Path(d) / f"{name}.sqlite")
+            t0 = time.perf_counter()
+            for i in range(max(1, rows // per_file)):
+                fid = insert_file(con, Path(d) / f"{i}.wav", Path(d), segs[-1]["end"], "en")
+                insert_segments(con, fid, segs)
+            dt = time.perf_counter() - t0
+            con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            size = con.execute("PRAGMA page_count").fetchone()[0] * con.execute("PRAGMA page_size").fetchone()[0]
+            con.close()
+            out[name] = {"bytes": size, "rows_per_s": out["rows"] / dt}
+    out["size_ratio"] = out["words"]["bytes"] / out["segments"]["bytes"]
+    out["bytes_per_word"] = (out["words"]["bytes"] - out["segments"]["bytes"]) / (out["rows"] * out["words_per_segment"])
+    return out
+
+
+def bench_search(rows: int = 20000, queries: int = 50, limit: int = 20) -> dict[str, Any]:
+    from .db import open_db, insert_file, insert_segments
+    from .search import search_phrase
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as d:
+        con = open_db(Path(d) / "bench.sqlite")
+        per_file = 500
+        for i in range(max(1, rows // per_file)):
+            fid = insert_file(con, Path(d) / f"{i}.wav", Path(d) / f"run{i % 5}", 3600.0, "en")
+            insert_segments(con, fid, synth_segments(per_file, seed=i))
+        lat = []
+        for _ in range(queries):
+            q = " ".join(rng.sample(WORDS, rng.choice((1, 1, 2))))
+            t0 = time.perf_counter()
+            list(search_phrase(con, q, limit=limit))
+            lat.append((time.perf_counter() - t0) * 1000)
+        con.close()
+    return {"rows": rows, "queries": queries, "p50_ms": statistics.median(lat),
+            "p95_ms": _pct(lat, 0.95), "max_ms": max(lat)}
+
+
+def _names(n: int, seed: int = 7) -> list[str]:
+    """Long-tail pseudo-names: the rare words (people, products, jargon) ASR tends to misspell."""
+    rng = random.Random(seed)
+    return sorted({"".join(rng.choice("abcdefghiklmnoprstuvz") for _ in range(rng.randint(6, 11))) for _ in range(n)})
+
+
+def _typo(word: str, rng: random.Random) -> str:
+    """One slip: substitution, deletion, insertion or transposition (not at the first letter)."""
+    i = rng.randrange(1, len(word) - 1)
+    kind = rng.choice("sdit")
+    if kind == "s":
+        return word[:i] + rng.choice("aeiouy".replace(word[i], "")) + word[i + 1:]
+    if kind == "d":
+        return word[:i] + word[i + 1:]
+    if kind == "i":
+        return word[:i] + rng.choice("aeiou") + word[i:]
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def bench_fuzzy(rows: int = 20000, queries: int = 50, limit: int = 20, per_file: int = 500) -> dict[str, Any]:
+    """
+    Trigram index size next to the word index, and latency of exact, fuzzy (one typo) and
+    prefix queries for rare names; recall is the share of fuzzy queries that find the name.
+    """
+    from .db import open_db, insert_file, insert_segments, deferred_fts
+    from .search import complete, search_fuzzy, search_phrase
+    rng = random.Random(3)
+    names = _names(max(50, rows // 20))
+    with tempfile.TemporaryDirectory() as d:
+        con = open_db(Path(d) / "bench.sqlite")
+        t0 = time.perf_counter()
+        with deferred_fts(con):
+            for i in range(max(1, rows // per_file)):
+                segs = synth_segments(per_file, seed=i)
+                for seg in segs:
+                    if rng.random() < 0.3:
+                        seg["text"] = f"{seg['text']} {rng.choice(names).capitalize()}"
+                fid = insert_file(con, Path(d) / f"{i}.wav", Path(d) / f"run{i % 5}", 3600.0, "en")
+                insert_segments(con, fid, segs, commit=False)
+        build_s = time.perf_counter() - t0
+
+        def size(table: str) -> int:
+            return con.execute(f"SELECT COALESCE(SUM(length(block)), 0) FROM {table}").fetchone()[0]
+
+        def timed(fn) -> tuple[list[float], list]:
+            lat, out = [], []
+            for name in rng.sample(names, min(queries, len(names))):
+                t1 = time.perf_counter()
+                out.append((name, list(fn(name))))
+                lat.append((time.perf_counter() - t1) * 1000)
+            return lat, out
+
+        def stats(lat: list[float]) -> dict[str, float]:
+            return {"p50_ms": statistics.median(lat), "p95_ms": _pct(lat, 0.95), "max_ms": max(lat)}
+
+        exact, _ = timed(lambda name: search_phrase(con, name, limit=limit))
+        fuzzy, hits = timed(lambda name: search_fuzzy(con, _typo(name, rng), limit=limit))
+        prefix, _ = timed(lambda name: search_fuzzy(con, name[:4], limit=limit))
+        complete_lat, _ = timed(lambda name: complete(con, name[:3]))
+        recall = sum(any(name in h["text"].lower() for h in found) for name, found in hits) / len(hits)
+        out = {
+            "rows": rows, "build_s": build_s,
+            "bytes": {"text": con.execute("SELECT SUM(length(CAST(text AS BLOB))) FROM segments").fetchone()[0],
+                      "words_index": size("seg_fts_data"), "trigram_index": size("seg_tri_data")},
+            "exact": stats(exact), "fuzzy": {**stats(fuzzy), "recall": recall},
+            "prefix": stats(prefix), "complete": stats(complete_lat),
+        }
+        con.close()
+    return out
+
+
+def run_all(decode: bool = True, model_name: str = "tiny", compute_type: str = "int8",
+            seconds: float = 20.0, segments: int = 2000, rows: int = 20000, workers: int = 1) -> dict[str, Any]:
+    results: dict[str, Any] = {
+        "meta": {"sttfast": __version__, "python": sys.version.split()[0], "platform": platform.platform(),
+                 "at": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "sentiment": bench_sentiment(segments, workers=workers),
+        "insert": bench_insert(rows),
+        "words": bench_words(rows),
+        "search": bench_search(rows),
+        "fuzzy": bench_fuzzy(rows),
+    }
+    if decode:
+        try:
+            results["decode"] = bench_decode(model_name, "cpu", compute_type, seconds)
+        except Exception as e:      # offline / no model cache
+            results["decode"] = {"skipped": f"{type(e).__name__}: {e}"}
+    return results
+
+
+def flatten(results: dict, prefix: str = "") -> dict[str, float]:
+    out = {}
+    for k, v in results.items():
+        if k == "meta":
+            continue
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(flatten(v, key + "."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = float(v)
+    return out
+
+
+def compare(old: dict, new: dict) -> list[tuple[str, float, float]]:
+    """(metric, old, new) for every numeric metric present in both runs."""
+    a, b = flatten(old), flatten(new)
+    return [(k, a[k], b[k]) for k in sorted(a.keys() & b.keys())]
+
+
+def save(results: dict, fp: Path):
+    fp.parent.mkdir(parents=True, exist_ok=True)
+    fp.write_text(json.dumps(results, indent=2), encoding="utf-8")
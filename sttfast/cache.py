@@ -0,0 +1,86 @@
+"""Content-addressed decode cache: identical media + decode parameters -> stored ASR result."""
+import hashlib, json, sqlite3, threading, time, zlib
+from pathlib import Path
+from typing import Any
+
+SAMPLE_BYTES = 1 << 20      # 1 MiB per sampled window
+
+
+def content_hash(path: Path) -> str:
+    """
+    Fast media fingerprint: size plus the whole file when small, otherwise four 1 MiB
+    windows (start, 1/3, 2/3, end). Renames/copies hash the same; any re-encode differs.
+    """
+    size = path.stat().st_size
+    h = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with path.open("rb") as f:
+        if size <= 4 * SAMPLE_BYTES:
+            for chunk in iter(lambda: f.read(SAMPLE_BYTES), b""):
+                h.update(chunk)
+        else:
+            for off in (0, size // 3, 2 * size // 3, size - SAMPLE_BYTES):
+                f.seek(off)
+                h.update(f.read(SAMPLE_BYTES))
+    return h.hexdigest()
+
+
+def cache_key(media_hash: str, model_name: str, compute_type: str, preset: str, kwargs: dict) -> str:
+    blob = json.dumps(
+        {"media": media_hash, "model": model_name, "compute": compute_type, "preset": preset, "kw": kwargs},
+        sort_keys=True, default=str,
+    )
+    return hashlib.blake2b(blob.encode("utf-8"), digest_size=20).hexdigest()
+
+
+class TranscriptCache:
+    """SQLite-backed, size-bounded LRU of decode results (zlib-compressed JSON)."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS decode_cache(
+      key TEXT PRIMARY KEY,
+      result BLOB,
+      size INTEGER,
+      used REAL
+    );
+    CREATE INDEX IF NOT EXISTS decode_cache_used ON decode_cache(used);
+    """
+
+    def __init__(self, path: Path, max_mb: int):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        self.con = sqlite3.connect(path, check_same_thread=False)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.executescript(self.SCHEMA)
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            row = self.con.execute("SELECT result FROM decode_cache WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.con.execute("UPDATE decode_cache SET used=? WHERE key=?", (time.time(), key))
+            self.con.commit()
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key: str, result: dict[str, Any]):
+        blob = zlib.compress(json.dumps(result, ensure_ascii=False).encode("utf-8"))
+        with self._lock:
+            self.con.execute(
+                "INSERT OR REPLACE INTO decode_cache(key,result,size,used) VALUES (?,?,?,?)",
+                (key, blob, len(blob), time.time()),
+            )
+            self._evict()
+            self.con.commit()
+
+    def _evict(self):
+        total = self.con.execute("SELECT COALESCE(SUM(size),0) FROM decode_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.con.execute("SELECT key, size FROM decode_cache ORDER BY used").fetchall():
+            self.con.execute("DELETE FROM decode_cache WHERE key=?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def close(self):
+        self.con.close()
@@ -1,24 +1,37 @@
 from enum import Enum
-import typer, json
+import itertools, threading, typer, json, time
 from pathlib import Path
 from rich import print
-from typing import Optional
+from rich.markup import escape
+from typing import Callable, Iterable, Optional
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager, nullcontext
 
 from .config import Settings
-from .folders import make_parent, place_media, temp_cache_root, clear_temp_cache
-from .asr import ASR, to_srt, choose_preset_for
-from .db import open_db, insert_file, insert_segments
-from .sentiment import label_text
+from .folders import make_parent, place_media, claim_name, release_name, temp_cache_root, clear_temp_cache
+from .cache import TranscriptCache, cache_key, content_hash
+from .db import open_db, insert_file, insert_segments, deferred_fts, recover_fts, record_rtf, preset_rtf
+from .probe import probe_many
 from .media import open_at as launch_player
-from .export import export_txt, export_json
-from .search import search_phrase
+from .export import TranscriptWriter, write_segments, read_transcript, find_transcripts, transcript_path
+from .search import search_phrase, search_fuzzy, complete, iter_segments, list_files, HL_START, HL_END
+from .pipeline import Stage, run_pipeline
+from . import metrics
+from .manifest import Manifest, MANIFEST_NAME, checkpoint_path, load_result, write_checkpoint
 
 class Mode(str, Enum):
     auto = "auto"
     short = "short"
     standard = "standard"
     long = "long"
+    adaptive = "adaptive"
+
+class ExportFormat(str, Enum):
+    txt = "txt"
+    jsonl = "jsonl"
+    srt = "srt"
+    vtt = "vtt"
+    csv = "csv"
 
 app = typer.Typer(pretty_exceptions_show_locals=False)
 S = Settings()
@@ -36,12 +49,91 @@ def _gather(paths: list[Path]) -> list[Path]:
             out.append(p)
     return out
 
+# asr (faster-whisper, numpy), audio, sentiment (VADER), columnar and workers are imported by
+# the commands that need them, so `find`, `openat` and `--help` don't pay for them.
+
+def _load_asr(num_workers: int = 1):
+    """Warm model from `sttfast serve` if one is running, otherwise load it in-process."""
+    from .asr import ASR
+    from .server import connect
+    if S.use_server:
+        remote = connect(S)
+        if remote is not None:
+            print(f"[dim]Using model server at {remote.url}[/dim]")
+            return remote
+    return ASR(S.model_name, S.device, S.compute_type, num_workers=max(1, num_workers))
+
+def _decode_modes(batch_size: int = 0, chunk_parallel: int = 0) -> dict[str, str]:
+    """The decode path each preset takes under these options; speeds are measured per path."""
+    rest = "batched" if batch_size > 0 else "sequential"
+    return {"short": "batched" if batch_size > 1 else "sequential", "standard": rest, "adaptive": rest,
+            "long": "chunked" if chunk_parallel > 1 else rest}
+
+def _resolver(con, mode: str, modes: Optional[dict[str, str]] = None):
+    """duration -> preset; under `auto` with Settings.target_rtf, measured speeds can step it down."""
+    from .asr import meet_target, preset_for_duration
+    rtf = preset_rtf(con, S.model_name, S.compute_type, S.device, modes) if mode == "auto" and S.target_rtf > 0 else {}
+
+    def resolve(dur):
+        return meet_target(preset_for_duration(dur, mode), rtf, S.target_rtf)
+    return resolve
+
+@contextmanager
+def _instrument(trace: Optional[Path], metrics_port: Optional[int]):
+    """Metrics/trace sinks for one command; without any of them instrumentation stays a no-op."""
+    m = metrics.configure(trace=trace, textfile=S.metrics_textfile, port=metrics_port)
+    if m is not None and m.url:
+        print(f"[dim]Metrics at {m.url}[/dim]")
+    try:
+        yield m
+    finally:
+        metrics.shutdown()
+
+def _store(parent: Path, shard_dir: Optional[Path]) -> Path:
+    """The run's transcript store: the central db_path, or its own shard on farm hosts."""
+    if shard_dir is None:
+        return S.db_path
+    from .shards import shard_path
+    return shard_path(shard_dir, parent)
+
+def _run_arg(run: Optional[str]) -> Optional[str]:
+    """A `--run` value as stored: paths (relative ones too) resolved to the run's parent, bare folder names as given."""
+    if run and (len(Path(run).parts) > 1 or run.startswith((".", "~"))):
+        return str(Path(run).expanduser().resolve())
+    return run
+
+def _open_cache(no_cache: bool) -> TranscriptCache | None:
+    return None if no_cache or not S.cache_enabled else TranscriptCache(S.cache_path, S.cache_max_mb)
+
+def _decode_key(path: Path, choice: str, language, long_beam: int, long_best_of: int, batch_size: int = 0,
+                chunked: bool = False, words: bool = False) -> str:
+    from .asr import decode_kwargs, redecode_kwargs
+    kw = decode_kwargs(choice, S.vad_enabled, language, long_beam, long_best_of, words)
+    kw["batched"] = batch_size > 1 if choice == "short" else batch_size > 0
+    if chunked:
+        kw["chunked"] = True
+    if choice == "adaptive":
+        kw["redecode"] = redecode_kwargs(language, long_beam, long_best_of, words)
+    return cache_key(content_hash(path), S.model_name, S.compute_type, choice, kw)
+
+def _timed(items: Iterable, busy: list[float], clock: Callable[[], float] = time.perf_counter):
+    """
+    Yield from `items`, adding to busy[0] only the time spent producing each one: while the
+    consumer holds an item (e.g. waiting for room downstream) this generator is suspended.
+    """
+    items = iter(items)
+    while True:
+        t = clock()
+        x = next(items, None)
+        busy[0] += clock() - t
+        if x is None:
+            return
+        yield x
+
 def _analyze_segments(segments):
-    out=[]
-    for s in segments:
-        lab = label_text(s["text"])
-        out.append({**s, **lab})
-    return out
+    from .sentiment import label_texts
+    labels = label_texts([s["text"] for s in segments])
+    return [{**s, **lab} for s, lab in zip(segments, labels)]
 
 @app.command(help="Transcribe file(s)/folder(s). Move by default; use --copy to copy instead.")
 def transcribe(
@@ -49,51 +141,471 @@ def transcribe(
     parent_name: str | None = typer.Option(None, help="Custom parent folder name; default is timestamp"),
     copy: bool = typer.Option(False, help="Copy instead of move source files"),
     whisperx: bool = typer.Option(False, help="(future) word-level timestamps with WhisperX"),
-    mode: Mode = typer.Option(Mode.auto, help="Decoding preset per file: auto|short|standard|long"),
+    mode: Mode = typer.Option(Mode.auto, help="Decoding preset per file: auto|short|standard|long|adaptive"),
     language: Optional[str] = typer.Option(None, help="Language hint (e.g., en, fr). Skips autodetect."),
     long_beam: int = typer.Option(3, min=1, max=8, help="Beam size for LONG files (ignored for short/standard)"),
     long_best_of: int = typer.Option(3, min=1, max=8, help="Best-of for LONG files (ignored for short/standard)"),
+    workers: int = typer.Option(1, min=1, help="Model worker processes (one model each)"),
+    devices: Optional[str] = typer.Option(None, help="Comma-separated devices for workers, e.g. cuda:0,cuda:1"),
+    batch_size: int = typer.Option(S.batch_size, min=0, help="Batched decoding: clips/VAD chunks per batch (0 = off)"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Ignore the decode cache and re-decode everything"),
+    audio_only: bool = typer.Option(S.audio_only_copy, help="With --copy, store a compact audio-only copy of videos"),
+    chunk_parallel: int = typer.Option(S.chunk_parallel, min=0, help="Split LONG files at silences and decode this many chunks at once (0/1 = off)"),
+    words: bool = typer.Option(S.word_timestamps, help="Word-level timestamps (slower decode; precise `find --open`)"),
+    shard_dir: Optional[Path] = typer.Option(S.shards_path, help="Index into a per-run shard store in this folder (merge later)"),
+    trace: Optional[Path] = typer.Option(None, help="Append JSON-lines trace events (stage timings, per-file RTF) to this file"),
+    metrics_port: Optional[int] = typer.Option(None, help="Serve Prometheus metrics on this port while running"),
 ):
+    files = _gather(inputs)
+    if not files:
+        print("[yellow]No media files found.[/yellow]")
+        raise typer.Exit(code=1)
 
+    parent = make_parent(S, parent_name)
+    opts = dict(
+        copy=copy, mode=mode.value, language=language, long_beam=long_beam, long_best_of=long_best_of,
+        workers=workers, devices=devices, batch_size=batch_size, no_cache=no_cache, audio_only=audio_only,
+        chunk_parallel=chunk_parallel, words=words, db=str(_store(parent, shard_dir)),
+    )
+    manifest = Manifest.create(parent, opts, files)
+    with _instrument(trace, metrics_port):
+        _run_batch(parent, manifest)
 
+@app.command(help="Resume an interrupted transcribe run from its manifest; finished work is skipped.")
+def resume(
+    run_dir: Path = typer.Argument(..., help="Run folder created by transcribe"),
+    trace: Optional[Path] = typer.Option(None, help="Append JSON-lines trace events to this file"),
+    metrics_port: Optional[int] = typer.Option(None, help="Serve Prometheus metrics on this port while running"),
+):
+    if not (run_dir / MANIFEST_NAME).exists():
+        print(f"[red]No {MANIFEST_NAME} in {run_dir}[/red]")
+        raise typer.Exit(code=2)
+    manifest = Manifest(run_dir)
+    if not manifest.pending():
+        print("[green]Nothing to resume; every file is indexed.[/green]")
+        return
+    with _instrument(trace, metrics_port):
+        _run_batch(run_dir, manifest)
+
+@app.command(help="Watch a folder and transcribe media as it arrives, with the model kept loaded. Ctrl-C stops.")
+def watch(
+    folder: Path = typer.Argument(..., help="Folder to watch (recursively)"),
+    parent_name: str | None = typer.Option(None, help="Run folder name; default is timestamp"),
+    copy: bool = typer.Option(False, help="Copy instead of move arriving files"),
+    mode: Mode = typer.Option(Mode.auto, help="Decoding preset per file: auto|short|standard|long|adaptive"),
+    language: Optional[str] = typer.Option(None, help="Language hint (e.g., en, fr). Skips autodetect."),
+    long_beam: int = typer.Option(3, min=1, max=8, help="Beam size for LONG files"),
+    long_best_of: int = typer.Option(3, min=1, max=8, help="Best-of for LONG files"),
+    workers: int = typer.Option(1, min=1, help="Model worker processes (one model each)"),
+    devices: Optional[str] = typer.Option(None, help="Comma-separated devices for workers, e.g. cuda:0,cuda:1"),
+    batch_size: int = typer.Option(S.batch_size, min=0, help="Batched decoding: clips/VAD chunks per batch (0 = off)"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Ignore the decode cache"),
+    settle: float = typer.Option(2.0, min=0.0, help="Seconds a file's size/mtime must stay unchanged before it is taken"),
+    poll: float = typer.Option(1.0, min=0.05, help="Rescan/settle-check interval in seconds"),
+    existing: bool = typer.Option(True, help="Also transcribe files already in the folder at start"),
+    polling: bool = typer.Option(False, help="Poll even if watchdog (inotify) is installed"),
+    words: bool = typer.Option(S.word_timestamps, help="Word-level timestamps (slower decode; precise `find --open`)"),
+    shard_dir: Optional[Path] = typer.Option(S.shards_path, help="Index into a per-run shard store in this folder (merge later)"),
+    trace: Optional[Path] = typer.Option(None, help="Append JSON-lines trace events to this file"),
+    metrics_port: Optional[int] = typer.Option(None, help="Serve Prometheus metrics on this port while running"),
+):
+    import signal
+    from .watch import DirWatcher
+    if not folder.is_dir():
+        print(f"[red]Not a folder: {folder}[/red]")
+        raise typer.Exit(code=2)
     parent = make_parent(S, parent_name)
+    opts = dict(
+        copy=copy, mode=mode.value, language=language, long_beam=long_beam, long_best_of=long_best_of,
+        workers=workers, devices=devices, batch_size=batch_size, no_cache=no_cache, words=words, watch=str(folder),
+        db=str(_store(parent, shard_dir)),
+    )
+    manifest = Manifest.create(parent, opts, [])
+    probe_con = open_db(Path(opts["db"]))   # the watcher thread's own connection
+    watcher = DirWatcher(
+        folder, MEDIA_EXTS, lambda paths: probe_many(paths, S.probe_workers, probe_con),
+        settle_s=settle, poll_s=poll, ignore=[S.parent_dir], existing=existing, use_events=not polling,
+    )
+
+    def on_interrupt(signum, frame):
+        signal.signal(signal.SIGINT, signal.default_int_handler)   # a second Ctrl-C aborts
+        print("[yellow]Stopping: finishing files already in flight (Ctrl-C again to abort)...[/yellow]")
+        watcher.stop()
+
+    signal.signal(signal.SIGINT, on_interrupt)
+    print(f"[bold]Watching[/bold] {folder} [dim]({'polling' if watcher.polling else 'filesystem events'}; "
+          f"results in {parent})[/dim]")
+    with _instrument(trace, metrics_port):
+        watcher.start()
+        try:
+            _run_batch(parent, manifest, feed=watcher.ready(), stop=watcher.stop)
+        finally:
+            watcher.stop()
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+
+def _run_batch(parent: Path, manifest: Manifest, feed: Optional[Iterable[tuple[Path, dict]]] = None,
+               stop: Optional[Callable[[], None]] = None):
+    """
+    Drive the staged pipeline over every manifest entry that is not indexed yet, then over
+    `feed` ((path, probe metadata) pairs, e.g. from a watcher) until it is exhausted.
+    With a feed, a file that fails is logged, marked failed in the manifest and skipped, and
+    the run goes on; `stop` ends the feed if the run has to abort anyway.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from .asr import ASR, CLIP_MAX_S, transcribe_chunked
+    from .audio import PcmBudget, pcm_duration, write_audio_copy
+    from .sentiment import analyzer_version, label_texts
+    from .workers import WorkerPool, parse_devices, longest_first
+    o = manifest.options
+    copy, mode, language = o["copy"], o["mode"], o["language"]
+    long_beam, long_best_of, batch_size = o["long_beam"], o["long_best_of"], o["batch_size"]
+    audio_only = copy and o.get("audio_only", False)
+    chunk_parallel = o.get("chunk_parallel", 0)
+    words = o.get("words", False)
     mat_dir, tr_dir = parent/"material", parent/"transcripts"
-    asr = ASR(S.model_name, S.device, S.compute_type)
-    con = open_db(S.db_path)
+    con = open_db(Path(o.get("db") or S.db_path), recover=True)
+    dcache = _open_cache(o["no_cache"])
 
-    files = _gather(inputs)
-    if not files:
-        print("[yellow]No media files found.[/yellow]")
-        raise typer.Exit(code=1)
+    items = []
+    for e in manifest.pending():
+        placed = Path(e["placed"]) if e.get("placed") else None
+        if placed is None or not placed.exists():
+            placed = None
+            if not Path(e["src"]).exists():
+                # placed names are not the source's (clip_2.mp3...), so there is nothing safe to guess
+                print(f"[yellow]Skipping (source missing; if it was moved before the manifest recorded it, "
+                      f"it is in {mat_dir}): {e['src']}[/yellow]")
+                continue
+        items.append({"job": e["key"], "src": Path(e["src"]), "placed": placed, "preset": e.get("preset"), "duration": e.get("duration")})
+    if len(items) < len(manifest.files):
+        print(f"[dim]Resuming: {len(items)} of {len(manifest.files)} files still to do[/dim]")
+
+    resolve = _resolver(con, mode, _decode_modes(batch_size, chunk_parallel))
+    # one concurrent, cached probe pass up front (dry-run results are reused from the store)
+    todo = [it for it in items if it["preset"] is None]
+    meta = probe_many([it["placed"] or it["src"] for it in todo], S.probe_workers, con)
+    for it in todo:
+        m = meta[it["placed"] or it["src"]]
+        if m["has_audio"] is False:
+            print(f"[yellow]Skipping (no audio stream): {it['src']}[/yellow]")
+            items.remove(it)
+            continue
+        it["duration"] = m["duration"]
+        it["preset"] = resolve(m["duration"])
 
-    with ThreadPoolExecutor(max_workers=S.max_workers) as pool:
-        for f in files:
-            placed = place_media(f, mat_dir, move=not copy)
-            result = asr.transcribe_path(
-                placed,
+    if o["workers"] > 1 or o["devices"]:
+        dev_list = parse_devices(o["devices"], o["workers"], S.device)
+        asr = WorkerPool(S.model_name, S.compute_type, dev_list)
+        n_decode = asr.size
+        # longest files first gives the shortest makespan
+        items = longest_first(items, lambda it: it["duration"])
+        print(f"[dim]Workers: {', '.join(f'{d}:{i}' for d, i in dev_list)}[/dim]")
+    else:
+        asr = _load_asr(num_workers=chunk_parallel)
+        n_decode = 1
+    # in-process models take the decoded PCM; pools and the server get a path (arrays don't travel well)
+    pcm_in_process = isinstance(asr, ASR)
+    # placement runs ahead of decoding: cap the decoded buffers that can pile up in between
+    pcm = PcmBudget(S.pcm_buffers)
+
+    def take_audio(item):
+        """Pop the item's decoded PCM (None if it has none) and give its slot back."""
+        audio = item.pop("audio", None)
+        if audio is not None:
+            pcm.release()
+        return audio
+
+    def abort():
+        pcm.close()             # place workers waiting for a slot would otherwise never wake up
+        if stop is not None:
+            stop()
+
+    def admit(pairs):
+        # runs on the pipeline's feed thread, so it only pulls a new file when stage 1 has room
+        for src, m in pairs:
+            if m.get("has_audio") is False:
+                print(f"[yellow]Skipping (no audio stream): {src}[/yellow]")
+                continue
+            job = manifest.add(src, arrival=True)
+            yield {"job": job, "src": src, "placed": None, "preset": resolve(m.get("duration")), "duration": m.get("duration")}
+
+    if feed is not None:
+        items = itertools.chain(items, admit(feed))
+
+    spool = ProcessPoolExecutor(max_workers=S.sentiment_processes) if S.sentiment_processes > 1 else nullcontext()
+    with spool:
+        spool = spool if isinstance(spool, ProcessPoolExecutor) else None
+
+        def chunked(item):
+            # partially streamed checkpoints resume sequentially
+            return (chunk_parallel > 1 and item["preset"] == "long" and hasattr(asr, "transcribe_window")
+                    and not item["checkpoint"].exists())
+
+        def place(item):
+            t0 = time.perf_counter()
+            video = item["src"].suffix.lower() in VIDEO_EXTS
+            if item["placed"] is None:
+                if audio_only and video:
+                    # decode once: the PCM feeds the model and the compact copy replaces the video
+                    item["audio"] = pcm.load(item["src"])
+                    dest = claim_name(mat_dir, item["src"].name)
+                    try:
+                        item["placed"] = write_audio_copy(item["audio"], dest)
+                    except BaseException:
+                        release_name(dest)
+                        raise
+                    item["duration"] = pcm_duration(item["audio"])
+                    item["preset"] = resolve(item["duration"])
+                else:
+                    item["placed"] = place_media(item["src"], mat_dir, move=not copy, hardlink=S.hardlink_copies)
+            if video and pcm_in_process and item["duration"] is None and not manifest.has(item["job"], "placed"):
+                # the probe couldn't tell: take the duration (and preset) from the decoded buffer
+                item["audio"] = pcm.load(item["placed"])
+                item["duration"] = pcm_duration(item["audio"])
+                item["preset"] = resolve(item["duration"])
+            item["checkpoint"] = checkpoint_path(tr_dir, item["placed"])
+            if not manifest.has(item["job"], "placed"):
+                manifest.mark(item["job"], "placed", time.perf_counter() - t0, placed=str(item["placed"]),
+                              preset=item["preset"], duration=item["duration"])
+            if manifest.has(item["job"], "decoded") and item["checkpoint"].exists():
+                item["result"] = load_result(item["checkpoint"])
+                item["result"]["resumed"] = True
+                labelled = transcript_path(tr_dir / item["placed"].stem)
+                if manifest.has(item["job"], "analyzed") and labelled.exists():
+                    item["result"]["segments"] = list(read_transcript(labelled))
+                    item["analyzed"] = True
+            elif dcache:
+                item["key"] = _decode_key(item["placed"], item["preset"], language, long_beam, long_best_of, batch_size,
+                                          chunked=chunked(item), words=words)
+                item["result"] = dcache.get(item["key"])
+                if item["result"] is not None:
+                    item["result"]["cached"] = True
+            if item.get("result") is not None or not pcm_in_process:
+                take_audio(item)
+            elif video and "audio" not in item:
+                # one decode per video: duration comes from the buffer, not another container pass
+                item["audio"] = pcm.load(item["placed"])
+            return item
+
+        def decoded(item, seconds, n):
+            res = item["result"]
+            if res.get("resumed"):
+                return
+            if "segments" in res:
+                if not item["checkpoint"].exists() or res.get("cached"):
+                    write_checkpoint(item["checkpoint"], res)
+            elif not item["checkpoint"].exists():
+                res = None          # streamed without a checkpoint: nothing to cache
+            else:
+                # streamed results only exist in full in their checkpoint
+                res = load_result(item["checkpoint"])
+            if dcache and res is not None and not res.get("cached"):
+                dcache.put(item["key"], res)
+            if not item["result"].get("cached"):
+                item["decode_s"] = seconds
+                metrics.observe("decode_seconds", seconds, preset=item["result"].get("preset_used"))
+            manifest.mark(item["job"], "decoded", seconds, segments=n)
+
+        def chunks(item, segs, busy):
+            """
+            Hand segments downstream in stream_chunk-sized pieces; the last piece closes the file.
+            `busy` (seconds spent so far) grows by the time spent inside the decoder only (_timed).
+            """
+            buf, n, timer = [], 0, [busy]
+            for seg in _timed(segs, timer):
+                buf.append(seg)
+                n += 1
+                if len(buf) >= S.stream_chunk:
+                    yield {"item": item, "segs": buf, "last": False}
+                    buf = []
+            decoded(item, timer[0], n)
+            yield {"item": item, "segs": buf, "last": True}
+
+        def decode_one(item):
+            t0 = time.perf_counter()
+            opts = dict(
                 vad=S.vad_enabled,
-                preset=mode.value,
+                preset=item["preset"],
                 language=language,
                 long_beam_size=long_beam,
                 long_best_of=long_best_of,
+                batch_size=batch_size,
+                checkpoint=item["checkpoint"],
+                words=words,
             )
-            print(f"[dim]Preset used: {result.get('preset_used')}[/dim]")
-            segs = result["segments"]
+            if item.get("result") is not None:
+                segs = item["result"]["segments"]
+            elif chunked(item):
+                item["decode_mode"] = "chunked"
+                item["result"] = transcribe_chunked(
+                    asr, item["placed"], chunk_parallel, audio=take_audio(item), preset=item["preset"],
+                    vad=S.vad_enabled, language=language, long_beam_size=long_beam, long_best_of=long_best_of,
+                    words=words,
+                )
+                print(f"[dim]{item['placed'].name}: {item['result']['chunks']} chunks, {chunk_parallel} at a time[/dim]")
+                segs = item["result"]["segments"]
+            elif hasattr(asr, "stream_path"):
+                item["result"], segs = asr.stream_path(item["placed"], audio=take_audio(item), **opts)
+            else:
+                # worker pool / model server return whole transcripts
+                item["result"] = asr.transcribe_path(item["placed"], **opts)
+                segs = item["result"]["segments"]
+            if "decode_mode" not in item:       # stream_path batches VAD chunks of all but `short`
+                batched = batch_size > 0 and item["result"].get("preset_used") != "short"
+                item["decode_mode"] = "batched" if batched else "sequential"
+            yield from chunks(item, segs, time.perf_counter() - t0 + item.pop("batch_s", 0.0))
+
+        def fits_window(it) -> bool:
+            dur = pcm_duration(it["audio"]) if "audio" in it else it.get("duration")
+            return dur is not None and dur <= CLIP_MAX_S
 
-            # Sentiment/tone per segment on CPU in parallel
-            segs = list(pool.map(lambda s: {**s, **label_text(s["text"])}, segs))
+        def decode_batch(batch):
+            # short clips that fit one Whisper window are packed into one batched call; everything
+            # else (including `--mode short` files that are longer) decodes per file
+            short = [it for it in batch if it["preset"] == "short" and it.get("result") is None and fits_window(it)]
+            if short:
+                t0 = time.perf_counter()
+                clips = [it.get("audio", it["placed"]) for it in short]
+                results = asr.transcribe_clips(clips, batch_size=batch_size, language=language, words=words)
+                for it, res in zip(short, results):
+                    if res is None:                 # longer than its probed duration: decode on its own
+                        continue
+                    take_audio(it)
+                    it["result"], it["decode_mode"] = res, "batched"
+                    it["batch_s"] = (time.perf_counter() - t0) / len(short)
+            return [decode_one(it) for it in batch]
 
-            # Save per-file outputs
-            base = tr_dir / placed.stem
-            (base.with_suffix(".srt")).write_text(to_srt(segs), encoding="utf-8")
-            export_json(segs, base.with_suffix(".json"))
-            export_txt(segs, base.with_suffix(".txt"), include_ts=True, include_tone=True)
+        def drop_transcript(item):
+            if "writer" in item:
+                item.pop("writer").close()
+                transcript_path(tr_dir / item["placed"].stem).unlink(missing_ok=True)
 
-            # Index into DB
-            file_id = insert_file(con, placed, parent, result["duration"], result["language"])
-            insert_segments(con, file_id, segs)
+        def post(chunk):
+            item = chunk["item"]
+            if item.get("failed"):
+                drop_transcript(item)
+                return chunk if chunk["last"] else None     # the last one lets `write` clean up
+            if item.get("analyzed"):
+                return chunk
+            if "writer" not in item:
+                result = item["result"]
+                tag = " (cached)" if result.get("cached") else (" (resumed)" if result.get("resumed") else "")
+                print(f"[dim]Preset used: {result.get('preset_used')}{tag}[/dim]")
+                item["writer"] = TranscriptWriter(tr_dir / item["placed"].stem, include_ts=True, include_tone=True,
+                                                  json_array=S.transcript_json)
+                item["post_s"] = 0.0
+            t0 = time.perf_counter()
 
-            print(f"[green]Done:[/green] {placed.name}  ({len(segs)} segments)")
+            # Sentiment/tone for the whole chunk (memoized; process pool for big chunks)
+            labels = label_texts([s["text"] for s in chunk["segs"]], pool=spool)
+            segs = [{**s, **lab} for s, lab in zip(chunk["segs"], labels)]
+            item["writer"].write(segs)
+            chunk["segs"], chunk["analyzer"] = segs, analyzer_version()
+            item["post_s"] += time.perf_counter() - t0
+
+            if chunk["last"]:
+                item["writer"].close()
+                manifest.mark(item["job"], "analyzed", item["post_s"])
+            elif segs and item["result"].get("duration"):
+                pct = 100 * min(1.0, segs[-1]["end"] / item["result"]["duration"])
+                print(f"[dim]{item['placed'].name}: {pct:5.1f}%  ({segs[-1]['end']:.0f}s / {item['result']['duration']:.0f}s)[/dim]")
+            return chunk
+
+        def file_metrics(item, result):
+            preset, dur, dec = result.get("preset_used"), result.get("duration") or 0.0, item.get("decode_s")
+            source = "cache" if result.get("cached") else ("resume" if result.get("resumed") else "decode")
+            metrics.inc("files_total", source=source)
+            metrics.inc("segments_total", item["n_indexed"])
+            metrics.inc("audio_seconds_total", dur, preset=preset)
+            if dec and dur:
+                metrics.gauge("last_rtf", dec / dur, preset=preset)
+                metrics.gauge("last_segments_per_second", item["n_indexed"] / dec, preset=preset)
+            metrics.event("file", file=item["placed"].name, preset=preset, source=source, audio_s=dur,
+                          decode_s=dec, rtf=dec / dur if dec and dur else None, segments=item["n_indexed"],
+                          post_s=item.get("post_s"), write_s=item["write_s"], redecoded_s=result.get("redecoded_s"))
+            metrics.flush()
+
+        def discard(item):
+            # a file that failed part-way leaves neither rows nor a half-indexed file behind
+            con.rollback()
+            if "file_id" in item:
+                con.execute("DELETE FROM segments WHERE file_id=?", (item["file_id"],))
+                con.execute("DELETE FROM files WHERE id=?", (item.pop("file_id"),))
+                con.commit()
+
+        def write(chunk):
+            t0 = time.perf_counter()
+            item = chunk["item"]
+            if item.get("failed"):
+                if chunk["last"]:
+                    discard(item)
+                return
+            if "file_id" not in item:
+                result = item["result"]
+                item["file_id"] = insert_file(con, item["placed"], parent, result["duration"], result["language"])
+                item["n_indexed"], item["write_s"] = 0, 0.0
+            # labels read back from an earlier run's transcript carry no version; `reanalyze` catches them up
+            insert_segments(con, item["file_id"], chunk["segs"], analyzer=chunk.get("analyzer"))
+            item["n_indexed"] += len(chunk["segs"])
+            item["write_s"] += time.perf_counter() - t0
+            if chunk["last"]:
+                result = item["result"]
+                if item.get("decode_s") and result.get("duration"):
+                    record_rtf(con, result["preset_used"], S.model_name, S.compute_type, S.device,
+                               result["duration"], item["decode_s"], mode=item["decode_mode"])
+                    con.commit()
+                manifest.mark(item["job"], "indexed", item["write_s"])
+                item["checkpoint"].unlink(missing_ok=True)
+                if metrics.active() is not None:
+                    file_metrics(item, result)
+                extra = f", re-decoded {result['redecoded_s']:.0f}s" if result.get("redecoded_s") else ""
+                print(f"[green]Done:[/green] {item['placed'].name}  ({item['n_indexed']} segments{extra})")
+
+        def failed(item, e):
+            if not item.get("failed"):
+                item["failed"] = True
+                take_audio(item)
+                print(f"[red]Failed:[/red] {item['src']}: {e!r}")
+                manifest.mark(item["job"], "failed", error=repr(e))
+                metrics.inc("files_failed_total")
+
+        def on_error(stage: str):
+            """Per-file error handler for `stage`; what it returns closes the file downstream."""
+            def handle(x, e):
+                chunk = x if "segs" in x else None
+                item = chunk["item"] if chunk else x
+                failed(item, e)
+                if stage == "post":
+                    drop_transcript(item)
+                if stage == "write":
+                    discard(item)
+                elif stage == "decode" or (chunk and chunk["last"]):
+                    # post closes the transcript, write drops what was indexed so far
+                    return {"item": item, "segs": [], "last": True}
+            return handle if feed is not None else None
+
+        stages = [
+            Stage("place", place, workers=max(1, S.place_workers),      # I/O bound; runs ahead of decode
+                  on_error=on_error("place")),
+            Stage("decode", decode_batch if batch_size > 1 else decode_one, workers=n_decode, batch=max(1, batch_size),
+                  on_error=on_error("decode")),
+            Stage("post", post, on_error=on_error("post")),      # one thread keeps each file's chunks in order
+            Stage("write", write, on_error=on_error("write")),   # single DB writer
+        ]
+        try:
+            _, stats = run_pipeline(items, stages, maxsize=max(S.queue_size, n_decode, batch_size), stop=abort)
+        finally:
+            if isinstance(asr, WorkerPool):
+                asr.close()
+            if dcache:
+                dcache.close()
+
+    print("[bold]Pipeline summary:[/bold]")
+    for st in stats:
+        print(f"[dim]  {st.summary()}[/dim]")
+    if batch_size > 1:
+        dec = stats[1]
+        print(f"[dim]Batched decode: {dec.items} clips at {dec.rate:.2f} clips/s (batch size {batch_size})[/dim]")
 
 @app.command(help="Temporary mode: process a single file; results live in a cache and are overwritten next run.")
 def temporary(
@@ -102,50 +614,128 @@ def temporary(
     language: Optional[str] = typer.Option(None),
     long_beam: int = typer.Option(3, min=1, max=8),
     long_best_of: int = typer.Option(3, min=1, max=8),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Ignore the decode cache and re-decode"),
 ):
-    if not file.exists() or file.suffix.lower() in {".json",".txt",".srt"}:
+    if not file.exists() or file.suffix.lower() in {".json",".jsonl",".txt",".srt",".vtt",".csv"}:
         print("[red]Provide a valid audio/video file.[/red]")
         raise typer.Exit(code=2)
 
+    from .asr import to_srt, choose_preset_for
     clear_temp_cache()
     cache = temp_cache_root()
-    asr = ASR(S.model_name, S.device, S.compute_type)
-    result = asr.transcribe_path(
-        file,
-        vad=S.vad_enabled,
-        preset=mode.value,
-        language=language,
-        long_beam_size=long_beam,
-        long_best_of=long_best_of,
-    )
+    dcache = _open_cache(no_cache)
+    choice, _ = choose_preset_for(file, mode.value)
+    key = _decode_key(file, choice, language, long_beam, long_best_of) if dcache else None
+    result = dcache.get(key) if dcache else None
+    if result is None:
+        asr = _load_asr()
+        result = asr.transcribe_path(
+            file,
+            vad=S.vad_enabled,
+            preset=choice,
+            language=language,
+            long_beam_size=long_beam,
+            long_best_of=long_best_of,
+        )
+        if dcache:
+            dcache.put(key, result)
+    else:
+        print("[dim]Decode cache hit[/dim]")
 
     segs = _analyze_segments(result["segments"])
 
     # Save transient outputs
     (cache / "temp.srt").write_text(to_srt(segs), encoding="utf-8")
-    export_json(segs, cache / "temp.json")
-    export_txt(segs, cache / "temp.txt", include_ts=True, include_tone=True)
+    write_segments(segs, cache / "temp.jsonl", "jsonl")
+    write_segments(segs, cache / "temp.txt", "txt")
 
     print(f"[bold]Temporary transcript ready:[/bold] {cache}  [dim](clears next run)[/dim]")
 
+@app.command(help="Keep the model loaded and serve transcription jobs to other sttfast commands.")
+def serve(
+    host: str = typer.Option(S.server_host, help="Interface to bind; beyond localhost needs STTFAST_SERVER_TOKEN"),
+    port: int = typer.Option(S.server_port, help="Port to listen on"),
+    preload: bool = typer.Option(True, help="Load the configured model before accepting jobs"),
+    with_metrics: bool = typer.Option(False, "--metrics", help="Record metrics and expose them at GET /metrics"),
+    trace: Optional[Path] = typer.Option(None, help="Append JSON-lines trace events to this file"),
+):
+    from .server import serve as run_server
+    print(f"[bold]Model server[/bold] on http://{host}:{port}  [dim]({S.model_name}, {S.device}, {S.compute_type})[/dim]")
+    metrics.configure(trace=trace, textfile=S.metrics_textfile if with_metrics else None, enable=with_metrics)
+    try:
+        run_server(S, host, port, preload=preload)
+    except ValueError as e:
+        print(f"[red]{e}[/red]")
+        raise typer.Exit(code=2)
+    except KeyboardInterrupt:
+        print("[dim]Server stopped.[/dim]")
+    finally:
+        metrics.shutdown()
+
 @app.command(help="Open a media file at a timestamp (seconds). Uses VLC/mpv, falls back to ffplay.")
 def openat(media: Path, t: float):
     launch_player(S.media_player, media, t)
 
 @app.command(help="Full-text search across all transcripts. Use quotes for phrases.")
-def find(query: str):
-    con = open_db(S.db_path)
-    hits = list(search_phrase(con, query))
+def find(
+    query: str,
+    limit: int = typer.Option(20, min=1, help="Hits per page"),
+    page: int = typer.Option(1, min=1, help="Page number"),
+    run: Optional[str] = typer.Option(None, help="Only this run (folder name or path)"),
+    language: Optional[str] = typer.Option(None, help="Only files in this language"),
+    sentiment: Optional[str] = typer.Option(None, help="positive|neutral|negative"),
+    tone: Optional[str] = typer.Option(None, help="Only segments tagged with this tone"),
+    start_min: Optional[float] = typer.Option(None, "--from", help="Segment starts at/after (s)"),
+    start_max: Optional[float] = typer.Option(None, "--to", help="Segment starts at/before (s)"),
+    by_time: bool = typer.Option(False, help="Order by file and time instead of relevance"),
+    open_hit: Optional[int] = typer.Option(None, "--open", min=1, help="Play hit N of this page from the matched word"),
+    fuzzy: bool = typer.Option(False, help="Tolerate misspellings (edit distance) and complete the last word. "
+                               "Ranks a capped set of candidates (2000, or 4x offset+limit, grown until the page "
+                               "is full), so a closer match can be missed on very common words"),
+    max_edits: Optional[int] = typer.Option(None, min=0, help="With --fuzzy: typos allowed per word (default by length)"),
+    shards: Optional[list[Path]] = typer.Option(None, "--shards", help="Search these shard stores (files/folders) in parallel instead"),
+):
+    run = _run_arg(run)
+    filters = dict(limit=limit, offset=(page - 1) * limit, run=run, language=language, sentiment=sentiment,
+                   tone=tone, start_min=start_min, start_max=start_max, order="time" if by_time else "rank")
+    if fuzzy:
+        filters["edits"] = max_edits
+    con = None
+    if shards:
+        from .shards import find_shards, search as fan_out
+        stores = [fp for fp in find_shards(shards) if fp.exists()]
+        try:
+            hits = fan_out(stores, query, fuzzy=fuzzy, workers=S.max_workers, **filters)
+        except ValueError as e:                 # a shard from another release (opened read-only)
+            print(f"[red]{escape(str(e))}[/red]")
+            raise typer.Exit(code=1)
+    else:
+        con = open_db(S.db_path)
+        hits = list(search_fuzzy(con, query, **filters) if fuzzy else search_phrase(con, query, **filters))
+    tail = query.split()[-1].strip('"*()') if query.split() else ""
+    if fuzzy and con is not None and len(tail) >= 2:
+        words = [f"{w} ({n})" for w, n in complete(con, tail, limit=8) if w != tail.lower()]
+        if words:
+            print(f"[dim]Completions for {escape(tail)!r}: {', '.join(words)}[/dim]")
     if not hits:
         print("[yellow]No matches.[/yellow]")
         return
-    for h in hits:
-        print(f"[cyan]{h['file']}[/cyan]  [{h['start']:.2f}s]  {h['text'][:120]}")
+    for i, h in enumerate(hits, start=1):
+        snip = escape(h["snippet"]).replace(HL_START, "[bold yellow]").replace(HL_END, "[/bold yellow]")
+        at = f"{h['start']:.2f}s" if h["seek"] == h["start"] else f"{h['start']:.2f}s → {h['seek']:.2f}s"
+        typos = f" [dim](~{h['distance']})[/dim]" if h.get("distance") else ""
+        print(f"{i:>3}. [cyan]{escape(h['file'])}[/cyan]  \\[{at}]  {snip}{typos}")
+    if len(hits) == limit:
+        print(f"[dim]page {page}; more with --page {page + 1}[/dim]")
+    if open_hit:
+        h = hits[min(open_hit, len(hits)) - 1]
+        print(f"[dim]Opening {escape(h['file'])} at {h['seek']:.2f}s[/dim]")
+        launch_player(S.media_player, Path(h["file"]), h["seek"])
 
 @app.command(help="List each media file, its duration, and the preset that would be used (no transcription).")
 def dry_run(
     inputs: list[Path] = typer.Argument(..., help="File(s) and/or folder(s)"),
-    mode: Mode = typer.Option(Mode.auto, help="auto|short|standard|long (manual override)"),
+    mode: Mode = typer.Option(Mode.auto, help="auto|short|standard|long|adaptive (manual override)"),
 ):
     files = _gather(inputs)
     if not files:
@@ -160,43 +750,282 @@ def dry_run(
         m, s = divmod(r, 60)
         return f"{h:02}:{m:02}:{s:02}"
 
+    con = open_db(S.db_path)
+    meta = probe_many(files, S.probe_workers, con)
+    resolve = _resolver(con, mode.value)
     print("[bold]Dry run (no transcription):[/bold]")
     for f in files:
-        preset_used, dur = choose_preset_for(f, mode.value)
-        print(f"• {f}  |  duration={fmt_dur(dur)}  |  preset={preset_used}")
+        m = meta[f]
+        if m["has_audio"] is False:
+            print(f"• {f}  |  [yellow]no audio stream[/yellow]")
+            continue
+        audio = f"{m['codec']} {m['sample_rate']} Hz x{m['channels']}" if m["codec"] else "unknown"
+        preset_used = resolve(m["duration"])
+        print(f"• {f}  |  duration={fmt_dur(m['duration'])}  |  audio={audio}  |  preset={preset_used}")
+
 
+@app.command(help="Bulk (re)index JSON/JSONL transcripts from run folders or files into the transcript database.")
+def reindex(
+    paths: Optional[list[Path]] = typer.Argument(None, help="Run folder(s) and/or transcript .jsonl/.json file(s)"),
+    rebuild_fts: bool = typer.Option(False, help="Rebuild the whole full-text index instead of adding new rows"),
+    batch_files: int = typer.Option(200, min=1, help="Files per transaction"),
+    recover: bool = typer.Option(False, help="First finish any interrupted bulk load, even one another host left behind"),
+):
+    if recover:
+        with closing(open_db(S.db_path)) as con:
+            done = recover_fts(con, force=True)
+        print("[green]Recovered an interrupted bulk load.[/green]" if done else "[dim]No interrupted bulk load.[/dim]")
+        if not paths:
+            return
+    jsons = []
+    for p in paths or []:
+        if p.is_dir():
+            jsons += find_transcripts(p)
+        elif p.suffix.lower() in {".json", ".jsonl"}:
+            jsons.append(p)
+    if not jsons:
+        print("[yellow]No JSON transcripts found.[/yellow]")
+        raise typer.Exit(code=1)
+
+    con = open_db(S.db_path, recover=True)
+    t0, n_rows = time.perf_counter(), 0
+    runs = [fp.parent.parent if fp.parent.name == "transcripts" else fp.parent for fp in jsons]
+    medias = [next((m for m in sorted((run_dir / "material").glob(fp.stem + ".*"))
+                    if m.suffix.lower() in MEDIA_EXTS), None) for fp, run_dir in zip(jsons, runs)]
+    for fp, media in zip(jsons, medias):
+        if media is None:
+            # hits must point at something `find --open` can play; the transcript is not it
+            print(f"[yellow]Skipping (media missing from material/): {fp}[/yellow]")
+    todo = [(fp, run_dir, media) for fp, run_dir, media in zip(jsons, runs, medias) if media]
+    meta = probe_many([media for _, _, media in todo], S.probe_workers, con)
+    with deferred_fts(con, rebuild=rebuild_fts):
+        for i, (fp, run_dir, media) in enumerate(todo, start=1):
+            segs = list(read_transcript(fp))
+            duration = meta[media]["duration"]
+            if duration is None and segs:
+                duration = max(s["end"] for s in segs)
+            # transcripts don't record the language unless their rows carry it; None keeps the stored one
+            language = next((s["language"] for s in segs if s.get("language")), None)
+            file_id = insert_file(con, media, run_dir, duration, language)
+            insert_segments(con, file_id, segs, commit=False)
+            n_rows += len(segs)
+            if i % batch_files == 0:
+                con.commit()
+    dt = time.perf_counter() - t0
+    print(f"[green]Indexed[/green] {len(todo)} files, {n_rows} segments in {dt:.2f}s "
+          f"[dim]({n_rows / dt if dt else 0:.0f} rows/s)[/dim]")
+
+@app.command(help="Merge shard stores (one per host/run) into the central transcript database.")
+def merge(
+    shards: list[Path] = typer.Argument(..., help="Shard .sqlite file(s) and/or folder(s) of them"),
+    into: Optional[Path] = typer.Option(None, help="Target store (default: Settings.db_path)"),
+    delete: bool = typer.Option(False, help="Delete each shard once it has been merged"),
+):
+    from .shards import find_shards, merge as merge_shard, remove
+    target = into or S.db_path
+    stores = [fp for fp in find_shards(shards) if fp.exists() and fp.resolve() != target.resolve()]
+    if not stores:
+        print("[yellow]No shard stores found.[/yellow]")
+        raise typer.Exit(code=1)
+    con = open_db(target, recover=True)
+    t0, n_files, n_rows = time.perf_counter(), 0, 0
+    for fp in stores:
+        files, rows = merge_shard(con, fp)
+        n_files, n_rows = n_files + files, n_rows + rows
+        print(f"[dim]{fp.name}: {files} files, {rows} segments[/dim]")
+        if delete:
+            remove(fp)
+    dt = time.perf_counter() - t0
+    print(f"[green]Merged[/green] {len(stores)} shards ({n_files} files, {n_rows} segments) into {target} "
+          f"in {dt:.2f}s [dim]({n_rows / dt if dt else 0:.0f} rows/s)[/dim]")
 
-@app.command(help="Export JSON transcripts to a TXT file (merged or separate) with toggle flags.")
+@app.command(help="Recompute sentiment/tones in the database (no re-decoding); only rows from another analyzer version.")
+def reanalyze(
+    run: Optional[str] = typer.Option(None, help="Only this run (folder name or path)"),
+    force: bool = typer.Option(False, help="Relabel every row, whatever version labelled it"),
+    chunk: int = typer.Option(20000, min=1, help="Rows per read/UPDATE batch (and per transaction)"),
+    processes: Optional[int] = typer.Option(None, min=1, help="Labelling processes (default: Settings.sentiment_processes)"),
+):
+    from concurrent.futures import ProcessPoolExecutor
+    from . import columnar
+    from .reanalyze import reanalyze as relabel
+    from .sentiment import analyzer_version
+    n = processes or S.sentiment_processes
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=n) if n > 1 else nullcontext() as pool:
+        out = relabel(S.db_path, run=_run_arg(run), force=force, chunk=chunk, pool=pool)
+    dt = time.perf_counter() - t0
+    for r in out["runs"]:          # their columnar snapshots no longer match
+        columnar.snapshot_path(S.columns_path, r).unlink(missing_ok=True)
+    print(f"[green]Relabelled[/green] {out['changed']} of {out['scanned']} segments "
+          f"({out['unchanged']} unchanged) in {dt:.2f}s [dim]({out['scanned'] / dt if dt else 0:.0f} rows/s, "
+          f"analyzer {analyzer_version()})[/dim]")
+
+@app.command(help="Sentiment per run, speaking time per language and tone frequency over time (columnar snapshots).")
+def stats(
+    runs: Optional[list[str]] = typer.Argument(None, help="Run folder name(s) or path(s); default: all indexed runs"),
+    bin_s: float = typer.Option(300.0, "--bin", min=1, help="Seconds per bin for tone frequency over time"),
+    rebuild: bool = typer.Option(False, help="Rebuild snapshots even when they are current"),
+    out: Optional[Path] = typer.Option(None, help="Also write the aggregates as JSON"),
+):
+    from . import columnar
+    con = open_db(S.db_path)
+    t0 = time.perf_counter()
+    paths, built = columnar.refresh(con, S.columns_path, [_run_arg(r) for r in runs or ()], force=rebuild)
+    if not paths:
+        print("[yellow]No indexed runs.[/yellow]")
+        raise typer.Exit(code=1)
+    t1 = time.perf_counter()
+    cols = columnar.load(paths)
+    by_run = columnar.sentiment_by_run(cols)
+    by_lang = columnar.speech_by_language(cols)
+    edges, tones = columnar.tones_over_time(cols, bin_s)
+    t2 = time.perf_counter()
+
+    print(f"[bold]{len(cols['start'])} segments, {int(cols['n_files'])} files, {len(paths)} runs[/bold]  "
+          f"[dim](snapshots {t1 - t0:.2f}s, {built} rebuilt; aggregates {1000 * (t2 - t1):.1f} ms)[/dim]")
+    print("[bold]Sentiment by run[/bold]")
+    for run, counts in by_run.items():
+        total = sum(counts.values()) or 1
+        shares = "  ".join(f"{k} {100 * v / total:5.1f}%" for k, v in sorted(counts.items()))
+        print(f"  {escape(Path(run).name):<32} {shares}")
+    print("[bold]Speaking time by language[/bold]")
+    for lang, secs in sorted(by_lang.items(), key=lambda kv: -kv[1]):
+        print(f"  {lang:<10} {secs / 3600:8.2f} h")
+    if tones:
+        print(f"[bold]Tones per {bin_s:g}s bin[/bold] (from the start of each recording)")
+        print("  " + f"{'start':>8} " + " ".join(f"{t:>10}" for t in tones))
+        for i, edge in enumerate(edges):
+            print("  " + f"{edge:8.0f} " + " ".join(f"{int(c[i]):>10}" for c in tones.values()))
+    if out:
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps({
+            "sentiment_by_run": by_run, "speech_s_by_language": by_lang, "bin_s": bin_s,
+            "tones_over_time": {t: c.tolist() for t, c in tones.items()},
+        }, indent=2), encoding="utf-8")
+        print(f"[green]Saved ->[/green] {out}")
+
+@app.command(help="Benchmark decode presets, sentiment, DB inserts and search on synthetic data (CPU).")
+def bench(
+    out: Optional[Path] = typer.Option(None, help="Write results as JSON"),
+    compare_to: Optional[Path] = typer.Option(None, "--compare", help="Previous results JSON to diff against"),
+    decode: bool = typer.Option(True, help="Include ASR decoding (downloads the model on first use)"),
+    model: str = typer.Option("tiny", help="Model for the decode benchmark"),
+    compute_type: str = typer.Option("int8", help="CPU compute type for the decode benchmark"),
+    seconds: float = typer.Option(20.0, help="Length of the synthetic audio (s)"),
+    segments: int = typer.Option(2000, help="Segments for the sentiment benchmark"),
+    rows: int = typer.Option(20000, help="Rows for the insert/search benchmarks"),
+    workers: int = typer.Option(1, min=1, help="Processes for the batched sentiment benchmark"),
+):
+    from . import bench as B
+    results = B.run_all(decode=decode, model_name=model, compute_type=compute_type,
+                        seconds=seconds, segments=segments, rows=rows, workers=workers)
+    for k, v in B.flatten(results).items():
+        print(f"  {k:<40} {v:12.4f}")
+    if "skipped" in results.get("decode", {}):
+        print(f"[yellow]Decode skipped:[/yellow] {results['decode']['skipped']}")
+    if out:
+        B.save(results, out)
+        print(f"[green]Saved ->[/green] {out}")
+    if compare_to:
+        old = json.loads(compare_to.read_text(encoding="utf-8"))
+        print(f"[bold]vs {compare_to}:[/bold]")
+        for k, a, b in B.compare(old, results):
+            ratio = f"{b / a:6.2f}x" if a else "   n/a"
+            print(f"  {k:<40} {a:12.4f} -> {b:12.4f}  {ratio}")
+
+def _unique_name(name: str, seen: dict) -> str:
+    n = seen[name] = seen.get(name, 0) + 1
+    return name if n == 1 else f"{name}_{n}"
+
+@app.command(help="Export transcripts to TXT/JSONL/SRT/VTT/CSV, streamed from the database (or transcript files).")
 def export(
-    paths: list[Path],
-    out: Path,
-    merged: bool = typer.Option(False, help="Merge into one file"),
-    no_ts: bool = typer.Option(False, help="Exclude timestamps"),
-    no_tone: bool = typer.Option(False, help="Exclude sentiment/tones"),
+    sources: Optional[list[Path]] = typer.Argument(None, help="Run folder(s) and/or transcript .jsonl/.json file(s)"),
+    out: Optional[Path] = typer.Option(None, "--out", "-o", help="Output file (merged) or folder (--per-file)"),
+    fmt: ExportFormat = typer.Option(ExportFormat.txt, "--format", help="Output format"),
+    run: Optional[str] = typer.Option(None, help="Indexed run to export (folder name or path)"),
+    query: Optional[str] = typer.Option(None, help="Only segments matching this full-text query (indexed runs)"),
+    merged: bool = typer.Option(True, "--merged/--per-file", help="One file, or one file per transcript"),
+    jobs: int = typer.Option(1, min=1, help="Per-file exports written in parallel"),
+    no_ts: bool = typer.Option(False, "--no-timestamps", "--no-ts", help="Exclude timestamps (TXT/JSONL/CSV)"),
+    no_tone: bool = typer.Option(False, "--no-tones", "--no-tone", help="Exclude sentiment/tones"),
 ):
-    import json
-    include_ts = not no_ts
-    include_tone = not no_tone
-    seglists=[]
-    for p in paths:
-        if p.suffix.lower() != ".json":
-            print(f"[yellow]Skipping non-JSON: {p}[/yellow]")
-            continue
-        seglists.append(json.loads(p.read_text(encoding="utf-8")))
-    if not seglists:
-        print("[yellow]No valid JSON transcripts provided.[/yellow]")
-        return
+    fmt = fmt.value
+    include_ts, include_tone = not no_ts, not no_tone
+    con = open_db(S.db_path)
+    runs = [_run_arg(run)] if run else []
+    files: list[Path] = []
+    for p in sources or []:
+        if p.is_dir():
+            # indexed runs stream from the database; folders that were never indexed are read from disk
+            key = str(p.resolve())
+            if con.execute("SELECT 1 FROM files WHERE parent IN (?, ?) LIMIT 1", (key, str(p))).fetchone():
+                runs.append(key)
+            else:
+                files += find_transcripts(p)
+        elif p.suffix.lower() in {".json", ".jsonl"}:
+            files.append(p)
+        else:
+            print(f"[yellow]Skipping non-transcript: {p}[/yellow]")
+    if files and query:
+        print("[yellow]--query only filters indexed runs; transcript files are exported whole.[/yellow]")
+    if not (sources or run or query):
+        print("[red]Give run folder(s), transcript file(s), --run or --query.[/red]")
+        raise typer.Exit(code=2)
 
-    from itertools import chain
-    out.parent.mkdir(parents=True, exist_ok=True)
+    # one (name, segment stream) per transcript; streams open their own cursor/file lazily
+    db_files = [fid_path for r in (runs or [None]) for fid_path in list_files(con, r, query)] \
+        if runs or (query and not sources) else []
+    if not db_files and not files:
+        print("[yellow]No transcripts to export.[/yellow]")
+        raise typer.Exit(code=1)
+
+    base = sources[0] if sources and len(sources) == 1 and sources[0].is_dir() else Path.cwd()
+    ext = "." + fmt
     if merged:
-        export_txt(list(chain.from_iterable(seglists)), out, include_ts, include_tone)
-        print(f"[green]Exported merged ->[/green] {out}")
-    else:
-        for i, segs in enumerate(seglists, start=1):
-            fp = out.with_name(out.stem + f"_{i}" + out.suffix)
-            export_txt(segs, fp, include_ts, include_tone)
-            print(f"[green]Exported ->[/green] {fp}")
+        out = out or base / f"export{ext}"
+
+        def rows():
+            if db_files:
+                for r in (runs or [None]):
+                    yield from iter_segments(con, r, query=query)
+            for fp in files:
+                for s in read_transcript(fp):
+                    yield {"file": fp.stem, **s}
+
+        t0 = time.perf_counter()
+        n = write_segments(rows(), out, fmt, include_ts, include_tone)
+        print(f"[green]Exported merged ->[/green] {out}  [dim]({n} segments in {time.perf_counter() - t0:.2f}s)[/dim]")
+        return
+
+    out = out or base / "export"
+    seen: dict = {}
+    tasks = [("db", fid, out / (_unique_name(Path(path).stem, seen) + ext)) for fid, path in db_files]
+    tasks += [("file", fp, out / (_unique_name(fp.stem, seen) + ext)) for fp in files]
+    local = threading.local()
+    cons = []                                   # one per worker thread; closed once the pool is done
+
+    def export_one(task) -> tuple[Path, int]:
+        kind, src, dest = task
+        if kind == "db":
+            if not hasattr(local, "con"):
+                local.con = open_db(S.db_path)     # sqlite connections stay on their thread
+                cons.append(local.con)
+            segs = iter_segments(local.con, file_ids=[src], query=query, with_file=False)
+        else:
+            segs = read_transcript(src)
+        return dest, write_segments(segs, dest, fmt, include_ts, include_tone)
+
+    t0 = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as ex:
+            done = list(ex.map(export_one, tasks))
+    finally:
+        for c in cons:
+            c.close()
+    n = sum(k for _, k in done)
+    print(f"[green]Exported[/green] {len(done)} files -> {out}  "
+          f"[dim]({n} segments in {time.perf_counter() - t0:.2f}s)[/dim]")
 
 if __name__ == "__main__":
     app()
@@ -0,0 +1,179 @@
+"""
+Columnar snapshots of `transcripts.sqlite` for analytics (`sttfast stats`).
+
+One uncompressed .npz per run holds a segment's start/end, its file (an index into the run's
+file columns), a sentiment code and a tone bitmask, with the label vocabularies alongside.
+Tones are JSON-decoded once, when the snapshot is built; aggregates are then plain NumPy
+reductions. A snapshot records a watermark of the run: segment count and highest segment id,
+file count and highest file id, and a checksum of the file columns (path, language, duration),
+and is rebuilt when any of it changes (re-indexing, new files, a file's language filled in);
+`sttfast reanalyze` drops the snapshots of runs whose labels it changed, other in-place edits to
+segments need `rebuild=True`.
+"""
+import hashlib, json, os
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+MAX_TONES = 64                      # bits in the tone mask
+
+def snapshot_path(out_dir: Path, run: str) -> Path:
+    return out_dir / f"{Path(run).name}-{hashlib.sha1(run.encode()).hexdigest()[:8]}.npz"
+
+def runs(con, names: Iterable[str] = ()) -> list[str]:
+    """Indexed runs (files.parent), optionally narrowed to full paths or run folder names."""
+    names = [str(n) for n in names]
+    out = [r for (r,) in con.execute("SELECT DISTINCT parent FROM files ORDER BY parent")]
+    if names:
+        out = [r for r in out if r in names or Path(r).name in names]
+    return out
+
+def _watermark(con, run: str) -> np.ndarray:
+    segs = con.execute(
+        "SELECT COUNT(*), COALESCE(MAX(s.id), 0) FROM segments s JOIN files f ON f.id = s.file_id WHERE f.parent = ?",
+        (run,)).fetchone()
+    h, n_files, top = hashlib.sha1(), 0, 0
+    for fid, path, language, duration in con.execute(
+            "SELECT id, path, language, duration FROM files WHERE parent = ? ORDER BY id", (run,)):
+        h.update(repr((fid, path, language, duration)).encode())
+        n_files, top = n_files + 1, fid
+    checksum = int.from_bytes(h.digest()[:8], "little", signed=True)
+    return np.array([*segs, n_files, top, checksum], dtype=np.int64)
+
+def _codes(values, vocab: dict) -> list[int]:
+    return [-1 if v is None else vocab.setdefault(v, len(vocab)) for v in values]
+
+def _strings(vocab: dict) -> np.ndarray:
+    return np.array(list(vocab), dtype=str)
+
+def build(con, run: str, out_dir: Path, batch: int = 50_000) -> Path:
+    """Write the snapshot for one run (atomically) and return its path."""
+    files = con.execute("SELECT id, path, language, duration FROM files WHERE parent = ? ORDER BY id",
+                        (run,)).fetchall()
+    local = {fid: i for i, (fid, *_) in enumerate(files)}
+    languages, sentiments, tones = {}, {}, {}
+    masks: dict[str, int] = {}          # tones JSON string -> bitmask; few distinct combinations
+
+    def mask(raw: Optional[str]) -> int:
+        if raw not in masks:
+            m = 0
+            for name in json.loads(raw) if raw else []:
+                bit = tones.setdefault(name, len(tones))
+                if bit >= MAX_TONES:
+                    raise ValueError(f"more than {MAX_TONES} distinct tones")
+                m |= 1 << bit
+            masks[raw] = m
+        return masks[raw]
+
+    cols = {"file_index": [], "start": [], "end": [], "sentiment": [], "tones": []}
+    mark = _watermark(con, run)
+    cur = con.execute("""
+      SELECT s.file_id, s.start, s."end", s.sentiment, s.tones
+      FROM segments s JOIN files f ON f.id = s.file_id
+      WHERE f.parent = ? ORDER BY s.file_id, s.start
+    """, (run,))
+    while rows := cur.fetchmany(batch):
+        fid, start, end, sent, tns = zip(*rows)
+        cols["file_index"].append(np.array([local[f] for f in fid], dtype=np.int32))
+        cols["start"].append(np.array(start, dtype=np.float32))
+        cols["end"].append(np.array(end, dtype=np.float32))
+        cols["sentiment"].append(np.array(_codes(sent, sentiments), dtype=np.int8))
+        cols["tones"].append(np.array([mask(t) for t in tns], dtype=np.uint64))
+    dtypes = {"file_index": np.int32, "start": np.float32, "end": np.float32, "sentiment": np.int8, "tones": np.uint64}
+    arrays = {k: np.concatenate(v) if v else np.empty(0, dtypes[k]) for k, v in cols.items()}
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    dest = snapshot_path(out_dir, run)
+    tmp = dest.with_suffix(".tmp.npz")
+    np.savez(
+        tmp, **arrays,
+        file_path=np.array([f[1] for f in files], dtype=str),
+        file_language=np.array(_codes([f[2] for f in files], languages), dtype=np.int16),
+        file_duration=np.array([np.nan if f[3] is None else f[3] for f in files], dtype=np.float64),
+        languages=_strings(languages), sentiments=_strings(sentiments), tone_names=_strings(tones),
+        run=np.array(run), watermark=mark,
+    )
+    os.replace(tmp, dest)
+    return dest
+
+def is_current(con, run: str, fp: Path) -> bool:
+    if not fp.exists():
+        return False
+    with np.load(fp) as z:
+        return bool(np.array_equal(z["watermark"], _watermark(con, run)))
+
+def refresh(con, out_dir: Path, names: Iterable[str] = (), force: bool = False) -> tuple[list[Path], int]:
+    """Snapshot paths for the selected runs, building missing/stale ones; also returns how many were built."""
+    paths, built = [], 0
+    for run in runs(con, names):
+        fp = snapshot_path(out_dir, run)
+        if force or not is_current(con, run, fp):
+            build(con, run, out_dir)
+            built += 1
+        paths.append(fp)
+    return paths, built
+
+def _remap(codes: np.ndarray, names: np.ndarray, vocab: dict) -> np.ndarray:
+    """Local codes -> codes in the merged vocabulary (-1 stays -1)."""
+    table = np.array(_codes(names.tolist(), vocab) + [-1], dtype=np.int32)
+    return table[codes.astype(np.int32)]        # -1 indexes the trailing -1
+
+def load(paths: Iterable[Path]) -> dict[str, np.ndarray]:
+    """Concatenate snapshots, merging their vocabularies; adds per-segment `run` and `language` codes."""
+    languages, sentiments, tones, run_names = {}, {}, {}, []
+    parts = {k: [] for k in ("start", "end", "sentiment", "tones", "run", "language", "file")}
+    n_files = 0
+    for fp in paths:
+        with np.load(fp) as z:
+            run_names.append(str(z["run"]))
+            tone_bits = np.array(_codes(z["tone_names"].tolist(), tones), dtype=np.uint64)
+            if len(tones) > MAX_TONES:
+                raise ValueError(f"more than {MAX_TONES} distinct tones")
+            local = z["tones"]
+            merged = np.zeros_like(local)
+            for i, bit in enumerate(tone_bits):      # re-home each local bit
+                merged |= ((local >> np.uint64(i)) & np.uint64(1)) << bit
+            file_lang = _remap(z["file_language"], z["languages"], languages)
+            parts["start"].append(z["start"])
+            parts["end"].append(z["end"])
+            parts["sentiment"].append(_remap(z["sentiment"], z["sentiments"], sentiments))
+            parts["tones"].append(merged)
+            parts["run"].append(np.full(len(local), len(run_names) - 1, dtype=np.int32))
+            parts["language"].append(file_lang[z["file_index"]])
+            parts["file"].append(z["file_index"].astype(np.int64) + n_files)
+            n_files += len(z["file_path"])
+    cols = {k: np.concatenate(v) if v else np.empty(0) for k, v in parts.items()}
+    cols.update(runs=np.array(run_names, dtype=str), languages=_strings(languages),
+                sentiments=_strings(sentiments), tone_names=_strings(tones), n_files=np.array(n_files))
+    return cols
+
+# --- aggregates ---
+def sentiment_by_run(cols) -> dict[str, dict[str, int]]:
+    """{run: {sentiment: segments}}; unlabelled segments count as "none"."""
+    n_sent = len(cols["sentiments"])
+    codes = np.where(cols["sentiment"] < 0, n_sent, cols["sentiment"]).astype(np.int64)
+    grid = np.bincount(cols["run"].astype(np.int64) * (n_sent + 1) + codes,
+                       minlength=len(cols["runs"]) * (n_sent + 1)).reshape(len(cols["runs"]), n_sent + 1)
+    labels = list(cols["sentiments"]) + ["none"]
+    return {str(r): {str(l): int(c) for l, c in zip(labels, row) if c} for r, row in zip(cols["runs"], grid)}
+
+def speech_by_language(cols) -> dict[str, float]:
+    """{language: seconds of transcribed speech}; files without a language count as "unknown"."""
+    n_lang = len(cols["languages"])
+    codes = np.where(cols["language"] < 0, n_lang, cols["language"]).astype(np.int64)
+    secs = np.bincount(codes, weights=(cols["end"] - cols["start"]).astype(np.float64), minlength=n_lang + 1)
+    labels = list(cols["languages"]) + ["unknown"]
+    return {str(l): float(s) for l, s in zip(labels, secs) if s}
+
+def tones_over_time(cols, bin_s: float = 300.0) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """Bin starts (seconds into each recording) and, per tone, how many segments carry it in each bin."""
+    if not len(cols["start"]):
+        return np.empty(0), {}
+    bins = (cols["start"] // bin_s).astype(np.int64)
+    n = int(bins.max()) + 1
+    out = {}
+    for i, name in enumerate(cols["tone_names"]):
+        hit = ((cols["tones"] >> np.uint64(i)) & np.uint64(1)) == 1
+        out[str(name)] = np.bincount(bins[hit], minlength=n)
+    return np.arange(n) * bin_s, out
@@ -1,19 +1,45 @@
+import os
+from dataclasses import dataclass, field
 from pathlib import Path
-from pydantic import BaseModel
 from datetime import datetime
 
-class Settings(BaseModel):
+@dataclass
+class Settings:
     model_name: str = "distil-large-v3" # or "large-v3"
     device: str = "cuda"                # "cpu" if no GPU
     compute_type: str = "int8_float16"  # "int8_float16" instead of "float16" for speed/memory
     use_whisperx: bool = False          # optional word-level timestamps later
+    word_timestamps: bool = False       # store per-word timings (packed) so `find --open` seeks to the word
     move_files: bool = True             # default move; toggle allows copy
+    hardlink_copies: bool = True        # --copy on the same filesystem: hard link when no reflink (shares the inode)
+    place_workers: int = 4              # concurrent placements (move/copy/audio-only encode) ahead of decoding
+    pcm_buffers: int = 4                # decoded video audio held ahead of the model (each ~230 MB per hour)
+    audio_only_copy: bool = False       # with --copy, keep a 16 kHz mono FLAC of videos instead of the video
     parent_dir: Path = Path.home() / "sttfast_out"
     db_path: Path = Path.home() / "sttfast_out" / "transcripts.sqlite"
+    columns_path: Path = Path.home() / "sttfast_out" / "columns"   # per-run columnar snapshots for `sttfast stats`
+    shards_path: Path | None = None     # farm hosts: each run writes <shards_path>/<host>-<run>.sqlite; `sttfast merge` folds them into db_path
+    cache_path: Path = Path.home() / "sttfast_out" / "decode_cache.sqlite"
+    cache_enabled: bool = True          # reuse decodes of identical media + parameters
+    cache_max_mb: int = 2048            # LRU-evict beyond this (compressed size)
+    transcript_json: bool = False       # per-file transcripts as one JSON array (<name>.json) instead of compact .jsonl
     media_player: str = "auto"          # "auto" tries vlc→mpv→ffplay
     max_workers: int = 8                # CPU threads for VAD/sentiment/export
+    probe_workers: int = 8              # concurrent ffprobe processes (WAV/FLAC headers are read in-process)
+    sentiment_processes: int = 0        # >1: process pool for labelling large chunks
+    queue_size: int = 2                 # files buffered between pipeline stages
+    stream_chunk: int = 64              # segments per hand-off while a file is still decoding
+    batch_size: int = 0                 # >0: batched decoding (short clips grouped, VAD chunks batched)
+    chunk_parallel: int = 0             # >1: long files split at silences, this many chunks decoded at once
+    target_rtf: float = 0.0             # >0: auto steps long → adaptive → standard until measured RTF ≤ this
     vad_enabled: bool = True            # skip silence on long files
     diarization: bool = False           # optional later
+    use_server: bool = True             # use a running `sttfast serve` when available
+    server_host: str = "127.0.0.1"
+    server_port: int = 8765
+    # shared secret between `sttfast serve` and its clients (needed to bind beyond localhost)
+    server_token: str | None = field(default_factory=lambda: os.environ.get("STTFAST_SERVER_TOKEN") or None)
+    metrics_textfile: Path | None = None  # Prometheus textfile (node_exporter collector dir), rewritten during runs
 
 def timestamp_name() -> str:
     return datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
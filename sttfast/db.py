@@ -1,8 +1,23 @@
-import sqlite3, json
+import sqlite3, json, os, re, socket, time
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Optional
+
+from . import metrics
+from .words import pack as pack_words
+
+# Connection tuning: WAL + NORMAL sync is durable across app crashes (not power loss of the
+# last commit), and the bigger page cache / mmap keep FTS merges off the disk.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",       # 64 MiB
+    "PRAGMA mmap_size=268435456",     # 256 MiB
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA foreign_keys=ON",
+)
 
 SCHEMA = """
-PRAGMA journal_mode=WAL;
 CREATE TABLE IF NOT EXISTS files(
   id INTEGER PRIMARY KEY,
   path TEXT UNIQUE,
@@ -33,28 +48,394 @@ CREATE TRIGGER IF NOT EXISTS seg_au AFTER UPDATE ON segments BEGIN
 END;
 """
 
-def open_db(path: Path) -> sqlite3.Connection:
+# v2: indexes behind search filters (run, language) and per-file segment scans
+SCHEMA_V2 = """
+CREATE INDEX IF NOT EXISTS seg_file_start ON segments(file_id, start);
+CREATE INDEX IF NOT EXISTS files_parent ON files(parent);
+CREATE INDEX IF NOT EXISTS files_language ON files(language);
+"""
+
+# v3: media probe cache (see probe.probe_many), keyed by path and invalidated by size/mtime
+SCHEMA_V3 = """
+CREATE TABLE IF NOT EXISTS probe_cache(
+  path TEXT PRIMARY KEY,
+  size INTEGER,
+  mtime REAL,
+  meta TEXT,
+  probed_at REAL
+);
+"""
+
+# v4: measured decode speed per preset and model setup (feeds auto's throughput target)
+SCHEMA_V4 = """
+CREATE TABLE IF NOT EXISTS preset_stats(
+  preset TEXT,
+  model TEXT,
+  compute_type TEXT,
+  device TEXT,
+  audio_s REAL,
+  decode_s REAL,
+  runs INTEGER,
+  PRIMARY KEY(preset, model, compute_type, device)
+);
+"""
+
+# v5: per-segment word timings, packed (see words.pack); NULL without --words
+SCHEMA_V5 = """
+ALTER TABLE segments ADD COLUMN words BLOB;
+"""
+
+# v6: the analyzer version behind each segment's labels (sentiment.analyzer_version; NULL = unknown),
+# and an FTS update trigger that fires on text changes only, so relabelling leaves the index alone
+SCHEMA_V6 = """
+ALTER TABLE segments ADD COLUMN analyzer TEXT;
+DROP TRIGGER IF EXISTS seg_au;
+CREATE TRIGGER seg_au AFTER UPDATE OF text ON segments BEGIN
+  INSERT INTO seg_fts(seg_fts, rowid, text) VALUES ('delete', old.id, old.text);
+  INSERT INTO seg_fts(rowid, text) VALUES (new.id, new.text);
+END;
+"""
+
+# Full-text tables over segments.text, kept in sync by the seg_* triggers: seg_fts (words) for
+# `find`, seg_tri (trigrams) for `find --fuzzy`.
+FTS_TABLES = ("seg_fts", "seg_tri")
+
+SEG_AI_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS seg_ai AFTER INSERT ON segments BEGIN
+  INSERT INTO seg_fts(rowid, text) VALUES (new.id, new.text);
+  INSERT INTO seg_tri(rowid, text) VALUES (new.id, new.text);
+END;
+"""
+
+# v7: trigram index for fuzzy/substring search (see search.search_fuzzy), filled from the existing
+# rows, plus read-only vocabulary views of both indexes (term -> rows containing it)
+SCHEMA_V7 = """
+CREATE VIRTUAL TABLE IF NOT EXISTS seg_tri USING fts5(text, content='segments', content_rowid='id', tokenize='trigram');
+INSERT INTO seg_tri(seg_tri) VALUES ('rebuild');
+CREATE VIRTUAL TABLE IF NOT EXISTS seg_terms USING fts5vocab(seg_fts, 'row');
+CREATE VIRTUAL TABLE IF NOT EXISTS tri_terms USING fts5vocab(seg_tri, 'row');
+DROP TRIGGER IF EXISTS seg_ai;
+""" + SEG_AI_TRIGGER + """
+DROP TRIGGER IF EXISTS seg_ad;
+CREATE TRIGGER seg_ad AFTER DELETE ON segments BEGIN
+  INSERT INTO seg_fts(seg_fts, rowid, text) VALUES ('delete', old.id, old.text);
+  INSERT INTO seg_tri(seg_tri, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+DROP TRIGGER IF EXISTS seg_au;
+CREATE TRIGGER seg_au AFTER UPDATE OF text ON segments BEGIN
+  INSERT INTO seg_fts(seg_fts, rowid, text) VALUES ('delete', old.id, old.text);
+  INSERT INTO seg_tri(seg_tri, rowid, text) VALUES ('delete', old.id, old.text);
+  INSERT INTO seg_fts(rowid, text) VALUES (new.id, new.text);
+  INSERT INTO seg_tri(rowid, text) VALUES (new.id, new.text);
+END;
+"""
+
+# Bulk loads (deferred_fts) swap seg_ai for this one: new rows are queued in fts_pending and
+# indexed in one pass at the end. The queue is a real table, so a crash mid-load loses nothing.
+SEG_AI_DEFERRED = """
+CREATE TRIGGER seg_ai AFTER INSERT ON segments BEGIN
+  INSERT OR IGNORE INTO fts_pending(id) VALUES (new.id);
+END
+"""
+
+# v8: fts_pending (ids inserted by a bulk load, not indexed yet); delete/update triggers leave the
+# FTS tables alone for pending rows, so rows may be deleted or rewritten inside a bulk load
+SCHEMA_V8 = """
+CREATE TABLE IF NOT EXISTS fts_pending(id INTEGER PRIMARY KEY);
+DROP TRIGGER IF EXISTS seg_ad;
+CREATE TRIGGER seg_ad AFTER DELETE ON segments BEGIN
+  INSERT INTO seg_fts(seg_fts, rowid, text) SELECT 'delete', old.id, old.text
+    WHERE NOT EXISTS (SELECT 1 FROM fts_pending WHERE id = old.id);
+  INSERT INTO seg_tri(seg_tri, rowid, text) SELECT 'delete', old.id, old.text
+    WHERE NOT EXISTS (SELECT 1 FROM fts_pending WHERE id = old.id);
+  DELETE FROM fts_pending WHERE id = old.id;
+END;
+DROP TRIGGER IF EXISTS seg_au;
+CREATE TRIGGER seg_au AFTER UPDATE OF text ON segments WHEN NOT EXISTS (SELECT 1 FROM fts_pending WHERE id = old.id) BEGIN
+  INSERT INTO seg_fts(seg_fts, rowid, text) VALUES ('delete', old.id, old.text);
+  INSERT INTO seg_tri(seg_tri, rowid, text) VALUES ('delete', old.id, old.text);
+  INSERT INTO seg_fts(rowid, text) VALUES (new.id, new.text);
+  INSERT INTO seg_tri(rowid, text) VALUES (new.id, new.text);
+END;
+"""
+
+# v9: the run folder name (last component of parent, either separator), indexed for `--run NAME`
+# lookups; a virtual generated column, so every writer of files keeps it right for free
+SCHEMA_V9 = r"""
+ALTER TABLE files ADD COLUMN run TEXT GENERATED ALWAYS AS
+  (substr(parent, length(rtrim(parent, replace(replace(parent, '/', ''), '\', ''))) + 1)) VIRTUAL;
+CREATE INDEX IF NOT EXISTS files_run ON files(run COLLATE NOCASE);
+"""
+
+# v10: one lease per running bulk load (deferred_fts), so a load whose process died can be told
+# apart from one still running in another process
+SCHEMA_V10 = """
+CREATE TABLE IF NOT EXISTS fts_lease(
+  host TEXT NOT NULL,
+  pid INTEGER NOT NULL,
+  started REAL NOT NULL,
+  PRIMARY KEY (host, pid)
+);
+"""
+
+# v11: preset_stats keyed by decode mode too (sequential / batched / chunked): the same preset runs
+# at very different speeds on each path, and auto's throughput target must compare like with like.
+# Rows from before are kept as sequential, the default path.
+SCHEMA_V11 = """
+CREATE TABLE preset_stats_v11(
+  preset TEXT,
+  model TEXT,
+  compute_type TEXT,
+  device TEXT,
+  mode TEXT NOT NULL DEFAULT 'sequential',
+  audio_s REAL,
+  decode_s REAL,
+  runs INTEGER,
+  PRIMARY KEY(preset, model, compute_type, device, mode)
+);
+INSERT INTO preset_stats_v11(preset, model, compute_type, device, audio_s, decode_s, runs)
+  SELECT preset, model, compute_type, device, audio_s, decode_s, runs FROM preset_stats;
+DROP TABLE preset_stats;
+ALTER TABLE preset_stats_v11 RENAME TO preset_stats;
+"""
+
+# Append-only: MIGRATIONS[i] upgrades a store from version i to i + 1.
+MIGRATIONS = [SCHEMA, SCHEMA_V2, SCHEMA_V3, SCHEMA_V4, SCHEMA_V5, SCHEMA_V6, SCHEMA_V7, SCHEMA_V8, SCHEMA_V9,
+              SCHEMA_V10, SCHEMA_V11]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def _schema_version(con) -> int:
+    con.execute("CREATE TABLE IF NOT EXISTS schema_version(version INTEGER NOT NULL)")
+    row = con.execute("SELECT version FROM schema_version").fetchone()
+    return row[0] if row else 0
+
+_ADD_COLUMN = re.compile(r"ALTER\s+TABLE\s+(\w+)\s+ADD\s+COLUMN\s+(\w+)", re.I)
+
+def _statements(script: str) -> list[str]:
+    """Split a DDL script into statements (trigger bodies keep their inner semicolons)."""
+    out, buf = [], ""
+    for line in script.splitlines(keepends=True):
+        buf += line
+        if sqlite3.complete_statement(buf):
+            out.append(buf.strip())
+            buf = ""
+    return out
+
+def _has_column(con, table: str, column: str) -> bool:
+    return any(r[1] == column for r in con.execute(f"PRAGMA table_xinfo({table})"))  # incl. generated
+
+def migrate(con):
+    """
+    Bring the schema up to SCHEMA_VERSION; a current store costs one SELECT. Each step runs in
+    one IMMEDIATE transaction with its version bump, so an interrupted upgrade rolls back and
+    processes opening an old store together apply every step once. Columns a step would add that
+    already exist (stores half-upgraded by older releases) are left alone.
+    """
+    if _schema_version(con) >= SCHEMA_VERSION:
+        return
+    while True:
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            version = _schema_version(con)      # another process may have upgraded meanwhile
+            if version >= SCHEMA_VERSION:
+                con.commit()
+                return
+            for stmt in _statements(MIGRATIONS[version]):
+                m = _ADD_COLUMN.match(stmt)
+                if m and _has_column(con, *m.groups()):
+                    continue
+                con.execute(stmt)
+            con.execute("DELETE FROM schema_version")
+            con.execute("INSERT INTO schema_version(version) VALUES (?)", (version + 1,))
+            con.commit()
+        except BaseException:
+            con.rollback()
+            raise
+
+def open_db(path: Path, recover: bool = False) -> sqlite3.Connection:
+    """
+    Open (and migrate) the store. Commands that add segments pass `recover` to first finish
+    bulk loads whose process died (see recover_fts); read-only commands never do.
+    """
     path.parent.mkdir(parents=True, exist_ok=True)
-    con = sqlite3.connect(path)
-    con.execute("PRAGMA foreign_keys=ON")
-    con.executescript(SCHEMA)
+    # the transcribe pipeline writes from its own stage thread
+    con = sqlite3.connect(path, check_same_thread=False)
+    for p in PRAGMAS:
+        con.execute(p)
+    migrate(con)
+    if recover:
+        recover_fts(con)
+    return con
+
+def open_readonly(path: Path) -> sqlite3.Connection:
+    """
+    Open a store for reading only (e.g. another host's shard on a read-only share): nothing is
+    migrated, recovered or written. It must already be at SCHEMA_VERSION; a ValueError says so.
+    """
+    con = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+    try:
+        for p in PRAGMAS[2:5]:          # cache/mmap/temp_store: the ones that do not write
+            con.execute(p)
+        has = con.execute("SELECT 1 FROM sqlite_master WHERE name = 'schema_version'").fetchone()
+        row = has and con.execute("SELECT version FROM schema_version").fetchone()
+        version = row[0] if row else 0
+        if version != SCHEMA_VERSION:
+            raise ValueError(f"{path} is at schema version {version}, this sttfast reads {SCHEMA_VERSION}: "
+                             f"open it once with write access (or merge it) to upgrade")
+    except BaseException:
+        con.close()
+        raise
     return con
 
 def insert_file(con, path, parent, duration, language) -> int:
+    """
+    Insert a file row; re-indexing an existing path refreshes it and drops its old segments.
+    A known language is kept when the new one is None (e.g. reindexed from a transcript).
+    """
     cur = con.execute(
         "INSERT OR IGNORE INTO files(path,parent,duration,language) VALUES (?,?,?,?)",
         (str(path), str(parent), duration, language),
     )
-    if cur.lastrowid:
+    if cur.rowcount:
         return cur.lastrowid
-    row = con.execute("SELECT id FROM files WHERE path=?", (str(path),)).fetchone()
-    return row[0]
-
-def insert_segments(con, file_id: int, segments: list):
-    for s in segments:
-        con.execute(
-            'INSERT INTO segments(file_id,start,"end",text,sentiment,tones) VALUES (?,?,?,?,?,?)',
-            (file_id, s["start"], s["end"], s["text"], s.get("sentiment"),
-             json.dumps(s.get("tones", []), ensure_ascii=False)),
-        )
+    # lastrowid is stale when the insert was ignored; look the row up instead
+    file_id = con.execute("SELECT id FROM files WHERE path=?", (str(path),)).fetchone()[0]
+    con.execute("UPDATE files SET parent=?, duration=?, language=COALESCE(?, language) WHERE id=?",
+                (str(parent), duration, language, file_id))
+    con.execute("DELETE FROM segments WHERE file_id=?", (file_id,))
+    return file_id
+
+def tones_json(tones) -> str:
+    return json.dumps(list(tones or []), ensure_ascii=False, separators=(",", ":"))
+
+def insert_segments(con, file_id: int, segments: list, commit: bool = True, analyzer: Optional[str] = None):
+    """
+    One executemany per call; pass commit=False to batch several files into one transaction.
+    `analyzer` is the version that produced the labels (None when unknown, e.g. read back from JSON).
+    """
+    con.executemany(
+        'INSERT INTO segments(file_id,start,"end",text,sentiment,tones,words,analyzer) VALUES (?,?,?,?,?,?,?,?)',
+        [(file_id, s["start"], s["end"], s["text"], s.get("sentiment"), tones_json(s.get("tones")),
+          pack_words(s), analyzer)
+         for s in segments],
+    )
+    metrics.inc("db_rows_total", len(segments))
+    if commit:
+        t0 = time.perf_counter()
+        con.commit()
+        metrics.observe("db_commit_seconds", time.perf_counter() - t0)
+
+def record_rtf(con, preset: str, model: str, compute_type: str, device: str, audio_s: float, decode_s: float,
+               mode: str = "sequential"):
+    """Accumulate one decode's audio/wall seconds under its decode mode; committed with the caller's next commit."""
+    con.execute("""
+      INSERT INTO preset_stats(preset, model, compute_type, device, mode, audio_s, decode_s, runs) VALUES (?,?,?,?,?,?,?,1)
+      ON CONFLICT(preset, model, compute_type, device, mode)
+      DO UPDATE SET audio_s = audio_s + excluded.audio_s, decode_s = decode_s + excluded.decode_s, runs = runs + 1
+    """, (preset, model, compute_type, device, mode, audio_s, decode_s))
+
+def preset_rtf(con, model: str, compute_type: str, device: str,
+               modes: Optional[dict[str, str]] = None) -> dict[str, float]:
+    """
+    {preset: real-time factor} (decode seconds per audio second) for one model setup, each preset
+    as measured in the decode mode `modes` gives it (sequential when not listed).
+    """
+    modes = modes or {}
+    rows = con.execute(
+        "SELECT preset, mode, decode_s / audio_s FROM preset_stats WHERE model=? AND compute_type=? AND device=? AND audio_s > 0",
+        (model, compute_type, device),
+    ).fetchall()
+    return {preset: rtf for preset, mode, rtf in rows if mode == modes.get(preset, "sequential")}
+
+def _owner() -> tuple[str, int]:
+    return socket.gethostname(), os.getpid()
+
+def _alive(host: str, pid: int) -> bool:
+    """Whether a lease's process may still be running; other hosts' (and non-POSIX) can't be checked."""
+    if host != socket.gethostname() or os.name != "posix":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:         # exists, owned by another user
+        pass
+    return True
+
+def _index_queued(con, rebuild: bool = False):
+    """Index the queued rows (or rebuild the indexes) and empty the queue; the per-row trigger comes
+    back once no bulk load holds a lease. Runs inside the caller's transaction."""
+    for t in FTS_TABLES:
+        if rebuild:
+            con.execute(f"INSERT INTO {t}({t}) VALUES ('rebuild')")
+        else:
+            con.execute(f"INSERT INTO {t}(rowid, text) SELECT s.id, s.text FROM fts_pending p JOIN segments s ON s.id = p.id")
+    con.execute("DELETE FROM fts_pending")
+    if not con.execute("SELECT 1 FROM fts_lease LIMIT 1").fetchone():
+        con.execute("DROP TRIGGER IF EXISTS seg_ai")
+        con.execute(SEG_AI_TRIGGER)
+
+def _flush_fts(con, rebuild: bool = False):
+    """End this process's bulk load: drop its lease and index what was queued, atomically."""
+    con.commit()
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        con.execute("DELETE FROM fts_lease WHERE host = ? AND pid = ?", _owner())
+        _index_queued(con, rebuild)
+        con.commit()
+    except BaseException:
+        con.rollback()
+        raise
+
+def _stale_load(con, force: bool) -> bool:
+    """A bulk load left unfinished: queueing trigger, queued rows or leases, and no live lease."""
+    leases = con.execute("SELECT host, pid FROM fts_lease").fetchall()
+    if leases and not force and any(_alive(h, p) for h, p in leases):
+        return False                # still running; it indexes its rows when it ends
+    row = con.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'seg_ai'").fetchone()
+    return bool(leases or row is None or "fts_pending" in row[0]
+                or con.execute("SELECT 1 FROM fts_pending LIMIT 1").fetchone())
+
+def recover_fts(con, force: bool = False) -> bool:
+    """
+    Finish bulk loads that never ended (killed process): index the rows they queued and restore
+    the per-row trigger. A load is stale when its lease names a process on this host that no longer
+    runs; `force` (`reindex --recover`) also takes over leases from other hosts. True if it recovered.
+    """
+    if not _stale_load(con, force):
+        return False
+    con.commit()
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        if not _stale_load(con, force):     # checked again under the write lock
+            con.rollback()
+            return False
+        con.execute("DELETE FROM fts_lease")
+        _index_queued(con)
+        con.commit()
+        return True
+    except BaseException:
+        con.rollback()
+        raise
+
+@contextmanager
+def deferred_fts(con, rebuild: bool = False):
+    """
+    Bulk-load mode: rows added inside the block are queued instead of indexed one by one, then
+    indexed with one INSERT ... SELECT (or a full 'rebuild') followed by an FTS merge. Rows may
+    be deleted or re-inserted inside the block (re-indexing a file twice). The load holds a lease
+    in fts_lease until it ends, so other processes can tell it from one that was killed.
+    """
+    con.commit()
+    con.execute("BEGIN IMMEDIATE")
+    con.execute("INSERT OR REPLACE INTO fts_lease(host, pid, started) VALUES (?, ?, ?)", (*_owner(), time.time()))
+    con.execute("DROP TRIGGER IF EXISTS seg_ai")
+    con.execute(SEG_AI_DEFERRED)
     con.commit()
+    try:
+        yield con
+    finally:
+        _flush_fts(con, rebuild)
+        for t in FTS_TABLES:
+            con.execute(f"INSERT INTO {t}({t}, rank) VALUES ('merge', 500)")
+        con.commit()
@@ -1,26 +1,162 @@
 from pathlib import Path
-import json
+from typing import Iterable, Iterator
+import csv, json
 
-def export_txt(segments, fp: Path, include_ts=True, include_tone=True):
+from . import metrics
+
+FORMATS = ("txt", "jsonl", "srt", "vtt", "csv")
+BUFFER = 1 << 20                  # 1 MiB write buffer for bulk exports
+
+def srt_time(t: float) -> str:
+    h = int(t//3600); m = int((t%3600)//60); s = int(t%60); ms = int((t - int(t))*1000)
+    return f"{h:02}:{m:02}:{s:02},{ms:03}"
+
+def vtt_time(t: float) -> str:
+    return srt_time(t).replace(",", ".")
+
+def srt_entry(i: int, s: dict) -> str:
+    return f"{i}\n{srt_time(s['start'])} --> {srt_time(s['end'])}\n{s['text']}\n\n"
+
+def vtt_entry(s: dict) -> str:
+    return f"{vtt_time(s['start'])} --> {vtt_time(s['end'])}\n{s['text']}\n\n"
+
+def txt_line(s: dict, include_ts=True, include_tone=True) -> str:
+    ts = f"[{s['start']:.2f}-{s['end']:.2f}] " if include_ts else ""
+    tone = ""
+    if include_tone:
+        tone = f"  ({s.get('sentiment')}"
+        tones = s.get("tones", [])
+        if tones: tone += f"; {', '.join(tones)}"
+        tone += ")"
+    return f"{ts}{s['text']}{tone}\n"
+
+def _json_row(s: dict, include_tone=True, include_ts=True) -> dict:
+    row = {k: s[k] for k in (("start","end","text") if include_ts else ("text",))}
+    if include_ts and s.get("words"):
+        row["words"] = s["words"]
+    if include_tone:
+        row["sentiment"] = s.get("sentiment")
+        row["tones"] = s.get("tones", [])
+    return row
+
+def jsonl_line(s: dict, include_tone=True, include_ts=True) -> str:
+    return json.dumps(_json_row(s, include_tone, include_ts), ensure_ascii=False, separators=(",", ":")) + "\n"
+
+def write_segments(segments: Iterable[dict], fp: Path, fmt: str = "txt", include_ts=True, include_tone=True) -> int:
+    """
+    Stream segments into one TXT/JSONL/SRT/VTT/CSV file through a large write buffer; nothing
+    is held in memory beyond the current row. Rows carrying a "file" key (merged exports) get a
+    per-file header in TXT/VTT and a file column in JSONL/CSV. Returns the number written.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format: {fmt}")
     fp.parent.mkdir(parents=True, exist_ok=True)
-    with fp.open("w", encoding="utf-8") as f:
+    n, last = 0, None
+    with fp.open("w", encoding="utf-8", newline="" if fmt == "csv" else None, buffering=BUFFER) as f:
+        if fmt == "vtt":
+            f.write("WEBVTT\n\n")
+        elif fmt == "csv":
+            out = csv.writer(f)
+            out.writerow(["file"] + (["start", "end"] if include_ts else []) + ["text"]
+                         + (["sentiment", "tones"] if include_tone else []))
         for s in segments:
-            ts = f"[{s['start']:.2f}-{s['end']:.2f}] " if include_ts else ""
-            tone = ""
-            if include_tone:
-                tone = f"  ({s.get('sentiment')}"
-                tones = s.get("tones", [])
-                if tones: tone += f"; {', '.join(tones)}"
-                tone += ")"
-            f.write(f"{ts}{s['text']}{tone}\n")
-
-def export_json(segments, fp: Path, include_tone=True):
-    out = []
-    for s in segments:
-        row = {k: s[k] for k in ("start","end","text")}
-        if include_tone:
-            row["sentiment"] = s.get("sentiment")
-            row["tones"] = s.get("tones", [])
-        out.append(row)
-    fp.parent.mkdir(parents=True, exist_ok=True)
-    fp.write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
+            n += 1
+            name = s.get("file")
+            if fmt == "txt":
+                if name is not None and name != last:
+                    f.write(("" if last is None else "\n") + f"# {name}\n")
+                f.write(txt_line(s, include_ts, include_tone))
+            elif fmt == "jsonl":
+                row = _json_row(s, include_tone, include_ts)
+                if name is not None:
+                    row = {"file": name, **row}
+                f.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n")
+            elif fmt == "srt":
+                f.write(srt_entry(n, s))
+            elif fmt == "vtt":
+                if name is not None and name != last:
+                    f.write(f"NOTE {name}\n\n")
+                f.write(vtt_entry(s))
+            else:
+                out.writerow([name or ""] + ([f"{s['start']:.3f}", f"{s['end']:.3f}"] if include_ts else [])
+                             + [s["text"]] + ([s.get("sentiment") or "", ";".join(s.get("tones", []))]
+                                              if include_tone else []))
+            last = name
+    return n
+
+def read_transcript(fp: Path) -> Iterator[dict]:
+    """
+    Segments of a per-file transcript: .jsonl is read a line at a time (a torn last line from
+    an interrupted run is skipped); a legacy .json array is loaded whole.
+    """
+    if fp.suffix.lower() == ".json":
+        yield from json.loads(fp.read_text(encoding="utf-8"))
+        return
+    with fp.open(encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+def find_transcripts(folder: Path) -> list[Path]:
+    """Per-file transcripts in a run's transcripts/ folder (or `folder` itself); .jsonl wins over .json."""
+    tr = folder / "transcripts" if (folder / "transcripts").is_dir() else folder
+    found = {fp.stem: fp for fp in tr.glob("*.json")}
+    found.update({fp.stem: fp for fp in tr.glob("*.jsonl")})
+    return sorted(found.values())
+
+def transcript_path(base: Path) -> Path:
+    """The existing transcript for `base` (media stem under transcripts/), preferring .jsonl."""
+    fp = base.with_suffix(".jsonl")
+    return fp if fp.exists() else base.with_suffix(".json")
+
+
+class TranscriptWriter:
+    """
+    Incremental per-file outputs (<base>.srt, .jsonl, .txt): segments are appended as they
+    arrive, so long recordings become readable while they decode. The compact .jsonl file
+    (one segment per line) is valid after every write; with json_array=True the transcript is
+    written as a single JSON array (<base>.json, valid once close() runs) instead.
+    """
+
+    def __init__(self, base: Path, include_ts=True, include_tone=True, json_array=False):
+        base.parent.mkdir(parents=True, exist_ok=True)
+        self.include_ts, self.include_tone = include_ts, include_tone
+        self.json_array = json_array
+        self.count = 0
+        self._srt = base.with_suffix(".srt").open("w", encoding="utf-8")
+        self._json = base.with_suffix(".json" if json_array else ".jsonl").open("w", encoding="utf-8")
+        self._txt = base.with_suffix(".txt").open("w", encoding="utf-8")
+        if json_array:
+            self._json.write("[")
+
+    def write(self, segments):
+        with metrics.span("export"):
+            self._write(segments)
+
+    def _write(self, segments):
+        for s in segments:
+            self.count += 1
+            self._srt.write(srt_entry(self.count, s))
+            if self.json_array:
+                self._json.write(("\n" if self.count == 1 else ",\n")
+                                 + json.dumps(_json_row(s, self.include_tone), ensure_ascii=False))
+            else:
+                self._json.write(jsonl_line(s, self.include_tone))
+            self._txt.write(txt_line(s, self.include_ts, self.include_tone))
+        for f in (self._srt, self._json, self._txt):
+            f.flush()
+
+    def close(self):
+        if self.json_array:
+            self._json.write("\n]\n")
+        for f in (self._srt, self._json, self._txt):
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
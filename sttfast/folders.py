@@ -1,6 +1,13 @@
 from pathlib import Path
 from .config import Settings, timestamp_name
-import shutil
+from . import metrics
+import errno, os, shutil, sys, threading
+
+FICLONE = 0x40049409                # Linux ioctl: reflink (copy-on-write clone) on btrfs/XFS/bcachefs
+# stems in use per destination folder: what was there when first seen plus every name handed out
+# since (placements run concurrently, and a name is taken before its file exists)
+_claims: dict[Path, set[str]] = {}
+_claims_lock = threading.Lock()
 
 def make_parent(settings: Settings, custom: str | None) -> Path:
     name = custom or timestamp_name()
@@ -9,15 +16,120 @@ def make_parent(settings: Settings, custom: str | None) -> Path:
     (parent / "transcripts").mkdir(exist_ok=True)
     return parent
 
-def place_media(src: Path, dest_dir: Path, move: bool) -> Path:
-    dest = dest_dir / src.name
-    dest_dir.mkdir(parents=True, exist_ok=True)
-    if move:
-        shutil.move(str(src), str(dest))
-        return dest
+def _stems(dest_dir: Path) -> set[str]:
+    """Every name in dest_dir cut at each of its dots: `a.b.mp3` blocks `a`, `a.b` and `a.b.mp3`."""
+    out = set()
+    try:
+        entries = list(os.scandir(dest_dir))
+    except FileNotFoundError:
+        return out
+    for e in entries:
+        parts = e.name.split(".")
+        out.update(".".join(parts[:k]) for k in range(1, len(parts) + 1))
+    return out
+
+def claim_name(dest_dir: Path, name: str) -> Path:
+    """
+    A path in dest_dir for `name` whose stem no other file there (or in flight) uses: transcripts
+    are keyed by stem, so `clip.mp3` and `clip.wav` would collide too. Repeats become `clip_2.mp3`.
+    The folder is listed once per process; later claims are checked against that set in memory.
+    """
+    stem, suffix = Path(name).stem, Path(name).suffix
+    with _claims_lock:
+        if dest_dir not in _claims:
+            _claims[dest_dir] = _stems(dest_dir)
+        taken = _claims[dest_dir]
+        for n in range(1, 1_000_000):
+            cand = stem if n == 1 else f"{stem}_{n}"
+            if cand not in taken:
+                taken.add(cand)
+                return dest_dir / (cand + suffix)
+    raise FileExistsError(f"no free name for {name} in {dest_dir}")
+
+def release_name(dest: Path):
+    """Give back a claimed name whose file was never written (the placement failed)."""
+    with _claims_lock:
+        _claims.get(dest.parent, set()).discard(dest.stem)
+
+def _reflink(src: Path, dest: Path) -> bool:
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+    with open(src, "rb") as fi, open(dest, "wb") as fo:
+        try:
+            fcntl.ioctl(fo.fileno(), FICLONE, fi.fileno())
+            return True
+        except OSError:
+            pass
+    dest.unlink(missing_ok=True)
+    return False
+
+def _copy_range(src: Path, dest: Path):
+    """In-kernel copy: copy_file_range (Linux), else shutil's sendfile/fcopyfile fast path."""
+    if not hasattr(os, "copy_file_range"):
+        shutil.copyfile(src, dest)
+        return
+    with open(src, "rb") as fi, open(dest, "wb") as fo:
+        left = os.fstat(fi.fileno()).st_size
+        try:
+            while left > 0:
+                n = os.copy_file_range(fi.fileno(), fo.fileno(), min(left, 1 << 30))
+                if n == 0:
+                    break           # some FUSE/procfs/cross-fs setups copy nothing: not done
+                left -= n
+            if left == 0:
+                return
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                raise
+    shutil.copyfile(src, dest)      # e.g. cross-filesystem on older kernels; rewrites dest whole
+
+def _try_link(src: Path, dest: Path) -> bool:
+    try:
+        os.link(src, dest)
+        return True
+    except OSError:                 # other filesystem, no link support, permissions
+        return False
+
+def copy_fast(src: Path, dest: Path, hardlink: bool = False) -> str:
+    """Copy src to dest the cheapest way available; returns the method used."""
+    if _reflink(src, dest):
+        method = "reflink"
+    elif hardlink and _try_link(src, dest):
+        return "hardlink"           # same inode: metadata is already the source's
     else:
-        shutil.copy2(src, dest)
-        return dest
+        _copy_range(src, dest)
+        method = "copy"
+    shutil.copystat(src, dest)
+    return method
+
+def place_media(src: Path, dest_dir: Path, move: bool, hardlink: bool = False) -> Path:
+    """
+    Move or copy `src` into dest_dir under a collision-free name (see claim_name). Copies
+    prefer a reflink, then (with `hardlink`) a hard link, then an in-kernel byte copy; a move
+    is a rename on the same filesystem and such a copy plus unlink across filesystems.
+    """
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    dest = claim_name(dest_dir, src.name)
+    try:
+        with metrics.span("place", mode="move" if move else "copy"):
+            if move:
+                try:
+                    os.rename(src, dest)
+                    method = "rename"
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        raise
+                    method = copy_fast(src, dest)
+                    src.unlink()
+            else:
+                method = copy_fast(src, dest, hardlink=hardlink)
+        metrics.inc("place_files_total", method=method)
+    except BaseException:
+        if not dest.exists():
+            release_name(dest)
+        raise
+    return dest
 
 def temp_cache_root() -> Path:
     p = Path.home() / ".sttfast_temp"
@@ -0,0 +1,132 @@
+"""
+Per-run job manifest and decode checkpoints.
+
+`manifest.jsonl` in the run directory is an append-only log: one options record per
+invocation, then one record per (file, state) transition with its timing. Replaying it
+gives the state of every file, so `sttfast resume` can skip work that already finished.
+Decode checkpoints are JSONL too: a header line (language/duration/preset), then one line
+per segment, flushed as the decoder produces them.
+"""
+import json, threading, time
+from pathlib import Path
+from typing import Any, Iterable
+
+STATES = ("placed", "decoded", "analyzed", "indexed")
+MANIFEST_NAME = "manifest.jsonl"
+
+
+class Manifest:
+    def __init__(self, run_dir: Path):
+        self.run_dir = run_dir
+        self.path = run_dir / MANIFEST_NAME
+        self.options: dict[str, Any] = {}
+        self.files: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            self._replay()
+
+    @classmethod
+    def create(cls, run_dir: Path, options: dict[str, Any], sources: Iterable[Path]) -> "Manifest":
+        m = cls(run_dir)
+        m.options = dict(options)
+        m._append({"options": m.options, "at": time.time()})
+        for src in sources:
+            m.add(src)
+        return m
+
+    def add(self, src, arrival: bool = False) -> str:
+        """
+        Register a file and return its key (the path; no-op if known). `watch` adds each arrival
+        with `arrival`: a path saved again is a new job, keyed `path#2`..., with its own states.
+        """
+        key = str(src)
+        if key in self.files and not arrival:
+            return key
+        n = 1
+        while key in self.files:
+            n += 1
+            key = f"{src}#{n}"
+        self.files[key] = {"key": key, "src": str(src), "states": {}}
+        self._append(self._record(key, "queued"))
+        return key
+
+    def _record(self, key: str, state: str) -> dict:
+        src = self.files[key]["src"]
+        return {"src": src, **({"key": key} if key != src else {}), "state": state}
+
+    def _replay(self):
+        for line in self.path.read_text(encoding="utf-8").splitlines():
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue            # torn last line after a crash
+            if "options" in rec:
+                self.options = rec["options"]
+                continue
+            key = rec.pop("key", rec["src"])
+            entry = self.files.setdefault(key, {"key": key, "src": rec["src"], "states": {}})
+            state = rec.pop("state")
+            seconds = rec.pop("seconds", None)
+            if state in STATES:
+                entry["states"][state] = seconds
+            entry.update({k: v for k, v in rec.items() if k != "src"})
+
+    def _append(self, rec: dict):
+        with self._lock, self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+
+    def mark(self, key, state: str, seconds: float | None = None, **extra):
+        entry = self.files.setdefault(str(key), {"key": str(key), "src": str(key), "states": {}})
+        entry["states"][state] = seconds
+        entry.update(extra)
+        rec = {**self._record(str(key), state), **extra}
+        if seconds is not None:
+            rec["seconds"] = round(seconds, 3)
+        self._append(rec)
+
+    def has(self, key, state: str) -> bool:
+        return state in self.files.get(str(key), {}).get("states", {})
+
+    def pending(self) -> list[dict[str, Any]]:
+        return [e for e in self.files.values() if "indexed" not in e["states"]]
+
+
+def checkpoint_path(tr_dir: Path, placed: Path) -> Path:
+    return tr_dir / ".partial" / f"{placed.name}.jsonl"
+
+
+def read_checkpoint(fp: Path | None) -> tuple[dict | None, list[dict]]:
+    """(header, segments) from a checkpoint; (None, []) if absent. Ignores a torn last line."""
+    if fp is None or not fp.exists():
+        return None, []
+    header, segs = None, []
+    for line in fp.read_text(encoding="utf-8").splitlines():
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            break
+        if header is None:
+            header = rec
+        else:
+            segs.append(rec)
+    return header, segs
+
+
+def open_checkpoint(fp: Path, header: dict, segments: list[dict]):
+    """Rewrite the checkpoint with `header` + already-decoded `segments`; returns the open file for appends."""
+    fp.parent.mkdir(parents=True, exist_ok=True)
+    f = fp.open("w", encoding="utf-8")
+    for rec in [header, *segments]:
+        f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    f.flush()
+    return f
+
+
+def write_checkpoint(fp: Path, result: dict):
+    header = {k: result.get(k) for k in ("language", "duration", "preset_used")}
+    open_checkpoint(fp, header, result["segments"]).close()
+
+
+def load_result(fp: Path) -> dict:
+    header, segs = read_checkpoint(fp)
+    return {**(header or {}), "segments": segs}
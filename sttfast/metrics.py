@@ -0,0 +1,193 @@
+"""
+Optional instrumentation: counters/gauges/summaries in Prometheus text format (textfile or
+HTTP `/metrics`) and JSON-lines trace events (`--trace FILE`).
+
+Nothing is recorded until `configure()` is called; until then every helper returns after a
+single global check, and `span()` hands back a shared no-op context manager.
+"""
+import json, os, threading, time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Optional
+
+PREFIX = "sttfast_"
+_NULL = nullcontext()
+
+
+def _escape(value) -> str:
+    """A label value as the text format wants it: backslash, double quote and newline escaped."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    def __init__(self, trace: Optional[Path] = None, textfile: Optional[Path] = None):
+        self._lock = threading.Lock()
+        self._counters: dict[tuple, float] = {}
+        self._gauges: dict[tuple, float] = {}
+        self._summaries: dict[tuple, list[float]] = {}     # key -> [sum, count]
+        self._trace = None
+        if trace:
+            trace.parent.mkdir(parents=True, exist_ok=True)
+            self._trace = trace.open("a", encoding="utf-8", buffering=1)
+        self.textfile = textfile
+        self._last_flush = 0.0
+        self._server = None                                 # ThreadingHTTPServer once serve() runs
+        self.url: Optional[str] = None
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        k = self._key(name, labels)
+        with self._lock:
+            self._counters[k] = self._counters.get(k, 0) + value
+
+    def gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        k = self._key(name, labels)
+        with self._lock:
+            s = self._summaries.setdefault(k, [0.0, 0])
+            s[0] += value
+            s[1] += 1
+
+    def event(self, kind: str, **fields):
+        if self._trace is None:
+            return
+        line = json.dumps({"ts": round(time.time(), 6), "event": kind, **fields}, ensure_ascii=False, default=str)
+        with self._lock:
+            self._trace.write(line + "\n")
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        """Time a block: `<name>_seconds` summary plus a trace event with its duration."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - t0
+            self.observe(f"{name}_seconds", dt, **labels)
+            self.event(name, dur_s=round(dt, 6), **labels)
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        def fmt(name, labels, value):
+            lab = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+            return f"{PREFIX}{name}{'{' + lab + '}' if lab else ''} {value:g}"
+
+        out = []
+        with self._lock:
+            for kind, table in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted({k[0] for k in table}):
+                    out.append(f"# TYPE {PREFIX}{name} {kind}")
+                    out += [fmt(n, lab, v) for (n, lab), v in sorted(table.items()) if n == name]
+            for name in sorted({k[0] for k in self._summaries}):
+                out.append(f"# TYPE {PREFIX}{name} summary")
+                for (n, lab), (total, count) in sorted(self._summaries.items()):
+                    if n == name:
+                        out += [fmt(n + "_sum", lab, total), fmt(n + "_count", lab, count)]
+        return "\n".join(out) + "\n"
+
+    def flush(self, force: bool = False):
+        """Rewrite the textfile (atomically, for node_exporter's textfile collector); at most once a second."""
+        if self.textfile is None or (not force and time.monotonic() - self._last_flush < 1.0):
+            return
+        self._last_flush = time.monotonic()
+        self.textfile.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.textfile.with_name(self.textfile.name + ".tmp")
+        tmp.write_text(self.render(), encoding="utf-8")
+        os.replace(tmp, self.textfile)
+
+    def reply(self, handler):
+        """Answer an HTTP GET with the current exposition."""
+        body = self.render().encode()
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/plain; version=0.0.4")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def serve(self, host: str, port: int) -> str:
+        """Expose GET /metrics from a daemon thread; returns the URL."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                metrics.reply(self)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+        return f"http://{host}:{self._server.server_port}/metrics"
+
+    def close(self):
+        self.flush(force=True)
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        if self._trace is not None:
+            self._trace.close()
+
+
+_M: Optional[Metrics] = None
+
+
+def configure(trace: Optional[Path] = None, textfile: Optional[Path] = None, port: Optional[int] = None,
+              host: str = "127.0.0.1", enable: bool = False) -> Optional[Metrics]:
+    """Turn instrumentation on when any sink is given (or `enable`, for in-memory use); else off."""
+    global _M
+    if _M is not None:
+        _M.close()
+        _M = None
+    if trace is None and textfile is None and port is None and not enable:
+        return None
+    _M = Metrics(trace, textfile)
+    if port is not None:
+        _M.url = _M.serve(host, port)
+    return _M
+
+
+def shutdown():
+    configure()
+
+
+def active() -> Optional[Metrics]:
+    return _M
+
+
+def span(name: str, **labels):
+    return _M.span(name, **labels) if _M is not None else _NULL
+
+
+def inc(name: str, value: float = 1, **labels):
+    if _M is not None:
+        _M.inc(name, value, **labels)
+
+
+def gauge(name: str, value: float, **labels):
+    if _M is not None:
+        _M.gauge(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels):
+    if _M is not None:
+        _M.observe(name, value, **labels)
+
+
+def event(kind: str, **fields: Any):
+    if _M is not None:
+        _M.event(kind, **fields)
+
+
+def flush():
+    if _M is not None:
+        _M.flush()
@@ -0,0 +1,179 @@
+"""Staged producer/consumer pipeline used by `transcribe`.
+
+Each stage runs in its own thread(s) and hands items to the next stage over a
+bounded queue, so slow I/O (placement, exports, DB commits) overlaps with
+decoding instead of stalling the model between files.
+"""
+import inspect, queue, threading, time
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Optional
+
+from . import metrics
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[[Any], Any]    # item -> item (None drops it; a generator emits each value it yields)
+    workers: int = 1
+    batch: int = 1              # >1: fn gets a list of up to `batch` items and returns a list
+    linger_s: float = 0.05      # how long to wait for a batch to fill up
+    # (item, exception) -> output passed on in place of the failed one (None: nothing). Set, one
+    # item's failure does not stop the run; batched, fn must return one output per input, in order.
+    on_error: Optional[Callable[[Any, Exception], Any]] = None
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    busy_s: float = 0.0         # time spent inside fn
+    idle_s: float = 0.0         # waiting for input (starved)
+    blocked_s: float = 0.0      # waiting for room downstream (backpressure)
+
+    @property
+    def rate(self) -> float:
+        return self.items / self.busy_s if self.busy_s else 0.0
+
+    def summary(self) -> str:
+        return (f"{self.name:<8} items={self.items:<5} busy={self.busy_s:7.2f}s  "
+                f"idle={self.idle_s:7.2f}s  blocked={self.blocked_s:7.2f}s  "
+                f"rate={self.rate:.2f}/s")
+
+
+def run_pipeline(items: Iterable[Any], stages: list[Stage], maxsize: int = 2,
+                 stop: Optional[Callable[[], None]] = None) -> tuple[list[Any], list[StageStats]]:
+    """
+    Push `items` through `stages` and return (outputs of the last stage, per-stage stats).
+    The first exception not handled by a stage's `on_error` stops the feed and is re-raised
+    here once all threads have drained; `stop` is called then, to end a feed that would
+    otherwise block waiting for more items (e.g. a folder watcher).
+    """
+    queues = [queue.Queue(maxsize=max(1, maxsize)) for _ in stages] + [queue.Queue()]
+    stats = [StageStats(s.name) for s in stages]
+    errors: list[BaseException] = []
+    failed = threading.Event()
+    lock = threading.Lock()
+
+    def feed():
+        for it in items:
+            if failed.is_set():
+                break
+            queues[0].put(it)
+        queues[0].put(_DONE)
+
+    def collect(stage: Stage, q_in: queue.Queue):
+        it = q_in.get()
+        if stage.batch <= 1 or it is _DONE:
+            return it
+        got = [it]
+        deadline = time.perf_counter() + stage.linger_s
+        while len(got) < stage.batch:
+            try:
+                nxt = q_in.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            if nxt is _DONE:
+                q_in.put(_DONE)     # seen again on the next collect()
+                break
+            got.append(nxt)
+        return got
+
+    def work(i: int, remaining: list[int]):
+        stage, st, q_in, q_out = stages[i], stats[i], queues[i], queues[i + 1]
+        while True:
+            t0 = time.perf_counter()
+            it = collect(stage, q_in)
+            t1 = time.perf_counter()
+            metrics.gauge("queue_depth", q_in.qsize(), stage=stage.name)
+            if it is _DONE:
+                q_in.put(_DONE)     # let sibling workers see it too
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    q_out.put(_DONE)
+                return
+            if failed.is_set():
+                continue            # drain without processing
+            blocked = 0.0
+
+            def put(o):
+                nonlocal blocked
+                tp = time.perf_counter()
+                q_out.put(o)
+                blocked += time.perf_counter() - tp
+
+            def emit(o):
+                if inspect.isgenerator(o):
+                    try:
+                        for x in o:     # streamed: hand each piece on as soon as it exists
+                            if failed.is_set():
+                                break   # the run is failing: stop producing what nobody will use
+                            put(x)
+                    finally:
+                        o.close()       # runs the generator's cleanup (e.g. ends a decode)
+                elif o is not None:
+                    put(o)
+
+            def handle(x, e: Exception):
+                metrics.inc("stage_errors_total", stage=stage.name)
+                emit(stage.on_error(x, e))
+
+            try:
+                ins = it if stage.batch > 1 else [it]
+                try:
+                    out = stage.fn(it)
+                except Exception as e:
+                    if stage.on_error is None:
+                        raise
+                    for x in ins:       # the whole call failed: so did each of its items
+                        handle(x, e)
+                    out = None
+                outs = (out or []) if stage.batch > 1 else [out]
+                for k, o in enumerate(outs):
+                    try:
+                        emit(o)
+                    except Exception as e:
+                        if stage.on_error is None:
+                            raise
+                        handle(ins[k], e)
+            except BaseException as e:
+                with lock:
+                    first = not errors
+                    errors.append(e)
+                failed.set()
+                if first and stop is not None:
+                    stop()
+                continue
+            t2 = time.perf_counter()
+            with lock:
+                st.items += len(it) if stage.batch > 1 else 1
+                st.idle_s += t1 - t0
+                st.busy_s += t2 - t1 - blocked
+                st.blocked_s += blocked
+
+    threads = [threading.Thread(target=feed, name="feed", daemon=True)]
+    for i, stage in enumerate(stages):
+        remaining = [max(1, stage.workers)]
+        threads += [threading.Thread(target=work, args=(i, remaining), name=f"{stage.name}-{w}", daemon=True)
+                    for w in range(remaining[0])]
+    for t in threads:
+        t.start()
+
+    results = []
+    while True:
+        it = queues[-1].get()
+        if it is _DONE:
+            break
+        results.append(it)
+    for t in threads:
+        t.join()
+    for st in stats:
+        for field in ("items", "busy_s", "idle_s", "blocked_s"):
+            metrics.inc(f"stage_{field}_total", getattr(st, field), stage=st.name)
+    if errors:
+        raise errors[0]
+    return results, stats
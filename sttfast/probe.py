@@ -1,21 +1,138 @@
-import subprocess, json, shutil
+import subprocess, json, shutil, struct, time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Any, Iterable
 
-def get_duration_sec(path: Path) -> float | None:
-    """Return media duration in seconds using ffprobe; None if unknown."""
+# {"duration", "sample_rate", "channels", "codec", "has_audio"}; unknown fields are None
+MediaInfo = dict[str, Any]
+
+def _empty() -> MediaInfo:
+    return {"duration": None, "sample_rate": None, "channels": None, "codec": None, "has_audio": None}
+
+def _wav_info(path: Path) -> MediaInfo | None:
+    """RIFF/WAVE header (incl. WAVE_FORMAT_EXTENSIBLE) without decoding anything."""
+    with path.open("rb") as f:
+        head = f.read(12)
+        if len(head) < 12 or head[:4] not in (b"RIFF", b"RF64") or head[8:12] != b"WAVE":
+            return None
+        fmt = None
+        while True:
+            hdr = f.read(8)
+            if len(hdr) < 8:
+                return None
+            cid, size = hdr[:4], struct.unpack("<I", hdr[4:])[0]
+            if cid == b"fmt ":
+                fmt = struct.unpack("<HHIIHH", f.read(16))
+                f.seek(size - 16 + (size & 1), 1)
+            elif cid == b"data":
+                if fmt is None:
+                    return None
+                tag, channels, rate, byte_rate, _, _ = fmt
+                if head[:4] == b"RF64" or size == 0xFFFFFFFF:   # 64-bit sizes: fall back to file size
+                    size = path.stat().st_size - f.tell()
+                return {"duration": size / byte_rate if byte_rate else None, "sample_rate": rate,
+                        "channels": channels, "codec": "pcm" if tag in (1, 0xFFFE) else f"wav:{tag:#x}",
+                        "has_audio": True}
+            else:
+                f.seek(size + (size & 1), 1)
+
+def _flac_info(path: Path) -> MediaInfo | None:
+    """FLAC STREAMINFO block: sample rate, channels and total samples."""
+    with path.open("rb") as f:
+        if f.read(4) != b"fLaC":
+            return None
+        hdr = f.read(4)
+        if len(hdr) < 4 or hdr[0] & 0x7F != 0:     # STREAMINFO is always the first block
+            return None
+        info = f.read(34)
+        if len(info) < 34:
+            return None
+        bits = int.from_bytes(info[10:18], "big")
+        rate = bits >> 44
+        channels = ((bits >> 41) & 0x7) + 1
+        total = bits & ((1 << 36) - 1)
+        return {"duration": total / rate if rate and total else None, "sample_rate": rate,
+                "channels": channels, "codec": "flac", "has_audio": True}
+
+def _ffprobe_info(path: Path) -> MediaInfo:
+    out = _empty()
     if shutil.which("ffprobe") is None:
-        return None
+        return out
     try:
-        # compact JSON so parsing is stable
         cmd = [
             "ffprobe", "-v", "error",
-            "-select_streams", "a:0",
-            "-show_entries", "format=duration",
+            "-show_entries", "format=duration:stream=codec_type,codec_name,sample_rate,channels",
             "-of", "json", str(path)
         ]
-        out = subprocess.check_output(cmd, text=True, stderr=subprocess.STDOUT)
-        data = json.loads(out)
-        dur = data.get("format", {}).get("duration")
-        return float(dur) if dur is not None else None
+        data = json.loads(subprocess.check_output(cmd, text=True, stderr=subprocess.STDOUT))
     except Exception:
-        return None
+        return out
+    dur = data.get("format", {}).get("duration")
+    out["duration"] = float(dur) if dur is not None else None
+    audio = [s for s in data.get("streams", []) if s.get("codec_type") == "audio"]
+    out["has_audio"] = bool(audio) if "streams" in data else None
+    if audio:
+        a = audio[0]
+        out["codec"] = a.get("codec_name")
+        out["sample_rate"] = int(a["sample_rate"]) if a.get("sample_rate") else None
+        out["channels"] = a.get("channels")
+    return out
+
+def probe_media(path: Path) -> MediaInfo:
+    """Media metadata in one call: WAV/FLAC headers are read in-process, everything else via ffprobe."""
+    path = Path(path)
+    try:
+        suffix = path.suffix.lower()
+        info = _wav_info(path) if suffix == ".wav" else _flac_info(path) if suffix == ".flac" else None
+    except (OSError, struct.error):
+        info = None
+    if info is not None and info["duration"] is not None:
+        return info
+    # no header, or one without a length (a streamed FLAC records 0 samples): ask ffprobe,
+    # keeping what the header did say if ffprobe cannot tell either
+    probed = _ffprobe_info(path)
+    return probed if info is None or probed["duration"] is not None else info
+
+def get_duration_sec(path: Path) -> float | None:
+    """Return media duration in seconds; None if unknown."""
+    return probe_media(path)["duration"]
+
+def probe_many(paths: Iterable[Path], workers: int = 8, con=None) -> dict[Path, MediaInfo]:
+    """
+    Probe many files concurrently (ffprobe runs in its own process, so threads overlap well).
+    With a transcript DB connection, results are cached in `probe_cache` keyed by path+size+mtime.
+    Results without a duration (no ffprobe, a failed probe) are not cached, so they are retried.
+    """
+    paths = list(dict.fromkeys(Path(p) for p in paths))
+    stats = {}
+    for p in paths:
+        try:
+            st = p.stat()
+            stats[p] = (st.st_size, st.st_mtime)
+        except OSError:
+            stats[p] = None
+    out: dict[Path, MediaInfo] = {}
+    if con is not None:
+        keys = [str(p) for p in paths if stats[p]]
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            for key, size, mtime, meta in con.execute(
+                f"SELECT path, size, mtime, meta FROM probe_cache WHERE path IN ({','.join('?' * len(chunk))})", chunk
+            ):
+                p = Path(key)
+                m = json.loads(meta)
+                if stats.get(p) == (size, mtime) and m["duration"] is not None:   # a miss is probed again
+                    out[p] = m
+    todo = [p for p in paths if p not in out]
+    if todo:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            fresh = dict(zip(todo, pool.map(probe_media, todo)))
+        out.update(fresh)
+        if con is not None:
+            con.executemany(
+                "INSERT OR REPLACE INTO probe_cache(path, size, mtime, meta, probed_at) VALUES (?,?,?,?,?)",
+                [(str(p), *stats[p], json.dumps(m), time.time()) for p, m in fresh.items()
+                 if stats[p] and m["duration"] is not None],
+            )
+            con.commit()
+    return out
@@ -0,0 +1,85 @@
+"""
+Relabel indexed segments in place (`sttfast reanalyze`), without decoding anything again.
+
+Every segment row records the analyzer version behind its sentiment/tones
+(`sentiment.analyzer_version()`; NULL for rows whose origin is unknown, e.g. reindexed JSON).
+Rows from any other version are read back in id order, a chunk at a time, relabelled, and
+written back with batched UPDATEs: new labels only where they changed, otherwise just the
+version stamp. The FTS trigger fires on text updates only, so the full-text index is not
+touched. Reading, labelling and writing overlap (a pipeline with a separate read connection),
+and every chunk commits on its own, so an interrupted run picks up where it stopped.
+"""
+import json
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Iterator, Optional
+
+from . import metrics
+from .db import open_db, tones_json
+from .pipeline import Stage, run_pipeline
+from .search import _run_filter
+from .sentiment import analyzer_version, label_texts
+
+def _pending(con, version: Optional[str], run: Optional[str], chunk: int) -> Iterator[list[tuple]]:
+    """Chunks of (id, text, sentiment, tones, run) for rows not labelled by `version` (all rows if None)."""
+    where, args = ["s.id > ?"], []
+    if version is not None:
+        where.append("s.analyzer IS NOT ?")
+        args.append(version)
+    if run:
+        clause, a = _run_filter(run)
+        where.append(clause)
+        args += a
+    sql = (f"SELECT s.id, s.text, s.sentiment, s.tones, f.parent FROM segments s JOIN files f ON f.id = s.file_id "
+           f"WHERE {' AND '.join(where)} ORDER BY s.id LIMIT ?")
+    last = 0
+    while rows := con.execute(sql, [last, *args, chunk]).fetchall():
+        yield rows
+        last = rows[-1][0]
+
+def _tones(raw: Optional[str], seen: dict) -> list:
+    if raw not in seen:
+        seen[raw] = json.loads(raw) if raw else []
+    return seen[raw]
+
+def reanalyze(db_path: Path, run: Optional[str] = None, force: bool = False, chunk: int = 20_000,
+              pool: Optional[Executor] = None) -> dict:
+    """
+    Relabel rows of `db_path` labelled by another analyzer version (every row with `force`),
+    optionally only in one run. Returns counts: scanned, changed, unchanged, and the runs
+    whose labels changed.
+    """
+    version = analyzer_version()
+    reader, con = open_db(db_path), open_db(db_path)
+    out = {"scanned": 0, "changed": 0, "unchanged": 0, "runs": set()}
+
+    def label(rows):
+        labels = label_texts([r[1] for r in rows], pool=pool)
+        seen, changed, same = {}, [], []
+        for (sid, _, sent, tones, parent), lab in zip(rows, labels):
+            if lab["sentiment"] == sent and lab["tones"] == _tones(tones, seen):
+                same.append((version, sid))
+            else:
+                changed.append((lab["sentiment"], tones_json(lab["tones"]), version, sid))
+                out["runs"].add(parent)
+        return changed, same
+
+    def write(batch):
+        changed, same = batch
+        with metrics.span("reanalyze_write"):
+            con.executemany("UPDATE segments SET sentiment=?, tones=?, analyzer=? WHERE id=?", changed)
+            con.executemany("UPDATE segments SET analyzer=? WHERE id=?", same)
+            con.commit()
+        out["scanned"] += len(changed) + len(same)
+        out["changed"] += len(changed)
+        out["unchanged"] += len(same)
+        metrics.inc("reanalyze_rows_total", len(changed), result="changed")
+        metrics.inc("reanalyze_rows_total", len(same), result="unchanged")
+
+    try:
+        run_pipeline(_pending(reader, None if force else version, run, chunk),
+                     [Stage("label", label), Stage("write", write)])
+    finally:
+        reader.close()
+        con.close()
+    return out
@@ -1,14 +1,308 @@
-import sqlite3
-from typing import Iterable
-
-def search_phrase(con: sqlite3.Connection, phrase: str) -> Iterable[dict]:
-    rows = con.execute("""
-      SELECT s.id, f.path, s.start, s."end", s.text
-      FROM seg_fts ft
-      JOIN segments s ON s.id = ft.rowid
+import json, re, sqlite3
+from typing import Iterable, Iterator, Literal, Optional
+
+from .words import unpack, word_at
+
+# snippet()/highlight() markers; callers swap them for their own markup
+HL_START, HL_END = "\x02", "\x03"
+
+def _run_filter(run: str) -> tuple[str, list]:
+    """files.parent given as a full path or just the run folder name (exact, both indexed)."""
+    return "(f.parent = ? OR f.run = ? COLLATE NOCASE)", [run, run]
+
+def _selection(run=None, file_ids=None, query=None) -> tuple[list, list]:
+    where, args = [], []
+    if run:
+        clause, a = _run_filter(run)
+        where.append(clause)
+        args += a
+    if file_ids is not None:
+        where.append(f"f.id IN ({','.join('?' * len(file_ids))})")
+        args += list(file_ids)
+    if query:
+        where.append("s.id IN (SELECT rowid FROM seg_fts WHERE seg_fts MATCH ?)")
+        args.append(query)
+    return where, args
+
+def list_files(con: sqlite3.Connection, run: Optional[str] = None, query: Optional[str] = None) -> list[tuple[int, str]]:
+    """(file id, path) of indexed files in a run and/or with segments matching `query`, by path."""
+    where, args = _selection(run=run, query=query)
+    return con.execute(f"""
+      SELECT DISTINCT f.id, f.path FROM files f JOIN segments s ON s.file_id = f.id
+      {"WHERE " + " AND ".join(where) if where else ""}
+      ORDER BY f.path
+    """, args).fetchall()
+
+def iter_segments(
+    con: sqlite3.Connection,
+    run: Optional[str] = None,
+    file_ids: Optional[list[int]] = None,
+    query: Optional[str] = None,                 # FTS5 query; only matching segments
+    with_file: bool = True,                      # include each row's media path as "file"
+    batch: int = 2000,
+) -> Iterator[dict]:
+    """
+    Stream stored segments (file path order, then time) straight off a cursor, `batch` rows at
+    a time, for exports that shouldn't materialise whole transcripts. Segments stored with word
+    timings carry them as "words".
+    """
+    where, args = _selection(run, file_ids, query)
+    cur = con.execute(f"""
+      SELECT f.path, s.start, s."end", s.text, s.sentiment, s.tones, s.words
+      FROM segments s JOIN files f ON f.id = s.file_id
+      {"WHERE " + " AND ".join(where) if where else ""}
+      ORDER BY f.path, s.start, s.id
+    """, args)
+    while rows := cur.fetchmany(batch):
+        for path, start, end, text, sentiment, tones, words in rows:
+            row = {"start": start, "end": end, "text": text, "sentiment": sentiment,
+                   "tones": json.loads(tones) if tones else []}
+            if words:
+                row["words"] = unpack(words, text, start)
+            yield {"file": path, **row} if with_file else row
+
+def _filters(run=None, language=None, sentiment=None, tone=None, start_min=None, start_max=None) -> tuple[list, list]:
+    where, args = [], []
+    if run:
+        clause, a = _run_filter(run)
+        where.append(clause)
+        args += a
+    if language:
+        where.append("f.language = ?")
+        args.append(language)
+    if sentiment:
+        where.append("s.sentiment = ?")
+        args.append(sentiment)
+    if tone:
+        where.append("s.tones LIKE ?")
+        args.append(f'%"{tone}"%')
+    if start_min is not None:
+        where.append("s.start >= ?")
+        args.append(start_min)
+    if start_max is not None:
+        where.append("s.start <= ?")
+        args.append(start_max)
+    return where, args
+
+def search_phrase(
+    con: sqlite3.Connection,
+    phrase: str,
+    limit: Optional[int] = 50,
+    offset: int = 0,
+    after: Optional[tuple[float, int]] = None,   # keyset: (rank, segment_id) of the last hit seen
+    run: Optional[str] = None,                   # files.parent, full path or run folder name
+    language: Optional[str] = None,
+    sentiment: Optional[str] = None,
+    tone: Optional[str] = None,
+    start_min: Optional[float] = None,
+    start_max: Optional[float] = None,
+    order: Literal["rank", "time"] = "rank",
+    snippet_tokens: int = 16,
+) -> Iterable[dict]:
+    """
+    Full-text hits ranked by bm25 (lower is better) or by file/time. Filters and pagination
+    run inside SQLite; snippets are computed only for the returned page. `seek` is the start of
+    the first matched word when the segment has word timings, else the segment start.
+    """
+    where, args = _filters(run, language, sentiment, tone, start_min, start_max)
+    where.insert(0, "seg_fts MATCH ?")
+    args.insert(0, phrase)
+    if after is not None and order == "rank":
+        where.append("(bm25(seg_fts), s.id) > (?, ?)")
+        args += list(after)
+    order_by = "bm25(seg_fts), s.id" if order == "rank" else "f.path, s.start"
+    page = ""
+    if limit is not None:
+        page = " LIMIT ? OFFSET ?"
+        args += [limit, offset if after is None else 0]
+
+    rows = con.execute(f"""
+      SELECT s.id, f.path, s.start, s."end", s.text, bm25(seg_fts), f.parent, f.language, s.sentiment, s.tones,
+             s.words
+      FROM seg_fts
+      JOIN segments s ON s.id = seg_fts.rowid
       JOIN files f ON f.id = s.file_id
-      WHERE seg_fts MATCH ?
-      ORDER BY f.path, s.start
-    """, (phrase,)).fetchall()
+      WHERE {" AND ".join(where)}
+      ORDER BY {order_by}{page}
+    """, args).fetchall()
+    if not rows:
+        return
+    snippets, match_at = {}, {}
+    for i in range(0, len(rows), 500):
+        ids = [r[0] for r in rows[i:i + 500]]
+        snippets.update(con.execute(f"""
+          SELECT rowid, snippet(seg_fts, 0, ?, ?, '…', ?)
+          FROM seg_fts WHERE seg_fts MATCH ? AND rowid IN ({",".join("?" * len(ids))})
+        """, [HL_START, HL_END, snippet_tokens, phrase, *ids]).fetchall())
+        # character offset of the first highlighted token, only where there are words to map it to
+        timed = [r[0] for r in rows[i:i + 500] if r[10]]
+        if timed:
+            match_at.update(con.execute(f"""
+              SELECT rowid, instr(highlight(seg_fts, 0, ?, ?), ?) - 1
+              FROM seg_fts WHERE seg_fts MATCH ? AND rowid IN ({",".join("?" * len(timed))})
+            """, [HL_START, HL_END, HL_START, phrase, *timed]).fetchall())
     for r in rows:
-        yield {"segment_id": r[0], "file": r[1], "start": r[2], "end": r[3], "text": r[4]}
+        seek = word_at(r[10], r[2], match_at[r[0]]) if r[0] in match_at else None
+        yield {"segment_id": r[0], "file": r[1], "start": r[2], "end": r[3], "text": r[4],
+               "rank": r[5], "parent": r[6], "language": r[7], "sentiment": r[8], "tones": r[9],
+               "snippet": snippets.get(r[0], r[4]), "seek": r[2] if seek is None else seek}
+
+# --- fuzzy search over the trigram index (seg_tri) ---
+_WORD = re.compile(r"\w+")
+
+def max_edits(word: str) -> int:
+    """Typo budget by word length: none up to 2 characters, 1 up to 5, then 2."""
+    return 0 if len(word) <= 2 else 1 if len(word) <= 5 else 2
+
+def edit_distance(a: str, b: str, prefix: bool = False, cap: int = 1 << 30) -> int:
+    """
+    Levenshtein distance from `a` to `b` or, with `prefix`, to the closest prefix of `b` ("kuber"
+    is 0 from "kubernetes"). Gives up with cap + 1 once the distance must exceed `cap`.
+    """
+    if not prefix and abs(len(a) - len(b)) > cap:
+        return cap + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        cur = [i]
+        for j, cb in enumerate(b, start=1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > cap:
+            return cap + 1
+        prev = cur
+    return min(min(prev) if prefix else prev[-1], cap + 1)
+
+def _pieces(word: str, edits: int) -> list[str]:
+    """
+    Substrings of `word` to look up in the trigram index. Cut into edits + 1 parts, at least one
+    survives `edits` typos intact (pigeonhole); words too short for that use every trigram.
+    """
+    if len(word) < 3:
+        return []
+    n = edits + 1
+    if len(word) >= 3 * n:
+        return [word] + [word[round(i * len(word) / n):round((i + 1) * len(word) / n)] for i in range(n)]
+    return [word] + [word[i:i + 3] for i in range(len(word) - 2)]
+
+def _rows_with(con, piece: str) -> int:
+    """Rows holding the piece's rarest trigram (an upper bound on rows containing the piece)."""
+    grams = {piece[i:i + 3] for i in range(len(piece) - 2)}
+    return min(next(iter(con.execute("SELECT doc FROM tri_terms WHERE term = ?", (g,))), (0,))[0] for g in grams)
+
+def _snippet(text: str, spans: list[tuple[int, int]], marks: set[int], tokens: int) -> str:
+    """Text around the first matched word (`tokens` words), matched words wrapped in HL markers."""
+    first = min(marks)
+    lo = max(0, first - tokens // 2)
+    hi = min(len(spans), lo + tokens)
+    out = "…" if lo else text[:spans[0][0]]
+    for k in range(lo, hi):
+        a, b = spans[k]
+        word = HL_START + text[a:b] + HL_END if k in marks else text[a:b]
+        out += word + (text[b:spans[k + 1][0]] if k + 1 < hi else "")
+    return out + ("…" if hi < len(spans) else text[spans[-1][1]:])
+
+def search_fuzzy(
+    con: sqlite3.Connection,
+    query: str,
+    limit: Optional[int] = 50,
+    offset: int = 0,
+    run: Optional[str] = None,
+    language: Optional[str] = None,
+    sentiment: Optional[str] = None,
+    tone: Optional[str] = None,
+    start_min: Optional[float] = None,
+    start_max: Optional[float] = None,
+    order: Literal["rank", "time"] = "rank",
+    edits: Optional[int] = None,                 # typos allowed per word; default by length (max_edits)
+    candidates: int = 2000,                      # first cap on rows fetched from the trigram index (grows as needed)
+    snippet_tokens: int = 16,
+) -> Iterable[dict]:
+    """
+    Typo-tolerant search for ASR misspellings: every query word must be within its edit budget of
+    some word in the segment, and the last one may be a prefix ("kuber" finds "kubernetes").
+    Candidates come from the trigram index, rarest pieces first; they are ranked by total edit
+    distance ("rank" is that distance, 0 = exact). Same hit fields as search_phrase.
+
+    Candidates are capped (at least `candidates`, and 4x offset + limit) and the cap grows until
+    the requested page is full, so deep pages are never cut short. When the cap does cut pieces
+    short, ranks are exact among the rows fetched but a closer match may lie beyond them;
+    `limit=None` fetches every candidate.
+    """
+    qwords = _WORD.findall(query.lower())
+    budget = [max_edits(w) if edits is None else edits for w in qwords]
+    pieces = {p for w, e in zip(qwords, budget) for p in _pieces(w, e)}
+    where, args = _filters(run, language, sentiment, tone, start_min, start_max)
+
+    def fetch(table: str, match: str, n: Optional[int]) -> list:
+        return con.execute(f"""
+          SELECT s.id, f.path, s.start, s."end", s.text, f.parent, f.language, s.sentiment, s.tones, s.words
+          FROM {table} JOIN segments s ON s.id = {table}.rowid JOIN files f ON f.id = s.file_id
+          WHERE {" AND ".join([f"{table} MATCH ?", *where])} LIMIT ?
+        """, [match, *args, -1 if n is None else n]).fetchall()
+
+    def gather(cap: Optional[int]) -> tuple[dict, bool]:
+        """Candidate rows by id (all of them if cap is None), and whether the cap left any out."""
+        if qwords and not pieces:                # all words too short for trigrams: word prefixes
+            rows = fetch("seg_fts", " ".join(f'"{w}"*' for w in qwords), cap)
+            return {r[0]: r for r in rows}, len(rows) == cap
+        found = {}
+        for n, piece in sorted((_rows_with(con, p), p) for p in pieces):
+            if not n:
+                continue
+            room = None if cap is None else cap - len(found)
+            if room == 0:
+                return found, True
+            rows = fetch("seg_tri", f'"{piece}"', room)
+            found.update((r[0], r) for r in rows)
+            if len(rows) == room:
+                return found, True
+        return found, False
+
+    memo: dict[tuple, int] = {}
+
+    def verify(r):
+        spans = [m.span() for m in _WORD.finditer(r[4])]
+        words = [r[4][a:b].lower() for a, b in spans]
+        total, marks = 0, set()
+        for k, (qw, cap) in enumerate(zip(qwords, budget)):
+            prefix = k == len(qwords) - 1
+            best, at = cap + 1, -1
+            for i, w in enumerate(words):
+                key = (qw, w, prefix, cap)
+                if key not in memo:
+                    memo[key] = edit_distance(qw, w, prefix, cap)
+                if memo[key] < best:
+                    best, at = memo[key], i
+            if at < 0:
+                return None
+            total += best
+            marks.add(at)
+        return total, r, spans, marks
+
+    want = None if limit is None else offset + limit
+    cap = None if want is None else max(candidates, 4 * want)
+    hits, checked = [], set()
+    while True:
+        found, cut = gather(cap)
+        for sid, r in found.items():
+            if sid not in checked:
+                checked.add(sid)
+                if (h := verify(r)) is not None:
+                    hits.append(h)
+        if not cut or len(hits) >= want:
+            break
+        cap *= 4
+    hits.sort(key=lambda h: (h[0], h[1][0]) if order == "rank" else (h[1][1], h[1][2]))
+    for total, r, spans, marks in hits[offset:None if limit is None else offset + limit]:
+        first = spans[min(marks)][0] if marks else 0
+        seek = word_at(r[9], r[2], first) if r[9] else None
+        yield {"segment_id": r[0], "file": r[1], "start": r[2], "end": r[3], "text": r[4], "rank": total,
+               "parent": r[5], "language": r[6], "sentiment": r[7], "tones": r[8],
+               "snippet": _snippet(r[4], spans, marks, snippet_tokens) if marks else r[4],
+               "seek": r[2] if seek is None else seek, "distance": total}
+
+def complete(con: sqlite3.Connection, prefix: str, limit: int = 10) -> list[tuple[str, int]]:
+    """Indexed words starting with `prefix`, most widespread first, as (word, segments containing it)."""
+    prefix = prefix.lower()
+    return con.execute(
+        "SELECT term, doc FROM seg_terms WHERE term >= ? AND term < ? ORDER BY doc DESC, term LIMIT ?",
+        (prefix, prefix + chr(0x10FFFF), limit)).fetchall()
@@ -1,10 +1,18 @@
 # CPU-only sentiment & tone — no Torch/Transformers to avoid meta-device issues on Windows.
 # Uses VADER polarity + simple keyword heuristics for tones (sad / annoyed / doubtful, etc.).
 
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-import re
+from concurrent.futures import Executor
+from functools import lru_cache
+from typing import Iterable, Optional
+import hashlib, json, re
 
-_analyzer = SentimentIntensityAnalyzer()
+from . import metrics
+
+@lru_cache(maxsize=None)
+def _analyzer():
+    # built on first use (it loads the VADER lexicon), so importing this module stays cheap
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    return SentimentIntensityAnalyzer()
 
 # simple phrase lists for tone tagging (extend as you like)
 TONE_PATTERNS = {
@@ -36,35 +44,70 @@ TONE_PATTERNS = {
     ],
 }
 
+POSITIVE_MIN, NEGATIVE_MAX = 0.3, -0.3   # VADER compound thresholds
+MAX_TONES = 2
+
+# One combined alternation per tone, compiled once. Texts are lowercased before matching,
+# so the patterns above stay lowercase and no IGNORECASE is needed.
+_TONE_RES = [(label, re.compile("|".join(f"(?:{p})" for p in patterns)))
+             for label, patterns in TONE_PATTERNS.items()]
+
 def _tone_tags(text: str) -> list[str]:
     if not text:
         return []
-    tags = []
     t = text.lower()
-    for label, patterns in TONE_PATTERNS.items():
-        for pat in patterns:
-            if re.search(pat, t, flags=re.IGNORECASE):
-                tags.append(label)
-                break
-    # de-dup while preserving order
-    seen = set()
-    out = []
-    for x in tags:
-        if x not in seen:
-            out.append(x); seen.add(x)
-    # keep top 2
-    return out[:2]
+    # labels are unique and checked in order; keep the first MAX_TONES
+    return [label for label, rx in _TONE_RES if rx.search(t)][:MAX_TONES]
 
-def label_text(text: str):
-    txt = (text or "").strip()
-    scores = _analyzer.polarity_scores(txt)
-    compound = scores["compound"]
+def _sentiment(compound: float) -> str:
     # Map VADER compound to discrete label
-    if compound >= 0.3:
-        sent = "positive"
-    elif compound <= -0.3:
-        sent = "negative"
-    else:
-        sent = "neutral"
-    tones = _tone_tags(txt)
-    return {"sentiment": sent, "tones": tones}
+    if compound >= POSITIVE_MIN:
+        return "positive"
+    if compound <= NEGATIVE_MAX:
+        return "negative"
+    return "neutral"
+
+@lru_cache(maxsize=None)
+def analyzer_version() -> str:
+    """
+    Fingerprint of everything that decides a label (tone patterns, thresholds, VADER release);
+    stored per segment so `sttfast reanalyze` only revisits rows labelled by another version.
+    """
+    from importlib.metadata import PackageNotFoundError, version
+    try:
+        vader = version("vaderSentiment")
+    except PackageNotFoundError:
+        vader = "?"
+    spec = [TONE_PATTERNS, POSITIVE_MIN, NEGATIVE_MAX, MAX_TONES, vader]
+    return hashlib.sha1(json.dumps(spec, ensure_ascii=False).encode()).hexdigest()[:12]
+
+@lru_cache(maxsize=65536)
+def _label(txt: str) -> tuple[str, tuple[str, ...]]:
+    # memoized: short utterances ("yeah", "okay.", "thank you") repeat a lot
+    return _sentiment(_analyzer().polarity_scores(txt)["compound"]), tuple(_tone_tags(txt))
+
+def label_text(text: str):
+    sent, tones = _label((text or "").strip())
+    return {"sentiment": sent, "tones": list(tones)}
+
+def _label_chunk(texts: list[str]) -> list[tuple[str, tuple[str, ...]]]:
+    return [_label(t) for t in texts]
+
+def label_texts(texts: Iterable[str], pool: Optional[Executor] = None, min_parallel: int = 2000) -> list[dict]:
+    """
+    Batch form of label_text: each distinct text is scored once. With a process pool and at
+    least `min_parallel` distinct texts, the work is split across the pool in chunks.
+    """
+    norm = [(t or "").strip() for t in texts]
+    uniq = list(dict.fromkeys(norm))
+    metrics.inc("sentiment_segments_total", len(norm))
+    with metrics.span("sentiment"):
+        if pool is not None and len(uniq) >= min_parallel:
+            n = max(1, getattr(pool, "_max_workers", 1))
+            size = -(-len(uniq) // (n * 4))
+            labels = [lab for part in pool.map(_label_chunk, [uniq[i:i + size] for i in range(0, len(uniq), size)])
+                      for lab in part]
+        else:
+            labels = _label_chunk(uniq)
+    by_text = dict(zip(uniq, labels))
+    return [{"sentiment": by_text[t][0], "tones": list(by_text[t][1])} for t in norm]
@@ -0,0 +1,172 @@
+"""
+Warm model server: `sttfast serve` keeps models loaded; the CLI talks to it over localhost HTTP.
+
+Jobs are JSON only and carry decode options only: nothing a client sends makes the server
+write files (callers checkpoint the transcripts they get back). With `Settings.server_token`
+set, every request must present it as a bearer token; without one the server only binds
+loopback interfaces.
+"""
+import hmac, ipaddress, json, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib import request as urlreq
+from urllib.error import HTTPError, URLError
+
+from .config import Settings
+from . import metrics
+
+# decode options a client may pass; anything else (e.g. `checkpoint`) is refused
+JOB_KWARGS = frozenset({"preset", "vad", "language", "long_beam_size", "long_best_of", "batch_size", "words"})
+
+
+class ModelHost:
+    """Resident models keyed by (model_name, device, compute_type); one decode at a time per model."""
+
+    def __init__(self):
+        self._models: dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str, device: str, compute_type: str):
+        key = (model_name, device, compute_type)
+        with self._lock:
+            if key not in self._models:
+                from .asr import ASR
+                self._models[key] = (ASR(model_name, device, compute_type), threading.Lock())
+            return self._models[key]
+
+    def loaded(self) -> list[dict]:
+        return [{"model_name": m, "device": d, "compute_type": c} for m, d, c in self._models]
+
+
+def _handler(host: ModelHost, token: str | None = None):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, code: int, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _authorized(self) -> bool:
+            if token is None:
+                return True
+            got = self.headers.get("Authorization", "")
+            if hmac.compare_digest(got.encode("utf-8"), f"Bearer {token}".encode("utf-8")):
+                return True
+            self._reply(401, {"error": "missing or wrong token"})
+            return False
+
+        def do_GET(self):
+            if not self._authorized():
+                return
+            if self.path == "/health":
+                self._reply(200, {"ok": True, "models": host.loaded()})
+            elif self.path == "/metrics" and metrics.active() is not None:
+                metrics.active().reply(self)
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            if not self._authorized():
+                return
+            if self.path not in ("/transcribe_path", "/transcribe_clips"):
+                self._reply(404, {"error": "not found"})
+                return
+            if self.headers.get_content_type() != "application/json":
+                self._reply(415, {"error": "expected Content-Type: application/json"})
+                return
+            try:
+                job = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                kwargs = job.get("kwargs", {})
+                refused = sorted(set(kwargs) - JOB_KWARGS)
+            except (ValueError, AttributeError, TypeError) as e:
+                self._reply(400, {"error": f"bad job: {e}"})
+                return
+            if refused:
+                self._reply(400, {"error": f"unsupported options: {', '.join(refused)}"})
+                return
+            try:
+                asr, lock = host.get(**{k: job["model"][k] for k in ("model_name", "device", "compute_type")})
+                with metrics.span("server_request", route=self.path), lock:
+                    if self.path == "/transcribe_path":
+                        out = asr.transcribe_path(Path(job["path"]), **kwargs)
+                    else:
+                        out = asr.transcribe_clips([Path(p) for p in job["paths"]], **kwargs)
+            except Exception as e:
+                self._reply(500, {"error": f"{type(e).__name__}: {e}"})
+                return
+            self._reply(200, out)
+
+        def log_message(self, fmt, *args):    # keep the console quiet
+            pass
+
+    return Handler
+
+
+def _loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def serve(settings: Settings, host: str, port: int, preload: bool = True):
+    if not _loopback(host) and not settings.server_token:
+        raise ValueError(f"refusing to serve on {host} without a token (set STTFAST_SERVER_TOKEN)")
+    models = ModelHost()
+    if preload:
+        models.get(settings.model_name, settings.device, settings.compute_type)
+    httpd = ThreadingHTTPServer((host, port), _handler(models, settings.server_token))
+    try:
+        httpd.serve_forever()
+    finally:
+        httpd.server_close()
+
+
+def _auth(settings: Settings) -> dict:
+    return {"Authorization": f"Bearer {settings.server_token}"} if settings.server_token else {}
+
+
+class RemoteASR:
+    """Same call surface as ASR, executed by a running `sttfast serve`."""
+
+    def __init__(self, settings: Settings, host: str, port: int):
+        self.url = f"http://{host}:{port}"
+        self.model = {"model_name": settings.model_name, "device": settings.device,
+                      "compute_type": settings.compute_type}
+        self.headers = _auth(settings)
+
+    def _post(self, route: str, job: dict):
+        req = urlreq.Request(self.url + route, data=json.dumps({**job, "model": self.model}, default=str).encode("utf-8"),
+                             headers={**self.headers, "Content-Type": "application/json"}, method="POST")
+        try:
+            with urlreq.urlopen(req) as resp:
+                return json.loads(resp.read())
+        except HTTPError as e:
+            try:
+                msg = json.loads(e.read()).get("error")
+            except ValueError:
+                msg = str(e)
+            raise RuntimeError(f"model server: {msg}") from None
+
+    def transcribe_path(self, path: Path, checkpoint=None, **kw) -> dict:
+        # the checkpoint is the caller's to write, from the transcript that comes back
+        return self._post("/transcribe_path", {"path": str(Path(path).resolve()), "kwargs": kw})
+
+    def transcribe_clips(self, paths: list[Path], **kw) -> list[dict]:
+        return self._post("/transcribe_clips", {"paths": [str(Path(p).resolve()) for p in paths], "kwargs": kw})
+
+
+def connect(settings: Settings, timeout: float = 0.3) -> RemoteASR | None:
+    """Return a client if a server is listening on the configured port, else None."""
+    try:
+        req = urlreq.Request(f"http://{settings.server_host}:{settings.server_port}/health", headers=_auth(settings))
+        with urlreq.urlopen(req, timeout=timeout) as resp:
+            if not json.loads(resp.read()).get("ok"):
+                return None
+    except (URLError, OSError, ValueError):
+        return None
+    return RemoteASR(settings, settings.server_host, settings.server_port)
@@ -0,0 +1,120 @@
+"""
+Shard stores for multi-host transcription farms.
+
+With `Settings.shards_path` (or `--shard-dir`) set, each transcribe/watch run writes its own
+SQLite store, `<host>-<run>.sqlite`, on local disk instead of sharing `db_path` over a network
+share. `merge()` folds a shard into the central store through ATTACH with a handful of
+set-based statements, full-text indexing the new rows once per shard (db.deferred_fts).
+`search()` fans one query out over shards on a thread pool and merges the ranked pages.
+"""
+import heapq, itertools, os, socket
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Literal, Optional
+
+from .db import deferred_fts, open_readonly
+from .search import search_fuzzy, search_phrase
+
+def shard_path(shards_dir: Path, run: Path) -> Path:
+    return Path(shards_dir) / f"{socket.gethostname()}-{Path(run).name}.sqlite"
+
+def find_shards(paths: Iterable[Path]) -> list[Path]:
+    """Shard files given directly or as folders of *.sqlite."""
+    out = []
+    for p in map(Path, paths):
+        out += sorted(p.glob("*.sqlite")) if p.is_dir() else [p]
+    return out
+
+def merge(con, shard: Path) -> tuple[int, int]:
+    """
+    Fold one shard into `con`'s store and return its (files, segments). Files already in the
+    store (same path) are replaced, as when re-indexing, so merging a shard again is harmless;
+    its decode-speed stats are moved (added here, then cleared in the shard) so they count once.
+    Only `con`'s store is migrated: columns an older shard lacks are read as their defaults.
+    """
+    con.commit()
+    con.execute("ATTACH DATABASE ? AS shard", (str(shard),))
+    try:
+        words, analyzer = (_col(con, "segments", c) for c in ("words", "analyzer"))
+        mode = _col(con, "preset_stats", "mode", "'sequential'")
+        with deferred_fts(con), con:            # `with con`: one transaction, rolled back on error
+            con.execute("""
+              DELETE FROM main.segments WHERE file_id IN
+                (SELECT f.id FROM main.files f JOIN shard.files s ON s.path = f.path)
+            """)
+            con.execute("""
+              INSERT INTO main.files(path, parent, duration, language)
+              SELECT path, parent, duration, language FROM shard.files WHERE true
+              ON CONFLICT(path) DO UPDATE SET parent = excluded.parent, duration = excluded.duration,
+                                              language = excluded.language
+            """)
+            n_segs = con.execute(f"""
+              INSERT INTO main.segments(file_id, start, "end", text, sentiment, tones, words, analyzer)
+              SELECT f.id, s.start, s."end", s.text, s.sentiment, s.tones, {words}, {analyzer}
+              FROM shard.segments s JOIN shard.files sf ON sf.id = s.file_id JOIN main.files f ON f.path = sf.path
+              ORDER BY s.id
+            """).rowcount
+            con.execute(f"""
+              INSERT INTO main.preset_stats(preset, model, compute_type, device, mode, audio_s, decode_s, runs)
+              SELECT preset, model, compute_type, device, {mode}, audio_s, decode_s, runs FROM shard.preset_stats WHERE true
+              ON CONFLICT(preset, model, compute_type, device, mode) DO UPDATE SET audio_s = audio_s + excluded.audio_s,
+                decode_s = decode_s + excluded.decode_s, runs = runs + excluded.runs
+            """)
+            n_files = con.execute("SELECT COUNT(*) FROM shard.files").fetchone()[0]
+        # Cleared only once the main store has committed: in WAL mode a transaction spanning
+        # attached databases is not atomic across them, and a crash between the two commits must
+        # not lose the stats. The remaining window (main committed, shard not yet cleared) can at
+        # worst count them twice on the next merge.
+        con.execute("DELETE FROM shard.preset_stats")
+        con.commit()
+    finally:
+        con.execute("DETACH DATABASE shard")
+    return n_files, n_segs
+
+def _col(con, table: str, column: str, default: str = "NULL") -> str:
+    """`column` of the attached shard's `table` as a SELECT expression, or `default` if it predates it."""
+    has = any(r[1] == column for r in con.execute(f"PRAGMA shard.table_xinfo({table})"))
+    return column if has else default
+
+def remove(shard: Path):
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.unlink(f"{shard}{suffix}")
+        except FileNotFoundError:
+            pass
+
+def search(
+    shards: list[Path],
+    query: str,
+    fuzzy: bool = False,
+    limit: Optional[int] = 50,
+    offset: int = 0,
+    order: Literal["rank", "time"] = "rank",
+    workers: int = 8,
+    **filters,                                  # run, language, sentiment, tone, start_min, start_max, edits (fuzzy)
+) -> list[dict]:
+    """
+    One search per shard, in parallel on its own read-only connection, each returning its best
+    offset + limit hits; the pages are merged by rank (or file/time) and sliced. Hits carry their
+    "shard". bm25 scores come from each shard's own statistics, so relevance order across shards
+    is approximate; fuzzy ranks (edit distances) compare exactly.
+    """
+    top = None if limit is None else offset + limit
+
+    def one(fp: Path) -> list[dict]:
+        con = open_readonly(fp)                 # shards may sit on another host's read-only share
+        try:
+            fn = search_fuzzy if fuzzy else search_phrase
+            return [{**h, "shard": str(fp)} for h in fn(con, query, limit=top, order=order, **filters)]
+        finally:
+            con.close()
+
+    if not shards:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(shards)))) as ex:
+        pages = list(ex.map(one, shards))
+    if order == "rank":
+        key = lambda h: (h["rank"], h["shard"], h["segment_id"])
+    else:
+        key = lambda h: (h["file"], h["start"])
+    return list(itertools.islice(heapq.merge(*pages, key=key), offset, top))
@@ -0,0 +1,175 @@
+"""
+Folder watcher behind `sttfast watch`.
+
+New media under the watched directory is picked up from filesystem events (watchdog, i.e.
+inotify on Linux, when installed) or by polling, held until its size and mtime stop changing
+for `settle_s`, then released shortest-first through `ready()`, a blocking iterator the
+transcribe pipeline pulls from whenever it has room.
+"""
+import heapq, itertools, os, threading, time
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+try:                                    # optional: pip install sttfast-core[watch]
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:                     # polling fallback
+    FileSystemEventHandler = object
+    Observer = None
+
+# paths -> {path: probe metadata}; used for priority (duration) and handed on with the path
+Prober = Callable[[list[Path]], dict[Path, dict]]
+
+
+class _Events(FileSystemEventHandler):
+    def __init__(self, watcher: "DirWatcher"):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        for p in (getattr(event, "src_path", None), getattr(event, "dest_path", None)):
+            if p:
+                self.watcher.touch(Path(os.fsdecode(p)))
+
+
+class DirWatcher:
+    def __init__(
+        self,
+        root: Path,
+        exts: Iterable[str],
+        probe: Prober,
+        settle_s: float = 2.0,              # unchanged this long => fully written
+        poll_s: float = 1.0,                # rescan (polling) / settle check interval
+        ignore: Iterable[Path] = (),        # e.g. the output tree if it lives under root
+        existing: bool = True,              # also take files already there at start
+        use_events: bool = True,            # False forces polling
+    ):
+        self.root = Path(root)
+        self.exts = {e.lower() for e in exts}
+        self.probe, self.settle_s, self.poll_s = probe, settle_s, poll_s
+        self.ignore = [Path(p).resolve() for p in ignore]
+        self.polling = Observer is None or not use_events
+        self._pending: dict[Path, tuple[int, float, float]] = {}   # path -> (size, mtime, unchanged since)
+        self._done: dict[Path, tuple[int, float]] = {}             # released, with the stat they had
+        self._heap: list[tuple] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._observer = None
+        self._thread: Optional[threading.Thread] = None
+        if not existing:
+            for p in self._walk():
+                st = self._stat(p)
+                if st:
+                    self._done[p] = st
+
+    # --- discovery ---
+    def _wanted(self, p: Path) -> bool:
+        if p.suffix.lower() not in self.exts:
+            return False
+        rp = p.resolve()
+        return not any(rp.is_relative_to(ig) for ig in self.ignore)
+
+    def _walk(self) -> Iterator[Path]:
+        stack = [self.root]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for e in it:
+                        if e.is_dir(follow_symlinks=False):
+                            stack.append(Path(e.path))
+                        elif self._wanted(Path(e.path)):
+                            yield Path(e.path)
+            except OSError:
+                continue
+
+    @staticmethod
+    def _stat(p: Path) -> Optional[tuple[int, float]]:
+        try:
+            st = p.stat()
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime
+
+    def touch(self, p: Path):
+        """Note a (possibly still growing) file; it is released once it has settled."""
+        if not self._wanted(p):
+            return
+        st = self._stat(p)
+        if st is None or self._done.get(p) == st:
+            return
+        with self._cond:
+            cur = self._pending.get(p)
+            if cur is None or cur[:2] != st:
+                self._pending[p] = (*st, time.monotonic())
+
+    def _settle(self):
+        now, ready = time.monotonic(), []
+        with self._cond:
+            for p, (size, mtime, since) in list(self._pending.items()):
+                st = self._stat(p)
+                if st is None:
+                    del self._pending[p]                     # moved away / deleted mid-write
+                elif st != (size, mtime):
+                    self._pending[p] = (*st, now)
+                elif size > 0 and now - since >= self.settle_s:
+                    del self._pending[p]
+                    self._done[p] = st
+                    ready.append(p)
+        if not ready:
+            return
+        meta = self.probe(ready)
+        with self._cond:
+            for p in ready:
+                dur = meta.get(p, {}).get("duration")
+                # short clips first for latency; unknown durations after known ones; FIFO within ties
+                heapq.heappush(self._heap, (dur is None, dur or 0.0, next(self._seq), p, meta.get(p, {})))
+            self._cond.notify_all()
+
+    # --- lifecycle ---
+    def _loop(self):
+        first = True
+        while not self._stop.is_set():
+            if self.polling or first:
+                for p in self._walk():
+                    self.touch(p)
+                first = False
+            self._settle()
+            self._stop.wait(self.poll_s)
+
+    def start(self) -> "DirWatcher":
+        if not self.polling:
+            self._observer = Observer()
+            self._observer.schedule(_Events(self), str(self.root), recursive=True)
+            self._observer.start()
+        self._thread = threading.Thread(target=self._loop, name="watch", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        if self._thread is not None:
+            self._thread.join()
+
+    def queued(self) -> int:
+        return len(self._heap)
+
+    def ready(self) -> Iterator[tuple[Path, dict]]:
+        """
+        (path, probe metadata), shortest first, blocking until stop(); never yields a path twice.
+        Files still queued at stop() are left where they are for the next watch.
+        """
+        while True:
+            with self._cond:
+                while not self._heap and not self._stop.is_set():
+                    self._cond.wait()
+                if self._stop.is_set():
+                    return
+                *_, p, meta = heapq.heappop(self._heap)
+            yield p, meta
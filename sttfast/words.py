@@ -0,0 +1,57 @@
+"""
+Word timings packed per segment (opt-in `--words`).
+
+In transcripts a segment carries `"words": [[start, end, word], ...]` (absolute seconds). In the
+store they are packed into one BLOB per segment: three little-endian uint16 per word — the
+word's character offset in the segment text and its start/end in centiseconds from the segment
+start (Whisper's timestamp resolution is 20 ms). Word strings are not stored twice; they are
+sliced back out of the segment text.
+"""
+import sys
+from array import array
+from bisect import bisect_right
+from typing import Optional
+
+_MAX = 0xFFFF
+
+def _cs(t: float) -> int:
+    return max(0, min(_MAX, round(t * 100)))
+
+def pack(seg: dict) -> Optional[bytes]:
+    words = seg.get("words")
+    if not words:
+        return None
+    text, base = seg["text"], seg["start"]
+    out, pos = array("H"), 0
+    for start, end, word in words:
+        i = text.find(word, pos) if word else -1
+        if i < 0:                       # text was normalised differently; keep the running position
+            i = pos
+        out.extend((min(i, _MAX), _cs(start - base), _cs(end - base)))
+        pos = i + len(word)
+    if sys.byteorder == "big":
+        out.byteswap()
+    return out.tobytes()
+
+def _triples(blob: bytes) -> array:
+    a = array("H", blob)
+    if sys.byteorder == "big":
+        a.byteswap()
+    return a
+
+def unpack(blob: Optional[bytes], text: str, start: float) -> list[list]:
+    """[[start, end, word], ...] back from a packed BLOB (empty without word timings)."""
+    if not blob:
+        return []
+    a = _triples(blob)
+    offs = list(a[0::3]) + [len(text)]
+    return [[round(start + a[k + 1] / 100, 2), round(start + a[k + 2] / 100, 2), text[offs[j]:offs[j + 1]].strip()]
+            for j, k in enumerate(range(0, len(a), 3))]
+
+def word_at(blob: Optional[bytes], start: float, char_pos: int) -> Optional[float]:
+    """Start time of the word containing character `char_pos` of the segment text, if timings exist."""
+    if not blob:
+        return None
+    a = _triples(blob)
+    j = max(0, bisect_right(a[0::3], char_pos) - 1)
+    return round(start + a[3 * j + 1] / 100, 2)
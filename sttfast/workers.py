@@ -0,0 +1,95 @@
+"""Process pool with one ASR model per device (GPU index or CPU worker)."""
+import multiprocessing as mp, os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterable
+
+Device = tuple[str, int]    # ("cuda", 0), ("cpu", 0)
+
+def parse_devices(spec: str | None, workers: int, default_device: str) -> list[Device]:
+    """
+    "cuda:0,cuda:1" -> [("cuda", 0), ("cuda", 1)]. Without a spec, `workers` copies of
+    the default device; CUDA workers are spread round-robin over the visible GPUs.
+    """
+    if spec:
+        out = []
+        for part in spec.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            name, _, idx = part.partition(":")
+            out.append((name, int(idx) if idx else 0))
+        return out
+    n = max(1, workers)
+    if default_device == "cuda":
+        try:
+            import ctranslate2
+            gpus = max(1, ctranslate2.get_cuda_device_count())
+        except Exception:
+            gpus = 1
+        return [("cuda", i % gpus) for i in range(n)]
+    return [(default_device, 0)] * n
+
+def cpu_threads_for(devices: list[Device]) -> int:
+    """Split the cores between CPU workers so they don't oversubscribe each other."""
+    n_cpu = sum(1 for d, _ in devices if d == "cpu")
+    if n_cpu <= 1:
+        return 0
+    return max(1, (os.cpu_count() or 1) // n_cpu)
+
+def longest_first(items: Iterable[Any], duration: Callable[[Any], float | None]) -> list[Any]:
+    """LPT order: longest jobs first minimizes makespan; unknown durations go first too."""
+    def key(x):
+        d = duration(x)
+        return -(d if d is not None else float("inf"))
+    return sorted(items, key=key)
+
+
+_asr = None
+
+def _init(devices, model_name: str, compute_type: str, cpu_threads: int):
+    global _asr
+    from .asr import ASR
+    device, index = devices.get()
+    _asr = ASR(model_name, device, compute_type, device_index=index,
+               cpu_threads=cpu_threads if device == "cpu" else 0)
+
+def _call(method: str, args: tuple, kwargs: dict):
+    return getattr(_asr, method)(*args, **kwargs)
+
+
+class WorkerPool:
+    """Drop-in for ASR that dispatches each call to a free model process."""
+
+    def __init__(self, model_name: str, compute_type: str, devices: list[Device]):
+        ctx = mp.get_context("spawn")   # CUDA cannot be re-initialized in forked children
+        q = ctx.Queue()
+        for d in devices:
+            q.put(d)
+        self.size = len(devices)
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.size,
+            mp_context=ctx,
+            initializer=_init,
+            initargs=(q, model_name, compute_type, cpu_threads_for(devices)),
+        )
+
+    def transcribe_path(self, path, **kw) -> dict:
+        return self._pool.submit(_call, "transcribe_path", (path,), kw).result()
+
+    def transcribe_clips(self, paths, **kw) -> list[dict]:
+        return self._pool.submit(_call, "transcribe_clips", (paths,), kw).result()
+
+    def detect_language(self, audio) -> str:
+        return self._pool.submit(_call, "detect_language", (audio,), {}).result()
+
+    def transcribe_window(self, audio, offset, **kw) -> dict:
+        return self._pool.submit(_call, "transcribe_window", (audio, offset), kw).result()
+
+    def close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
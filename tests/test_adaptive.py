@@ -0,0 +1,119 @@
+from types import SimpleNamespace as NS
+
+import numpy as np
+
+from sttfast.asr import ASR, SAMPLE_RATE, low_confidence, meet_target, preset_for_duration
+
+def _seg(start, end, text, logprob=-0.2, ratio=1.5, no_speech=0.01):
+    return NS(start=start, end=end, text=text, avg_logprob=logprob, compression_ratio=ratio, no_speech_prob=no_speech)
+
+class FakeModel:
+    """Greedy pass has one shaky run (2-6s); the beam pass returns a confident rewrite of it."""
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, **kw):
+        self.calls.append(kw)
+        info = NS(language="en", duration=len(audio) / SAMPLE_RATE)
+        if "clip_timestamps" in kw:
+            a, b = kw["clip_timestamps"]
+            return iter([_seg(a, b, " budget review tomorrow", logprob=-0.3)]), info
+        return iter([
+            _seg(0.0, 2.0, " hello team"),
+            _seg(2.0, 4.0, " bud jet", logprob=-1.4),
+            _seg(4.0, 6.0, " re view re view re view", ratio=3.1),
+            _seg(6.0, 8.0, " [noise]", logprob=-1.5, no_speech=0.9),
+            _seg(8.0, 9.0, " thanks"),
+        ]), info
+
+def test_low_confidence_flags_logprob_and_repetition_not_silence():
+    assert low_confidence(_seg(0, 1, "x", logprob=-1.2))
+    assert low_confidence(_seg(0, 1, "x", ratio=2.8))
+    assert not low_confidence(_seg(0, 1, "x", logprob=-1.2, no_speech=0.95))
+    assert not low_confidence(_seg(0, 1, "x"))
+
+def test_adaptive_redecodes_only_the_shaky_run():
+    asr = ASR.__new__(ASR)
+    asr.model = FakeModel()
+    meta, segs = asr.stream_path(None, preset="adaptive", audio=np.zeros(9 * SAMPLE_RATE, dtype=np.float32))
+    segs = list(segs)
+    assert [s["text"] for s in segs] == ["hello team", "budget review tomorrow", "[noise]", "thanks"]
+    assert segs[1]["start"] == 2.0 and segs[1]["end"] == 6.0
+    beam = asr.model.calls[1]
+    assert beam["clip_timestamps"] == [2.0, 6.0] and beam["beam_size"] > 1 and beam["language"] == "en"
+    assert len(asr.model.calls) == 2 and meta["preset_used"] == "adaptive" and meta["redecoded_s"] == 4.0
+
+def test_meet_target_steps_down_the_ladder():
+    assert meet_target("long", {}, 0.2) == "long"                                  # nothing measured yet
+    assert meet_target("long", {"long": 0.5}, 0.2) == "adaptive"
+    assert meet_target("long", {"long": 0.5, "adaptive": 0.3}, 0.2) == "standard"
+    assert meet_target("long", {"long": 0.5}, 0.0) == "long"                       # target off
+    assert meet_target("short", {"short": 9.0}, 0.2) == "short"
+    assert preset_for_duration(5.0, "adaptive") == "adaptive"
+
+def test_record_rtf_accumulates(tmp_path):
+    from sttfast.db import open_db, record_rtf, preset_rtf
+    con = open_db(tmp_path / "t.sqlite")
+    record_rtf(con, "long", "tiny", "int8", "cpu", 100.0, 30.0)
+    record_rtf(con, "long", "tiny", "int8", "cpu", 300.0, 10.0)
+    record_rtf(con, "standard", "tiny", "int8", "cuda", 10.0, 1.0)
+    record_rtf(con, "long", "tiny", "int8", "cpu", 100.0, 2.0, mode="chunked")     # much faster: kept apart
+    assert preset_rtf(con, "tiny", "int8", "cpu") == {"long": 0.1}
+    assert preset_rtf(con, "tiny", "int8", "cpu", {"long": "chunked"}) == {"long": 0.02}
+    assert preset_rtf(con, "tiny", "int8", "cpu", {"long": "batched"}) == {}
+
+class FakeBatched:
+    """One segment per clip window, echoing where it sits in the packed buffer."""
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, clip_timestamps, language=None, **kw):
+        self.clips = clip_timestamps
+        self.calls.append((language, len(clip_timestamps)))
+        segs = [_seg(c["start"] + 0.5, c["end"] - 0.5, f" clip at {c['start']:g}") for c in clip_timestamps]
+        return iter(segs), NS(language=language)
+
+class FakeDetector:
+    """Detects "de" in clips whose samples are positive, "en" otherwise."""
+    def detect_language(self, audio):
+        return ("de" if audio[0] > 0 else "en"), 1.0, []
+
+def _clip_asr() -> ASR:
+    asr = ASR.__new__(ASR)
+    asr.model, asr._batched = FakeDetector(), FakeBatched()
+    return asr
+
+def test_batched_clips_map_back_and_long_clips_are_left_out():
+    asr = _clip_asr()
+    pcm = [np.zeros(int(s * SAMPLE_RATE), dtype=np.float32) for s in (4.0, 45.0, 2.0)]
+    out = asr.transcribe_clips(pcm)
+    assert out[1] is None                               # > CLIP_MAX_S: decoded per file instead
+    assert [c["start"] for c in asr._batched.clips] == [0.0, 5.0]
+    assert out[0]["duration"] == 4.0 and out[2]["duration"] == 2.0
+    assert out[0]["segments"] == [{"start": 0.5, "end": 3.5, "text": "clip at 0"}]
+    assert out[2]["segments"] == [{"start": 0.5, "end": 1.5, "text": "clip at 5"}]
+    assert asr.transcribe_clips(pcm[1:2]) == [None]
+
+def test_batched_clips_are_packed_per_detected_language():
+    asr = _clip_asr()
+    pcm = [np.full(int(s * SAMPLE_RATE), v, dtype=np.float32) for s, v in ((3.0, 0.0), (2.0, 0.1), (4.0, 0.0))]
+    out = asr.transcribe_clips(pcm)
+    assert asr._batched.calls == [("en", 2), ("de", 1)]
+    assert [r["language"] for r in out] == ["en", "de", "en"]
+    assert out[2]["segments"] == [{"start": 0.5, "end": 3.5, "text": "clip at 4"}]
+    asr._batched.calls.clear()
+    assert [r["language"] for r in asr.transcribe_clips(pcm, language="fr")] == ["fr"] * 3
+    assert asr._batched.calls == [("fr", 3)]                    # a hint: one batch, nothing detected
+
+def test_decode_time_leaves_out_waiting_on_downstream():
+    from sttfast.cli import _timed
+    now = [0.0]                         # a fake clock: only what the test advances counts
+
+    def decoder():
+        for i in range(10):
+            now[0] += 1.0               # decoding one segment
+            yield i
+    busy = [0.5]                        # already spent, e.g. this file's share of a batch
+    for _ in _timed(decoder(), busy, clock=lambda: now[0]):
+        now[0] += 8.0                   # a slow writer holds each piece
+    assert busy == [10.5] and now[0] == 90.0
@@ -0,0 +1,46 @@
+import os, threading
+from pathlib import Path
+
+import numpy as np
+
+from sttfast.audio import PcmBudget, load_pcm, pcm_duration, write_audio_copy
+from sttfast.bench import synth_wav
+
+def test_load_pcm_resamples_to_16k_mono(tmp_path: Path):
+    src = synth_wav(tmp_path / "a.wav", 2.0, rate=8000)
+    pcm = load_pcm(src)
+    assert pcm.dtype == np.float32 and pcm.ndim == 1
+    assert abs(pcm_duration(pcm) - 2.0) < 0.05
+
+def test_audio_copy_roundtrips(tmp_path: Path):
+    pcm = load_pcm(synth_wav(tmp_path / "a.wav", 1.5))
+    out = write_audio_copy(pcm, tmp_path / "material" / "clip.mp4")
+    assert out.suffix in (".flac", ".wav") and out.stem == "clip"
+    again = load_pcm(out)
+    assert len(again) == len(pcm) and np.abs(again - pcm).max() < 1e-3
+
+def test_load_pcm_survives_ffmpeg_flooding_stderr(tmp_path: Path, monkeypatch):
+    fake = tmp_path / "bin" / "ffmpeg"
+    fake.parent.mkdir()
+    # far more than a pipe buffer of warnings before any samples
+    fake.write_text("#!/bin/sh\nhead -c 1000000 /dev/zero | tr '\\0' w >&2\nhead -c 64000 /dev/zero\n")
+    fake.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{fake.parent}:{os.environ['PATH']}")
+    assert len(load_pcm(tmp_path / "any.mp4")) == 16000
+
+def test_pcm_budget_caps_buffers_in_flight(tmp_path: Path):
+    src = synth_wav(tmp_path / "a.wav", 0.5)
+    budget, got = PcmBudget(1), []
+    budget.load(src)
+    t = threading.Thread(target=lambda: got.append(budget.load(src)))
+    t.start()
+    t.join(0.2)
+    assert t.is_alive() and not got             # waits for the first buffer to be handed over
+    budget.release()
+    t.join(5)
+    assert len(got) == 1
+    t = threading.Thread(target=budget.load, args=(src,))
+    t.start()
+    budget.close()                              # an aborting run lets waiters through
+    t.join(5)
+    assert not t.is_alive()
@@ -0,0 +1,40 @@
+import wave
+from pathlib import Path
+
+import pytest
+from sttfast import bench
+
+def test_synth_wav_length(tmp_path: Path):
+    wav = bench.synth_wav(tmp_path / "s.wav", 2.5)
+    with wave.open(str(wav)) as wf:
+        assert wf.getnframes() == 40000 and wf.getframerate() == 16000
+
+def test_cpu_benchmarks_report_rates():
+    sent = bench.bench_sentiment(200)
+    assert sent["segments_per_s"] > 0 and sent["speedup"] == sent["baseline_seconds"] / sent["seconds"]
+    assert bench.bench_insert(rows=1000, per_file=250)["rows"] == 1000
+    w = bench.bench_words(rows=1000, per_file=250)
+    assert w["words"]["bytes"] > w["segments"]["bytes"] and w["bytes_per_word"] > 0
+    s = bench.bench_search(rows=1000, queries=5)
+    assert 0 < s["p50_ms"] <= s["max_ms"]
+    f = bench.bench_fuzzy(rows=1000, queries=5, per_file=250)
+    assert f["bytes"]["trigram_index"] > f["bytes"]["words_index"] > 0 and f["fuzzy"]["recall"] > 0.5
+
+def test_compare_matches_numeric_metrics():
+    old = {"meta": {"sttfast": "0.1"}, "insert": {"rows_per_s": 100.0}, "decode": {"skipped": "offline"}}
+    new = {"meta": {"sttfast": "0.2"}, "insert": {"rows_per_s": 150.0}, "search": {"p50_ms": 1.0}}
+    assert bench.compare(old, new) == [("insert.rows_per_s", 100.0, 150.0)]
+
+@pytest.mark.timeout(300)
+def test_decode_rtf_tiny_cpu():
+    try:
+        res = bench.bench_decode(seconds=5.0, presets=("short", "long"))
+    except Exception as e:
+        pytest.skip(f"ASR tiny model not available or download failed: {e}")
+    assert set(res["presets"]) == {"short", "long"}
+    assert all(p["rtf"] > 0 for p in res["presets"].values())
+
+def test_sentiment_baseline_labels_like_the_current_path():
+    from sttfast.sentiment import label_text
+    texts = [s["text"] for s in bench.synth_segments(300)] + ["", "Ugh!! I guess?", "DEFINITELY happy 😊", "sorry..."]
+    assert [bench.baseline_label(t) for t in texts] == [label_text(t) for t in texts]
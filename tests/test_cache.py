@@ -0,0 +1,34 @@
+import shutil
+from pathlib import Path
+
+from sttfast.cache import TranscriptCache, cache_key, content_hash
+
+def test_content_hash_follows_content_not_name(tmp_path: Path):
+    a = tmp_path / "a.wav"
+    a.write_bytes(b"\x01" * 5_000_000)
+    b = tmp_path / "sub_b.wav"
+    shutil.copy(a, b)
+    assert content_hash(a) == content_hash(b)
+    b.write_bytes(b"\x01" * 4_999_999 + b"\x02")
+    assert content_hash(a) != content_hash(b)
+
+def test_cache_key_depends_on_decode_params():
+    k1 = cache_key("h", "tiny", "int8", "short", {"beam_size": 1})
+    assert k1 == cache_key("h", "tiny", "int8", "short", {"beam_size": 1})
+    assert k1 != cache_key("h", "tiny", "int8", "short", {"beam_size": 3})
+    assert k1 != cache_key("h", "tiny", "float16", "short", {"beam_size": 1})
+
+def test_cache_roundtrip_and_lru_eviction(tmp_path: Path):
+    c = TranscriptCache(tmp_path / "c.sqlite", max_mb=1)
+    c.max_bytes = 2000
+    res = {"language": "en", "duration": 1.0, "segments": [{"start": 0, "end": 1, "text": "hi"}]}
+    c.put("a", res)
+    assert c.get("a") == res
+    assert c.get("missing") is None
+    big = {"segments": [{"text": str(i) * 50} for i in range(200)]}   # compresses, but not to nothing
+    for k in ("b", "c", "d"):
+        c.put(k, {**big, "k": k})
+    assert c.get("d") is not None
+    total = c.con.execute("SELECT SUM(size) FROM decode_cache").fetchone()[0]
+    assert total <= c.max_bytes
+    c.close()
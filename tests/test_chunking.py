@@ -0,0 +1,47 @@
+import threading
+
+import numpy as np
+
+import sttfast.asr as asr_mod
+from sttfast.asr import SAMPLE_RATE, plan_windows, stitch, transcribe_chunked
+
+def test_plan_windows_cuts_only_in_silence():
+    speech = [(0.0, 100.0), (102.0, 250.0), (254.0, 400.0), (401.0, 700.0)]
+    w = plan_windows(speech, 720.0, target_s=200)
+    assert w == [(0.0, 101.0), (101.0, 252.0), (252.0, 400.5), (400.5, 720.0)]
+    assert plan_windows([(0.0, 500.0)], 500.0, target_s=60) == [(0.0, 500.0)]
+    assert plan_windows([], 30.0) == [(0.0, 30.0)]
+
+def test_stitch_drops_boundary_repeats_and_keeps_order():
+    a = [{"start": 0.0, "end": 4.0, "text": "hello there"}, {"start": 4.0, "end": 9.0, "text": "general kenobi"}]
+    b = [{"start": 8.5, "end": 10.0, "text": "General Kenobi."}, {"start": 8.8, "end": 12.0, "text": "you are bold"}]
+    out = stitch([a, b])
+    assert [s["text"] for s in out] == ["hello there", "general kenobi", "you are bold"]
+    assert [s["start"] for s in out] == sorted(s["start"] for s in out) and out[-1]["start"] == 9.0
+
+def test_transcribe_chunked_runs_windows_concurrently_in_order(monkeypatch):
+    monkeypatch.setattr(asr_mod, "speech_windows", lambda audio, target_s: [(0.0, 10.0), (10.0, 20.0), (20.0, 30.0)])
+    barrier = threading.Barrier(3, timeout=5)     # deadlocks unless all three windows run at once
+
+    detected, used = [], []
+
+    class Fake:
+        def detect_language(self, audio):
+            detected.append(len(audio))
+            return "de"
+
+        def transcribe_window(self, audio, offset, preset, language=None, **kw):
+            barrier.wait()
+            assert len(audio) == 10 * SAMPLE_RATE and preset == "long"
+            used.append(language)
+            # left to itself, each window would pick its own language
+            return {"language": language or f"x{offset:.0f}",
+                    "segments": [{"start": offset + 1, "end": offset + 2, "text": f"at {offset:.0f}"}]}
+
+    res = transcribe_chunked(Fake(), None, 3, audio=np.zeros(30 * SAMPLE_RATE, dtype=np.float32))
+    assert [s["text"] for s in res["segments"]] == ["at 0", "at 10", "at 20"]
+    assert (res["chunks"], res["preset_used"], res["duration"]) == (3, "long", 30.0)
+    assert detected == [30 * SAMPLE_RATE] and used == ["de"] * 3 and res["language"] == "de"
+    barrier.reset()
+    res = transcribe_chunked(Fake(), None, 3, audio=np.zeros(30 * SAMPLE_RATE, dtype=np.float32), language="fr")
+    assert len(detected) == 1 and used[3:] == ["fr"] * 3 and res["language"] == "fr"
@@ -0,0 +1,51 @@
+from pathlib import Path
+
+import numpy as np
+
+from sttfast import columnar
+from sttfast.db import open_db, insert_file, insert_segments
+
+def _store(tmp_path: Path):
+    con = open_db(tmp_path / "t.sqlite")
+    for run, lang, tone in (("RunA", "en", "doubtful"), ("RunB", "fr", "happy")):
+        for n in range(2):
+            fid = insert_file(con, tmp_path / run / f"{n}.mp3", tmp_path / run, 900.0, lang)
+            insert_segments(con, fid, [
+                {"start": 100.0 * i, "end": 100.0 * i + 10, "text": f"t {i}",
+                 "sentiment": ("positive", "neutral", "negative")[i % 3], "tones": [tone, "sad"] if i % 2 else []}
+                for i in range(9)
+            ])
+    return con
+
+def test_aggregates_match_sql(tmp_path: Path):
+    con = _store(tmp_path)
+    paths, built = columnar.refresh(con, tmp_path / "cols")
+    assert built == 2 and all(p.exists() for p in paths)
+    cols = columnar.load(paths)
+    assert len(cols["start"]) == 36 and int(cols["n_files"]) == 4
+    by_run = columnar.sentiment_by_run(cols)
+    assert by_run[str(tmp_path / "RunA")] == {"positive": 6, "neutral": 6, "negative": 6}
+    assert columnar.speech_by_language(cols) == {"en": 180.0, "fr": 180.0}
+    edges, tones = columnar.tones_over_time(cols, bin_s=300)
+    assert list(edges) == [0, 300, 600]
+    sql = dict(con.execute("SELECT CAST(start / 300 AS INT), COUNT(*) FROM segments WHERE tones LIKE '%sad%' GROUP BY 1"))
+    assert tones["sad"].tolist() == [sql[b] for b in range(3)]
+    assert tones["doubtful"].sum() == tones["happy"].sum() == 8
+
+def test_snapshots_rebuild_only_when_stale(tmp_path: Path):
+    con = _store(tmp_path)
+    out = tmp_path / "cols"
+    columnar.refresh(con, out)
+    assert columnar.refresh(con, out)[1] == 0
+    fid = insert_file(con, tmp_path / "RunB" / "2.mp3", tmp_path / "RunB", 900.0, "fr")
+    insert_segments(con, fid, [{"start": 0.0, "end": 1.0, "text": "x", "sentiment": None, "tones": []}])
+    paths, built = columnar.refresh(con, out, ["RunB"])
+    assert built == 1 and len(paths) == 1
+    cols = columnar.load(paths)
+    assert columnar.sentiment_by_run(cols)[str(tmp_path / "RunB")] == {"positive": 6, "neutral": 6, "negative": 6, "none": 1}
+    assert cols["tones"].dtype == np.uint64
+    con.execute("UPDATE files SET language = 'de' WHERE id = ?", (fid,))      # file columns count too
+    con.commit()
+    paths, built = columnar.refresh(con, out, ["RunB"])
+    assert built == 1 and "de" in columnar.load(paths)["languages"]
+    assert columnar.refresh(con, out)[1] == 0
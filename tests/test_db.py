@@ -0,0 +1,152 @@
+import subprocess, sys
+from pathlib import Path
+
+import pytest
+
+from sttfast.db import open_db, insert_file, insert_segments
+
+def _segs(*texts):
+    return [{"start": float(i), "end": i + 1.0, "text": t, "sentiment": "neutral", "tones": []}
+            for i, t in enumerate(texts)]
+
+def _killed_mid_load(path: Path, file_id: int, text: str, host: str = ""):
+    """A process that dies inside deferred_fts, leaving its queued row and lease behind."""
+    proc = subprocess.run([sys.executable, "-c", f"""
+import os
+from pathlib import Path
+from sttfast.db import open_db, insert_segments, deferred_fts
+con = open_db(Path({str(path)!r}))
+with deferred_fts(con):
+    insert_segments(con, {file_id}, [dict(start=0.0, end=1.0, text={text!r})])
+    if {host!r}:
+        con.execute("UPDATE fts_lease SET host = ?", ({host!r},))
+        con.commit()
+    os._exit(9)
+"""])
+    assert proc.returncode == 9
+
+def test_reindex_same_path_replaces_segments(tmp_path: Path):
+    con = open_db(tmp_path / "t.sqlite")
+    other = insert_file(con, tmp_path / "other.mp3", tmp_path, 2.0, "en")
+    insert_segments(con, other, _segs("unrelated"))
+    fid = insert_file(con, tmp_path / "a.mp3", tmp_path, 2.0, "en")
+    insert_segments(con, fid, _segs("hello there", "general kenobi"))
+    insert_segments(con, other, _segs("bump lastrowid"))
+    again = insert_file(con, tmp_path / "a.mp3", tmp_path, 2.5, "en")
+    insert_segments(con, again, _segs("hello there", "general kenobi"))
+    assert again == fid
+    assert con.execute("SELECT COUNT(*) FROM segments WHERE file_id=?", (fid,)).fetchone()[0] == 2
+    assert con.execute("SELECT COUNT(*) FROM seg_fts WHERE seg_fts MATCH 'kenobi'").fetchone()[0] == 1
+    insert_file(con, tmp_path / "a.mp3", tmp_path, 2.5, None)     # reindexed from a transcript
+    assert con.execute("SELECT language FROM files WHERE id=?", (fid,)).fetchone() == ("en",)
+
+def test_reindex_command_keeps_language_and_skips_missing_media(tmp_path: Path, monkeypatch):
+    from typer.testing import CliRunner
+    from sttfast import cli
+    from sttfast.bench import synth_wav
+    run = tmp_path / "run"
+    for sub in ("transcripts", "material"):
+        (run / sub).mkdir(parents=True)
+    synth_wav(run / "material" / "a.wav", 2.0)
+    for stem in ("a", "gone"):
+        (run / "transcripts" / f"{stem}.jsonl").write_text('{"start": 0.0, "end": 1.0, "text": "hello"}\n')
+    monkeypatch.setattr(cli.S, "db_path", tmp_path / "t.sqlite")
+    con = open_db(tmp_path / "t.sqlite")
+    insert_file(con, run / "material" / "a.wav", run, 2.0, "fr")
+    con.commit()
+    out = CliRunner().invoke(cli.app, ["reindex", str(run)])
+    assert out.exit_code == 0 and "media missing" in out.output
+    assert con.execute("SELECT path, language FROM files").fetchall() == [(str(run / "material" / "a.wav"), "fr")]
+    assert con.execute("SELECT COUNT(*) FROM segments").fetchone()[0] == 1
+
+def test_open_db_records_schema_version_once(tmp_path: Path):
+    from sttfast.db import SCHEMA_VERSION
+    con = open_db(tmp_path / "t.sqlite")
+    con.close()
+    con = open_db(tmp_path / "t.sqlite")
+    assert con.execute("SELECT version FROM schema_version").fetchall() == [(SCHEMA_VERSION,)]
+
+def test_deferred_fts_indexes_bulk_rows(tmp_path: Path):
+    from sttfast.db import deferred_fts
+    con = open_db(tmp_path / "t.sqlite")
+    early = insert_file(con, tmp_path / "early.mp3", tmp_path, 1.0, "en")
+    insert_segments(con, early, _segs("alpha beta"))
+    with deferred_fts(con):
+        for n in range(3):
+            fid = insert_file(con, tmp_path / f"{n}.mp3", tmp_path, 1.0, "en")
+            insert_segments(con, fid, _segs(f"gamma {n}", "delta"), commit=False)
+    assert con.execute("SELECT COUNT(*) FROM seg_fts WHERE seg_fts MATCH 'delta'").fetchone()[0] == 3
+    assert con.execute("SELECT COUNT(*) FROM seg_fts WHERE seg_fts MATCH 'alpha'").fetchone()[0] == 1
+    # trigger is back for normal inserts
+    insert_segments(con, early, _segs("epsilon"))
+    assert con.execute("SELECT COUNT(*) FROM seg_fts WHERE seg_fts MATCH 'epsilon'").fetchone()[0] == 1
+    con.execute("INSERT INTO seg_fts(seg_fts) VALUES ('integrity-check')")
+
+def test_migrate_steps_are_atomic_and_tolerate_half_upgrades(tmp_path: Path, monkeypatch):
+    import sqlite3
+    from sttfast import db
+    # a store an older release left at v4 with the v5 column already added
+    con = sqlite3.connect(tmp_path / "old.sqlite")
+    for ddl in db.MIGRATIONS[:5]:
+        con.executescript(ddl)
+    con.execute("CREATE TABLE schema_version(version INTEGER NOT NULL)")
+    con.execute("INSERT INTO schema_version VALUES (4)")
+    con.commit()
+    con.close()
+    con = open_db(tmp_path / "old.sqlite")
+    assert con.execute("SELECT version FROM schema_version").fetchone()[0] == db.SCHEMA_VERSION
+    con.close()
+    # a failing step leaves the store at the previous version, without its partial changes
+    monkeypatch.setattr(db, "MIGRATIONS", db.MIGRATIONS + ["ALTER TABLE segments ADD COLUMN extra TEXT;\nSELECT * FROM nope;\n"])
+    monkeypatch.setattr(db, "SCHEMA_VERSION", db.SCHEMA_VERSION + 1)
+    with pytest.raises(sqlite3.OperationalError):
+        open_db(tmp_path / "old.sqlite")
+    con = sqlite3.connect(tmp_path / "old.sqlite")
+    assert con.execute("SELECT version FROM schema_version").fetchone()[0] == db.SCHEMA_VERSION - 1
+    assert not db._has_column(con, "segments", "extra")
+
+def test_deferred_fts_reindexing_top_ids_and_crash_recovery(tmp_path: Path):
+    from sttfast.db import deferred_fts
+    con = open_db(tmp_path / "t.sqlite")
+    fid = insert_file(con, tmp_path / "a.mp3", tmp_path, 1.0, "en")
+    insert_segments(con, fid, _segs("kenobi one"))
+    with deferred_fts(con):                       # the file holding the highest ids, re-indexed twice
+        for _ in range(2):
+            fid = insert_file(con, tmp_path / "a.mp3", tmp_path, 1.0, "en")
+            insert_segments(con, fid, _segs("kenobi two"), commit=False)
+    assert con.execute("SELECT COUNT(*) FROM seg_fts WHERE seg_fts MATCH 'kenobi'").fetchone()[0] == 1
+    assert con.execute("SELECT COUNT(*) FROM seg_fts WHERE seg_fts MATCH 'two'").fetchone()[0] == 1
+    # killed inside a bulk load: the next writing open indexes what was queued and restores the trigger
+    con.close()
+    _killed_mid_load(tmp_path / "t.sqlite", fid, "queued")
+    assert open_db(tmp_path / "t.sqlite").execute("SELECT COUNT(*) FROM fts_pending").fetchone()[0] == 1
+    con = open_db(tmp_path / "t.sqlite", recover=True)
+    insert_segments(con, fid, _segs("afterwards"))
+    for word in ("queued", "afterwards"):
+        assert con.execute("SELECT COUNT(*) FROM seg_fts WHERE seg_fts MATCH ?", (word,)).fetchone()[0] == 1
+    for t in ("seg_fts", "seg_tri"):
+        con.execute(f"INSERT INTO {t}({t}) VALUES ('integrity-check')")
+
+def test_only_writers_recover_and_never_from_a_live_load(tmp_path: Path):
+    from sttfast.db import deferred_fts, recover_fts
+    path = tmp_path / "t.sqlite"
+    loader = open_db(path)
+    fid = insert_file(loader, tmp_path / "a.mp3", tmp_path, 1.0, "en")
+    with deferred_fts(loader):
+        insert_segments(loader, fid, _segs("bulk"), commit=False)
+        loader.commit()
+        blocker = open_db(path)
+        blocker.execute("BEGIN IMMEDIATE")      # someone holds the write lock: no open may need it
+        reader = open_db(path)                  # e.g. `find` while another process bulk-loads
+        writer = open_db(path, recover=True)    # the lease's process is alive: left to finish
+        blocker.rollback()
+        for con in (reader, writer):
+            assert con.execute("SELECT COUNT(*) FROM fts_lease").fetchone()[0] == 1
+            assert con.execute("SELECT COUNT(*) FROM fts_pending").fetchone()[0] == 1
+    assert writer.execute("SELECT COUNT(*) FROM seg_fts WHERE seg_fts MATCH 'bulk'").fetchone()[0] == 1
+
+    _killed_mid_load(path, fid, "stranded", host="elsewhere")     # a load another host left behind
+    assert not recover_fts(open_db(path))
+    assert recover_fts(open_db(path), force=True)   # `reindex --recover`
+    assert loader.execute("SELECT COUNT(*) FROM seg_fts WHERE seg_fts MATCH 'stranded'").fetchone()[0] == 1
+    assert "fts_pending" not in loader.execute("SELECT sql FROM sqlite_master WHERE name = 'seg_ai'").fetchone()[0]
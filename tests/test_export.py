@@ -0,0 +1,72 @@
+import csv, json
+from pathlib import Path
+
+from sttfast.asr import to_srt
+from sttfast.db import open_db, insert_file, insert_segments
+from sttfast.export import TranscriptWriter, txt_line, write_segments, read_transcript, find_transcripts
+from sttfast.search import iter_segments, list_files
+
+SEGS = [{"start": i * 1.5, "end": i * 1.5 + 1.0, "text": f"line {i}", "sentiment": "neutral", "tones": ["doubtful"]}
+        for i in range(5)]
+
+def test_incremental_writer_matches_batch_exports(tmp_path: Path):
+    with TranscriptWriter(tmp_path / "inc" / "a") as w:
+        w.write(SEGS[:2])
+        w.write([])
+        w.write(SEGS[2:])
+    inc = tmp_path / "inc"
+    assert list(read_transcript(inc / "a.jsonl")) == SEGS
+    assert (inc / "a.txt").read_text() == "".join(txt_line(s) for s in SEGS)
+    assert (inc / "a.srt").read_text() == to_srt(SEGS)
+
+def test_incremental_writer_json_array(tmp_path: Path):
+    with TranscriptWriter(tmp_path / "a", json_array=True) as w:
+        w.write(SEGS)
+    assert json.loads((tmp_path / "a.json").read_text()) == SEGS
+    TranscriptWriter(tmp_path / "empty", json_array=True).close()
+    assert json.loads((tmp_path / "empty.json").read_text()) == []
+
+def test_read_transcript_skips_torn_line_and_prefers_jsonl(tmp_path: Path):
+    fp = tmp_path / "transcripts" / "a.jsonl"
+    with TranscriptWriter(fp.with_suffix("")) as w:
+        w.write(SEGS[:2])
+    with fp.open("a") as f:
+        f.write('{"start": 3.0, "end"')
+    assert list(read_transcript(fp)) == SEGS[:2]
+    for name in ("a", "b"):
+        with TranscriptWriter(tmp_path / "transcripts" / name, json_array=True) as w:
+            w.write(SEGS)
+    assert [p.name for p in find_transcripts(tmp_path)] == ["a.jsonl", "b.json"]
+
+def test_write_segments_formats(tmp_path: Path):
+    rows = [{"file": "x.wav", **s} for s in SEGS[:2]] + [{"file": "y.wav", **SEGS[2]}]
+    assert write_segments(iter(rows), tmp_path / "m.txt", "txt") == 3
+    txt = (tmp_path / "m.txt").read_text()
+    assert txt.startswith("# x.wav\n[0.00-1.00] line 0  (neutral; doubtful)\n") and "\n\n# y.wav\n" in txt
+    write_segments(rows, tmp_path / "m.jsonl", "jsonl", include_ts=False, include_tone=False)
+    assert [json.loads(l) for l in (tmp_path / "m.jsonl").read_text().splitlines()][0] == {"file": "x.wav", "text": "line 0"}
+    write_segments(SEGS, tmp_path / "a.srt", "srt")
+    assert (tmp_path / "a.srt").read_text() == to_srt(SEGS)
+    write_segments(rows, tmp_path / "m.vtt", "vtt")
+    assert (tmp_path / "m.vtt").read_text().startswith("WEBVTT\n\nNOTE x.wav\n\n00:00:00.000 --> 00:00:01.000\nline 0\n")
+    write_segments(rows, tmp_path / "m.csv", "csv")
+    with open(tmp_path / "m.csv", newline="") as fh:
+        table = list(csv.reader(fh))
+    assert table[0] == ["file", "start", "end", "text", "sentiment", "tones"]
+    assert table[3] == ["y.wav", "3.000", "4.000", "line 2", "neutral", "doubtful"]
+
+def test_iter_segments_streams_by_run_file_and_query(tmp_path: Path):
+    con = open_db(tmp_path / "t.sqlite")
+    for run in ("RunA", "RunB"):
+        for n in range(2):
+            fid = insert_file(con, tmp_path / run / f"{n}.mp3", tmp_path / run, 10.0, "en")
+            insert_segments(con, fid, [{"start": float(i), "end": i + 1.0, "text": f"{run} part {i}" + " budget" * (i % 2),
+                                        "sentiment": "neutral", "tones": ["doubtful"]} for i in (3, 1, 2, 0)])
+    rows = list(iter_segments(con, run="RunA", batch=3))
+    assert len(rows) == 8 and [r["start"] for r in rows[:4]] == [0.0, 1.0, 2.0, 3.0]
+    assert rows[0] == {"file": str(tmp_path / "RunA" / "0.mp3"), "start": 0.0, "end": 1.0, "text": "RunA part 0",
+                       "sentiment": "neutral", "tones": ["doubtful"]}
+    assert [r["start"] for r in iter_segments(con, query="budget")] == [1.0, 3.0] * 4
+    files = list_files(con, run="RunB")
+    assert [Path(p).name for _, p in files] == ["0.mp3", "1.mp3"]
+    assert "file" not in next(iter_segments(con, file_ids=[files[0][0]], with_file=False))
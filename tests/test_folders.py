@@ -0,0 +1,67 @@
+import errno, os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from sttfast import folders
+from sttfast.folders import place_media, copy_fast
+
+def _src(tmp_path: Path, rel: str, data: bytes = b"media") -> Path:
+    p = tmp_path / "in" / rel
+    p.parent.mkdir(parents=True, exist_ok=True)
+    p.write_bytes(data)
+    return p
+
+def test_name_collisions_get_distinct_stems(tmp_path: Path):
+    mat = tmp_path / "material"
+    a = place_media(_src(tmp_path, "day1/clip.mp3", b"1"), mat, move=True)
+    b = place_media(_src(tmp_path, "day2/clip.mp3", b"2"), mat, move=False)
+    c = place_media(_src(tmp_path, "day3/clip.wav", b"3"), mat, move=False)
+    assert [p.name for p in (a, b, c)] == ["clip.mp3", "clip_2.mp3", "clip_3.wav"]
+    assert [p.read_bytes() for p in (a, b, c)] == [b"1", b"2", b"3"]
+    assert not (tmp_path / "in" / "day1" / "clip.mp3").exists()
+
+def test_concurrent_placements_never_share_a_name(tmp_path: Path):
+    srcs = [_src(tmp_path, f"d{i}/take.flac", bytes([i])) for i in range(16)]
+    with ThreadPoolExecutor(8) as ex:
+        placed = list(ex.map(lambda s: place_media(s, tmp_path / "material", move=False), srcs))
+    assert len({p.stem for p in placed}) == 16
+    assert sorted(p.read_bytes() for p in placed) == [bytes([i]) for i in range(16)]
+
+def test_claims_list_the_folder_once(tmp_path: Path, monkeypatch):
+    mat = tmp_path / "material"
+    mat.mkdir()
+    (mat / "take.tar.gz").write_bytes(b"")          # already there: blocks `take` and `take.tar`
+    scans = []
+    real = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda p: scans.append(p) or real(p))
+    names = [folders.claim_name(mat, "take.mp3").name for _ in range(200)]
+    assert names[:2] == ["take_2.mp3", "take_3.mp3"] and len(set(names)) == 200
+    assert folders.claim_name(mat, "take.tar.wav").name == "take.tar_2.wav"
+    assert len(scans) == 1
+    folders.release_name(mat / "take_2.mp3")        # its placement failed: the name is free again
+    assert folders.claim_name(mat, "take.flac").name == "take_2.flac"
+
+def test_copy_prefers_links_and_falls_back_to_byte_copy(tmp_path: Path, monkeypatch):
+    src = _src(tmp_path, "a.mp4", b"x" * 100_000)
+    os.utime(src, (1_000_000, 1_000_000))
+    monkeypatch.setattr(folders, "_reflink", lambda s, d: False)     # tmp filesystems rarely reflink
+    assert copy_fast(src, tmp_path / "link.mp4", hardlink=True) == "hardlink"
+    assert (tmp_path / "link.mp4").stat().st_ino == src.stat().st_ino
+    assert copy_fast(src, tmp_path / "copy.mp4") == "copy"
+    out = tmp_path / "copy.mp4"
+    assert out.stat().st_ino != src.stat().st_ino and out.read_bytes() == src.read_bytes()
+    assert out.stat().st_mtime == 1_000_000
+
+    def no_range(*a):
+        raise OSError(errno.EXDEV, "cross-device")
+    monkeypatch.setattr(os, "copy_file_range", no_range, raising=False)
+    assert copy_fast(src, tmp_path / "fallback.mp4") == "copy"
+    assert (tmp_path / "fallback.mp4").read_bytes() == src.read_bytes()
+
+    def stalls(fi, fo, count):          # copies a little, then reports 0 with bytes still left
+        if os.fstat(fo).st_size:
+            return 0
+        return os.write(fo, os.pread(fi, 1000, 0))
+    monkeypatch.setattr(os, "copy_file_range", stalls, raising=False)
+    assert copy_fast(src, tmp_path / "short.mp4") == "copy"
+    assert (tmp_path / "short.mp4").read_bytes() == src.read_bytes()
@@ -0,0 +1,34 @@
+from pathlib import Path
+
+from sttfast.manifest import Manifest, load_result, read_checkpoint, write_checkpoint
+
+def test_manifest_replays_states(tmp_path: Path):
+    a, b = tmp_path / "a.mp3", tmp_path / "b.mp3"
+    m = Manifest.create(tmp_path, {"mode": "auto"}, [a, b])
+    m.mark(a, "placed", 0.5, placed=str(tmp_path / "material" / "a.mp3"))
+    m.mark(a, "decoded", 2.0)
+    m.mark(b, "placed", 0.1)
+    m.mark(a, "analyzed", 0.2)
+    m.mark(a, "indexed", 0.1)
+    assert m.add(a) == str(a)                       # already known: same job
+    m.mark(m.add(a, arrival=True), "placed", 0.1)   # saved again while watching: a new one
+    with (tmp_path / "manifest.jsonl").open("a") as f:
+        f.write('{"src": "torn')             # crash mid-append
+
+    again = Manifest(tmp_path)
+    assert again.options == {"mode": "auto"}
+    assert [e["key"] for e in again.pending()] == [str(b), f"{a}#2"]
+    assert again.files[f"{a}#2"]["src"] == str(a) and again.has(f"{a}#2", "placed")
+    assert again.has(a, "decoded") and not again.has(b, "decoded")
+    assert again.files[str(a)]["placed"].endswith("a.mp3")
+
+def test_checkpoint_roundtrip_ignores_torn_line(tmp_path: Path):
+    fp = tmp_path / ".partial" / "x.wav.jsonl"
+    result = {"language": "en", "duration": 9.0, "preset_used": "long",
+              "segments": [{"start": 0.0, "end": 1.0, "text": "a"}, {"start": 1.0, "end": 2.0, "text": "b"}]}
+    write_checkpoint(fp, result)
+    with fp.open("a") as f:
+        f.write('{"start": 2.0, "en')
+    header, segs = read_checkpoint(fp)
+    assert header["language"] == "en" and len(segs) == 2
+    assert load_result(fp) == result
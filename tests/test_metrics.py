@@ -0,0 +1,42 @@
+import json
+from pathlib import Path
+from urllib import request as urlreq
+
+from sttfast import metrics
+from sttfast.db import open_db, insert_file, insert_segments
+from sttfast.pipeline import Stage, run_pipeline
+
+def test_disabled_is_a_noop():
+    metrics.shutdown()
+    assert metrics.active() is None
+    with metrics.span("anything", x=1):
+        metrics.inc("n")
+        metrics.observe("t", 1.0)
+    assert metrics.span("a") is metrics.span("b")       # one shared null context
+
+def test_instrumented_run_writes_trace_textfile_and_http(tmp_path: Path):
+    trace, textfile = tmp_path / "trace.jsonl", tmp_path / "prom" / "sttfast.prom"
+    m = metrics.configure(trace=trace, textfile=textfile, port=0)
+    try:
+        con = open_db(tmp_path / "t.sqlite")
+        fid = insert_file(con, tmp_path / "a.wav", tmp_path, 2.0, "en")
+        insert_segments(con, fid, [{"start": 0.0, "end": 1.0, "text": "hi"}, {"start": 1.0, "end": 2.0, "text": "yo"}])
+        run_pipeline(range(5), [Stage("double", lambda x: 2 * x), Stage("keep", lambda x: x)])
+        with metrics.span("place", mode="copy"):
+            pass
+        body = urlreq.urlopen(m.url, timeout=5).read().decode()
+    finally:
+        metrics.shutdown()
+    assert "sttfast_db_rows_total 2" in body
+    assert "sttfast_db_commit_seconds_count 1" in body
+    assert 'sttfast_stage_items_total{stage="double"} 5' in body
+    assert 'sttfast_place_seconds_count{mode="copy"} 1' in body
+    assert "# TYPE sttfast_queue_depth gauge" in body
+    events = [json.loads(line) for line in trace.read_text().splitlines()]
+    assert events[-1]["event"] == "place" and events[-1]["mode"] == "copy" and events[-1]["dur_s"] >= 0
+    assert "sttfast_db_rows_total 2" in textfile.read_text()
+
+def test_label_values_are_escaped():
+    m = metrics.Metrics()
+    m.inc("files_failed_total", path='C:\\in\\"odd"\nname.wav')
+    assert 'sttfast_files_failed_total{path="C:\\\\in\\\\\\"odd\\"\\nname.wav"} 1' in m.render()
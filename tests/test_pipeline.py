@@ -0,0 +1,88 @@
+import threading, time
+
+import pytest
+from sttfast.pipeline import Stage, run_pipeline
+
+def test_pipeline_preserves_order_and_counts():
+    stages = [
+        Stage("a", lambda x: x + 1),
+        Stage("b", lambda x: (time.sleep(0.001), x * 2)[1]),
+        Stage("c", lambda x: None if x == 4 else x),   # drops one item
+    ]
+    out, stats = run_pipeline(range(5), stages, maxsize=1)
+    assert out == [2, 6, 8, 10]
+    assert [s.items for s in stats] == [5, 5, 5]
+    assert stats[1].busy_s > 0
+
+def test_pipeline_reraises_stage_error():
+    def boom(x):
+        if x == 3:
+            raise ValueError("bad item")
+        return x
+    with pytest.raises(ValueError, match="bad item"):
+        run_pipeline(range(100), [Stage("a", boom, workers=2), Stage("b", lambda x: x)], maxsize=2)
+
+def test_pipeline_stops_a_streaming_stage_once_a_later_one_fails():
+    made, closed = [], threading.Event()
+    def decode(x):
+        try:
+            for i in range(100):
+                made.append(i)
+                yield i
+        finally:
+            closed.set()
+    def write(c):
+        raise OSError("disk full")
+    with pytest.raises(OSError, match="disk full"):
+        run_pipeline([0], [Stage("decode", decode), Stage("write", write)], maxsize=1)
+    assert len(made) < 10 and closed.is_set()
+
+def test_pipeline_batches_items():
+    seen = []
+    def batch_fn(xs):
+        seen.append(len(xs))
+        return [x * 10 for x in xs]
+    out, stats = run_pipeline(range(7), [Stage("b", batch_fn, batch=3, linger_s=0.2)], maxsize=8)
+    assert out == [0, 10, 20, 30, 40, 50, 60]
+    assert stats[0].items == 7
+    assert max(seen) <= 3
+
+def test_pipeline_streams_generator_output():
+    def split(x):
+        for i in range(x):
+            yield (x, i)
+    out, stats = run_pipeline([2, 3], [Stage("split", split), Stage("id", lambda c: c)], maxsize=1)
+    assert out == [(2, 0), (2, 1), (3, 0), (3, 1), (3, 2)]
+    assert stats[0].items == 2 and stats[1].items == 5
+
+def test_pipeline_on_error_keeps_going_and_stop_ends_the_feed():
+    def flaky(x):
+        if x == 1:
+            raise ValueError("bad item")
+        yield x
+        if x == 3:
+            raise ValueError("failed mid-stream")
+        yield x
+    seen = []
+    stage = Stage("a", flaky, on_error=lambda x, e: seen.append((x, str(e))) or -x)
+    out, stats = run_pipeline(range(5), [stage, Stage("b", lambda x: x)], maxsize=1)
+    assert out == [0, 0, -1, 2, 2, 3, -3, 4, 4]
+    assert seen == [(1, "bad item"), (3, "failed mid-stream")]
+
+    def per_item(xs):                   # one output per input; a failing call fails them all
+        if 9 in xs:
+            raise ValueError("whole call")
+        return [(y for y in [x] if y != 4 or 1 / 0) for x in xs]
+    dropped = []
+    batched = Stage("b", per_item, batch=3, linger_s=0.2, on_error=lambda x, e: dropped.append(x))
+    assert run_pipeline(range(7), [batched], maxsize=8)[0] == [0, 1, 2, 3, 5, 6]
+    assert run_pipeline([8, 9], [batched], maxsize=8)[0] == [] and dropped == [4, 8, 9]
+
+    stopped = threading.Event()
+    def endless():
+        n = 0
+        while not stopped.is_set():
+            yield n
+            n += 1
+    with pytest.raises(ValueError, match="bad item"):
+        run_pipeline(endless(), [Stage("a", lambda x: flaky(x) if x == 1 else x)], stop=stopped.set)
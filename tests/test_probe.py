@@ -18,3 +18,63 @@ def test_get_duration_sec(tmp_path: Path):
     _write_tone_wav(f, seconds=1)
     dur = get_duration_sec(f)
     assert dur is None or abs(dur - 1.0) < 0.15  # if ffprobe missing, function may return None
+
+def _write_flac_header(path: Path, rate=44100, channels=2, total=88200):
+    bits = (rate << 44) | ((channels - 1) << 41) | (15 << 36) | total
+    info = struct.pack(">HH", 4096, 4096) + b"\0" * 6 + bits.to_bytes(8, "big") + b"\0" * 16
+    path.write_bytes(b"fLaC" + bytes([0x80, 0, 0, 34]) + info)
+
+def test_probe_media_reads_headers_in_process(tmp_path: Path, monkeypatch):
+    import sttfast.probe as probe
+    monkeypatch.setattr(probe, "_ffprobe_info", lambda p: (_ for _ in ()).throw(AssertionError("spawned")))
+    w = tmp_path / "a.wav"
+    _write_tone_wav(w, seconds=2, rate=8000)
+    m = probe.probe_media(w)
+    assert (m["sample_rate"], m["channels"], m["codec"], m["has_audio"]) == (8000, 1, "pcm", True)
+    assert abs(m["duration"] - 2.0) < 1e-6
+    f = tmp_path / "b.flac"
+    _write_flac_header(f)
+    m = probe.probe_media(f)
+    assert (m["sample_rate"], m["channels"], m["duration"]) == (44100, 2, 2.0)
+
+def test_probe_many_caches_by_size_and_mtime(tmp_path: Path, monkeypatch):
+    import os
+    import sttfast.probe as probe
+    from sttfast.db import open_db
+    con = open_db(tmp_path / "t.sqlite")
+    files = [tmp_path / f"{i}.wav" for i in range(3)]
+    for f in files:
+        _write_tone_wav(f)
+    calls = []
+    real = probe.probe_media
+    monkeypatch.setattr(probe, "probe_media", lambda p: calls.append(p) or real(p))
+    first = probe.probe_many(files, workers=2, con=con)
+    assert len(calls) == 3 and all(abs(first[f]["duration"] - 1.0) < 1e-6 for f in files)
+    assert probe.probe_many(files, con=con) == first and len(calls) == 3
+    _write_tone_wav(files[0], seconds=2)
+    os.utime(files[0], (0, 12345))
+    again = probe.probe_many(files, con=con)
+    assert calls[3:] == [files[0]] and abs(again[files[0]]["duration"] - 2.0) < 1e-6
+
+def test_probe_many_does_not_cache_unknown_durations(tmp_path: Path, monkeypatch):
+    import sttfast.probe as probe
+    from sttfast.db import open_db
+    con = open_db(tmp_path / "t.sqlite")
+    f = tmp_path / "a.mp4"
+    f.write_bytes(b"x")
+    monkeypatch.setattr(probe, "probe_media", lambda p: probe._empty())          # e.g. ffprobe missing
+    assert probe.probe_many([f], con=con)[f]["duration"] is None
+    assert con.execute("SELECT COUNT(*) FROM probe_cache").fetchone()[0] == 0
+    monkeypatch.setattr(probe, "probe_media", lambda p: {**probe._empty(), "duration": 3.0, "has_audio": True})
+    assert probe.probe_many([f], con=con)[f]["duration"] == 3.0                  # retried, now cached
+    assert con.execute("SELECT COUNT(*) FROM probe_cache").fetchone()[0] == 1
+
+def test_flac_without_a_length_falls_back_to_ffprobe(tmp_path: Path, monkeypatch):
+    import sttfast.probe as probe
+    f = tmp_path / "streamed.flac"
+    _write_flac_header(f, total=0)                      # 0 samples: length not recorded
+    monkeypatch.setattr(probe, "_ffprobe_info", lambda p: {**probe._empty(), "duration": 3.5, "has_audio": True})
+    assert probe.probe_media(f)["duration"] == 3.5
+    monkeypatch.setattr(probe, "_ffprobe_info", lambda p: probe._empty())   # no ffprobe: keep the header
+    m = probe.probe_media(f)
+    assert (m["duration"], m["sample_rate"], m["codec"]) == (None, 44100, "flac")
@@ -0,0 +1,42 @@
+from pathlib import Path
+
+from sttfast.db import open_db, insert_file, insert_segments
+from sttfast.reanalyze import reanalyze
+from sttfast.sentiment import analyzer_version, label_text
+
+TEXTS = ["I guess so?", "UGH!!! I'm so annoyed", "definitely happy 😊", "plain words"]
+
+def _store(tmp_path: Path):
+    con = open_db(tmp_path / "t.sqlite")
+    for run in ("RunA", "RunB"):
+        fid = insert_file(con, tmp_path / run / "a.mp3", tmp_path / run, 10.0, "en")
+        # correct labels, but from an unknown analyzer; one row deliberately wrong
+        segs = [{"start": float(i), "end": i + 1.0, "text": t, **label_text(t)} for i, t in enumerate(TEXTS)]
+        segs[1] = {**segs[1], "sentiment": "positive", "tones": []}
+        insert_segments(con, fid, segs)
+    return con
+
+def _fts(con) -> bytes:
+    return b"".join(b for (b,) in con.execute("SELECT block FROM seg_fts_data ORDER BY id"))
+
+def test_relabels_changed_rows_and_leaves_fts_alone(tmp_path: Path):
+    con = _store(tmp_path)
+    before = _fts(con)
+    out = reanalyze(tmp_path / "t.sqlite", chunk=3)
+    assert (out["scanned"], out["changed"], out["unchanged"]) == (8, 2, 6)
+    assert out["runs"] == {str(tmp_path / "RunA"), str(tmp_path / "RunB")}
+    rows = con.execute("SELECT sentiment, tones, analyzer FROM segments WHERE text LIKE 'UGH%'").fetchall()
+    assert rows == [("negative", '["annoyed"]', analyzer_version())] * 2
+    assert _fts(con) == before
+    assert con.execute("SELECT COUNT(*) FROM seg_fts WHERE seg_fts MATCH 'annoyed'").fetchone()[0] == 2
+
+def test_reruns_are_incremental(tmp_path: Path):
+    con = _store(tmp_path)
+    assert reanalyze(tmp_path / "t.sqlite", run="RunB")["scanned"] == 4
+    assert reanalyze(tmp_path / "t.sqlite")["scanned"] == 4        # only RunA left
+    assert reanalyze(tmp_path / "t.sqlite")["scanned"] == 0
+    fid = insert_file(con, tmp_path / "RunA" / "b.mp3", tmp_path / "RunA", 5.0, "en")
+    insert_segments(con, fid, [{"start": 0.0, "end": 1.0, "text": "maybe?", **label_text("maybe?")}],
+                    analyzer=analyzer_version())
+    assert reanalyze(tmp_path / "t.sqlite")["scanned"] == 0
+    assert reanalyze(tmp_path / "t.sqlite", force=True) == {"scanned": 9, "changed": 0, "unchanged": 9, "runs": set()}
@@ -0,0 +1,98 @@
+from pathlib import Path
+
+from sttfast.db import open_db, insert_file, insert_segments
+from sttfast.search import search_phrase, HL_START, HL_END
+
+def _store(tmp_path: Path):
+    con = open_db(tmp_path / "t.sqlite")
+    runs = {"RunA": "en", "RunB": "fr"}
+    for run, lang in runs.items():
+        for n in range(3):
+            fid = insert_file(con, tmp_path / run / f"{n}.mp3", tmp_path / run, 60.0, lang)
+            insert_segments(con, fid, [
+                {"start": 10.0 * i, "end": 10.0 * i + 5, "text": f"the budget meeting {run} {n} {i}" + " budget" * i,
+                 "sentiment": "negative" if i == 2 else "neutral", "tones": ["doubtful"] if i == 1 else []}
+                for i in range(4)
+            ])
+    return con
+
+def test_ranked_paged_and_keyset(tmp_path: Path):
+    con = _store(tmp_path)
+    allhits = list(search_phrase(con, "budget", limit=None))
+    assert len(allhits) == 24
+    assert [h["rank"] for h in allhits] == sorted(h["rank"] for h in allhits)
+    page2 = list(search_phrase(con, "budget", limit=5, offset=5))
+    assert [h["segment_id"] for h in page2] == [h["segment_id"] for h in allhits[5:10]]
+    last = allhits[4]
+    keyset = list(search_phrase(con, "budget", limit=5, after=(last["rank"], last["segment_id"])))
+    assert [h["segment_id"] for h in keyset] == [h["segment_id"] for h in allhits[5:10]]
+    assert HL_START + "budget" + HL_END in allhits[0]["snippet"]
+
+def test_fuzzy_pages_past_the_candidate_cap(tmp_path: Path):
+    from sttfast.search import search_fuzzy
+    con = open_db(tmp_path / "t.sqlite")
+    fid = insert_file(con, tmp_path / "Noise" / "n.mp3", tmp_path / "Noise", 60.0, "en")
+    # rows sharing the query's pieces without matching it, ahead of the real hits in id order
+    insert_segments(con, fid, [{"start": float(i), "end": i + 1.0, "text": t, "sentiment": "neutral", "tones": []}
+                               for i, t in enumerate(["budget notes", "meeting notes"] * 100)])
+    con = _store(tmp_path)                       # the same file: 24 real hits after the noise
+    full = list(search_fuzzy(con, "budgit meating", limit=None))
+    assert len(full) == 24
+    for offset in (0, 7, 20):
+        page = list(search_fuzzy(con, "budgit meating", limit=4, offset=offset, candidates=5))
+        assert [h["segment_id"] for h in page] == [h["segment_id"] for h in full[offset:offset + 4]]
+
+def test_filters(tmp_path: Path):
+    con = _store(tmp_path)
+    assert {h["parent"] for h in search_phrase(con, "meeting", run="RunB", limit=None)} == {str(tmp_path / "RunB")}
+    assert {h["language"] for h in search_phrase(con, "meeting", language="en", limit=None)} == {"en"}
+    assert len(list(search_phrase(con, "meeting", sentiment="negative", limit=None))) == 6
+    assert len(list(search_phrase(con, "meeting", tone="doubtful", run="RunA", limit=None))) == 3
+    hits = list(search_phrase(con, "meeting", start_min=15, start_max=25, limit=None))
+    assert {h["start"] for h in hits} == {20.0}
+    by_time = list(search_phrase(con, "meeting", order="time", limit=4))
+    assert [h["start"] for h in by_time] == [0.0, 10.0, 20.0, 30.0]
+
+def test_run_filter_is_exact(tmp_path: Path):
+    con = _store(tmp_path)
+    for run in ("Run_B", "Run%"):                  # LIKE wildcards in names match only themselves
+        fid = insert_file(con, tmp_path / run / "x.mp3", tmp_path / run, 60.0, "en")
+        insert_segments(con, fid, [{"start": 0.0, "end": 1.0, "text": "meeting", "sentiment": "neutral", "tones": []}])
+    assert {h["parent"] for h in search_phrase(con, "meeting", run="Run_B", limit=None)} == {str(tmp_path / "Run_B")}
+    assert {h["parent"] for h in search_phrase(con, "meeting", run="Run%", limit=None)} == {str(tmp_path / "Run%")}
+    assert len(list(search_phrase(con, "meeting", run="runb", limit=None))) == 12          # names ignore case
+    assert len(list(search_phrase(con, "meeting", run=str(tmp_path / "RunA"), limit=None))) == 12
+    assert not list(search_phrase(con, "meeting", run="unA", limit=None))
+
+def test_cli_run_given_as_a_relative_path(tmp_path: Path, monkeypatch):
+    from typer.testing import CliRunner
+    from sttfast import cli
+    _store(tmp_path).close()
+    monkeypatch.setattr(cli.S, "db_path", tmp_path / "t.sqlite")
+    monkeypatch.chdir(tmp_path.parent)
+    run = f"{tmp_path.name}/RunA"                  # e.g. `--run out/run1`
+    out = CliRunner().invoke(cli.app, ["find", "meeting", "--run", run, "--limit", "50"])
+    assert out.exit_code == 0 and out.output.count("/RunA/") == 12 and "RunB" not in out.output
+    out = CliRunner().invoke(cli.app, ["export", "--run", run, "--format", "jsonl", "-o", str(tmp_path / "a.jsonl")])
+    assert out.exit_code == 0 and len((tmp_path / "a.jsonl").read_text().splitlines()) == 12
+
+def test_fuzzy_typos_prefix_and_sync(tmp_path: Path):
+    from sttfast.search import search_fuzzy, complete, edit_distance
+    con = _store(tmp_path)
+    fid = insert_file(con, tmp_path / "RunA" / "k.mp3", tmp_path / "RunA", 60.0, "en")
+    insert_segments(con, fid, [{"start": 1.0, "end": 2.0, "text": "We deployed Kubernettes on Friday."},
+                               {"start": 3.0, "end": 4.0, "text": "the kubernetes cluster"}])
+    assert edit_distance("kitten", "sitting") == 3 and edit_distance("kuber", "kubernetes", prefix=True) == 0
+    hits = list(search_fuzzy(con, "kubernetes", limit=None))
+    assert [(h["text"], h["distance"]) for h in hits] == [("the kubernetes cluster", 0),
+                                                         ("We deployed Kubernettes on Friday.", 1)]
+    assert HL_START + "Kubernettes" + HL_END in hits[1]["snippet"]
+    assert len(list(search_fuzzy(con, "kuber", limit=None))) == 2                   # last word completes
+    assert len(list(search_fuzzy(con, "kubrnetes clustr", limit=None))) == 1
+    assert len(list(search_fuzzy(con, "budgit meating", run="RunB", limit=None))) == 12
+    assert list(search_fuzzy(con, "kubernetes", edits=0, limit=None))[0]["distance"] == 0
+    assert complete(con, "kub") == [("kubernetes", 1), ("kubernettes", 1)]
+    # the trigram index follows updates and deletes through the triggers
+    con.execute("UPDATE segments SET text = 'nothing here' WHERE file_id = ?", (fid,))
+    assert list(search_fuzzy(con, "kubernetes")) == []
+    con.execute("INSERT INTO seg_tri(seg_tri) VALUES ('integrity-check')")
@@ -0,0 +1,14 @@
+from sttfast.sentiment import label_text, label_texts
+
+def test_tones_and_polarity():
+    assert label_text("UGH!!! I'm so annoyed") == {"sentiment": "negative", "tones": ["annoyed"]}
+    assert label_text("I guess so?")["tones"] == ["doubtful"]
+    assert label_text("definitely happy 😊")["tones"] == ["confident", "happy"]
+    assert label_text("") == {"sentiment": "neutral", "tones": []}
+
+def test_batch_matches_single_and_copies_lists():
+    texts = ["maybe?", "I'm sad and sorry", "maybe?", None, "  great, thrilled!  "]
+    out = label_texts(texts)
+    assert out == [label_text(t) for t in texts]
+    out[0]["tones"].append("mutated")
+    assert label_texts(["maybe?"])[0]["tones"] == ["doubtful"]
@@ -0,0 +1,67 @@
+import threading
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+from sttfast.config import Settings
+from sttfast.server import ModelHost, RemoteASR, _handler
+
+class _FakeASR:
+    def transcribe_path(self, path, **kw):
+        if kw.get("preset") == "boom":
+            raise ValueError("bad preset")
+        return {"language": "en", "duration": 1.0, "preset_used": kw.get("preset"),
+                "segments": [{"start": 0.0, "end": 1.0, "text": Path(path).name}]}
+
+def test_remote_roundtrip(tmp_path: Path, monkeypatch):
+    host = ModelHost()
+    monkeypatch.setattr(host, "get", lambda **_: (_FakeASR(), threading.Lock()))
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _handler(host))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        remote = RemoteASR(Settings(), "127.0.0.1", httpd.server_address[1])
+        out = remote.transcribe_path(tmp_path / "a.wav", preset="short")
+        assert out["preset_used"] == "short"
+        assert out["segments"][0]["text"] == "a.wav"
+        with pytest.raises(RuntimeError, match="bad preset"):
+            remote.transcribe_path(tmp_path / "a.wav", preset="boom")
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+def test_server_refuses_file_writing_options_bad_content_type_and_missing_token(tmp_path: Path, monkeypatch):
+    from urllib import request as urlreq
+    from urllib.error import HTTPError
+    from sttfast.server import serve
+    seen = []
+    host = ModelHost()
+    monkeypatch.setattr(host, "get", lambda **m: (seen.append(m) or _FakeASR(), threading.Lock()))
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _handler(host, token="s3cret"))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    port = httpd.server_address[1]
+
+    def post(body: bytes, **headers) -> int:
+        req = urlreq.Request(f"http://127.0.0.1:{port}/transcribe_path", data=body, headers=headers, method="POST")
+        try:
+            with urlreq.urlopen(req):
+                return 200
+        except HTTPError as e:
+            return e.code
+
+    job = b'{"path": "a.wav", "model": {"model_name": "m", "device": "cpu", "compute_type": "int8"}, "kwargs": %s}'
+    auth = {"Authorization": "Bearer s3cret", "Content-Type": "application/json"}
+    try:
+        assert post(job % b'{}', **{**auth, "Authorization": "Bearer nope"}) == 401
+        assert post(job % b'{}', **{**auth, "Content-Type": "text/plain"}) == 415
+        assert post(job % b'{"checkpoint": "/etc/cron.d/x"}', **auth) == 400
+        assert post(job % b'{"preset": "short"}', **auth) == 200 and seen == [{"model_name": "m", "device": "cpu", "compute_type": "int8"}]
+        remote = RemoteASR(Settings(server_token="s3cret"), "127.0.0.1", port)
+        out = remote.transcribe_path(tmp_path / "a.wav", preset="short", checkpoint=tmp_path / "ck.jsonl")
+        assert out["preset_used"] == "short" and not (tmp_path / "ck.jsonl").exists()
+        with pytest.raises(RuntimeError, match="token"):
+            RemoteASR(Settings(server_token=None), "127.0.0.1", port).transcribe_path(tmp_path / "a.wav")
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+    with pytest.raises(ValueError, match="without a token"):
+        serve(Settings(server_token=None), "0.0.0.0", 0, preload=False)
@@ -0,0 +1,101 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+from sttfast import shards
+from sttfast.db import open_db, insert_file, insert_segments, record_rtf
+from sttfast.search import search_phrase, search_fuzzy
+
+def _shard(tmp_path: Path, host: str, runs: range) -> Path:
+    fp = tmp_path / "shards" / f"{host}.sqlite"
+    con = open_db(fp)
+    for r in runs:
+        run = tmp_path / f"Run{r}"
+        fid = insert_file(con, run / "a.mp3", run, 30.0, "en")
+        insert_segments(con, fid, [{"start": 10.0 * i, "end": 10.0 * i + 5, "text": f"budget review {host} {i}" + " budget" * i,
+                                    "sentiment": "neutral", "tones": []} for i in range(3)])
+    record_rtf(con, "standard", "tiny", "int8", "cpu", 30.0, 3.0)
+    con.commit()
+    con.close()
+    return fp
+
+def test_merge_is_idempotent_and_indexes_both_fts(tmp_path: Path):
+    a, b = _shard(tmp_path, "hostA", range(0, 2)), _shard(tmp_path, "hostB", range(2, 4))
+    central = open_db(tmp_path / "central.sqlite")
+    assert shards.merge(central, a) == (2, 6) and shards.merge(central, b) == (2, 6)
+    assert shards.merge(central, a) == (2, 6)                       # again: replaced, not duplicated
+    assert central.execute("SELECT COUNT(*) FROM segments").fetchone()[0] == 12
+    assert central.execute("SELECT runs, audio_s FROM preset_stats").fetchall() == [(2, 60.0)]
+    assert len(list(search_phrase(central, "hostb", limit=None))) == 6
+    assert len(list(search_fuzzy(central, "hostt", limit=None))) == 12
+    for t in ("seg_fts", "seg_tri"):
+        central.execute(f"INSERT INTO {t}({t}) VALUES ('integrity-check')")
+    shards.remove(a)
+    assert shards.find_shards([tmp_path / "shards"]) == [b]
+
+def test_merging_the_same_shard_twice_in_a_row(tmp_path: Path):
+    fp = _shard(tmp_path, "hostA", range(1))
+    central = open_db(tmp_path / "central.sqlite")
+    for _ in range(2):
+        assert shards.merge(central, fp) == (1, 3)
+        assert len(list(search_phrase(central, "hosta", limit=None))) == 3
+        assert len(list(search_fuzzy(central, "hosta", limit=None))) == 3
+    assert central.execute("SELECT runs FROM preset_stats").fetchall() == [(1,)]
+    for t in ("seg_fts", "seg_tri"):
+        central.execute(f"INSERT INTO {t}({t}) VALUES ('integrity-check')")
+
+def test_fan_out_matches_merged_store(tmp_path: Path):
+    fps = [_shard(tmp_path, f"host{n}", range(2 * n, 2 * n + 2)) for n in range(3)]
+    central = open_db(tmp_path / "central.sqlite")
+    for fp in fps:
+        shards.merge(central, fp)
+    by_time = list(search_phrase(central, "budget", limit=None, order="time"))
+    fanned = shards.search(fps, "budget", limit=None, order="time")
+    assert [(h["file"], h["start"]) for h in fanned] == [(h["file"], h["start"]) for h in by_time]
+    page = shards.search(fps, "budget", limit=5, offset=5, order="time")
+    assert [(h["file"], h["start"]) for h in page] == [(h["file"], h["start"]) for h in by_time[5:10]]
+    ranked = shards.search(fps, "budget", limit=None)
+    assert [h["rank"] for h in ranked] == sorted(h["rank"] for h in ranked) and len(ranked) == 18
+    fuzzy = shards.search(fps, "budgit", fuzzy=True, edits=1, limit=4, run="Run3")
+    assert {h["shard"] for h in fuzzy} == {str(fps[1])} and len(fuzzy) == 3
+
+def _at_version(fp: Path, version: int):
+    """A store built by a release that stopped at schema `version`."""
+    from sttfast.db import MIGRATIONS, _statements
+    con = sqlite3.connect(fp)
+    for script in MIGRATIONS[:version]:
+        for stmt in _statements(script):
+            con.execute(stmt)
+    con.execute("CREATE TABLE IF NOT EXISTS schema_version(version INTEGER NOT NULL)")
+    con.execute("DELETE FROM schema_version")
+    con.execute("INSERT INTO schema_version(version) VALUES (?)", (version,))
+    return con
+
+def _version(fp: Path) -> int:
+    con = sqlite3.connect(f"{fp.as_uri()}?mode=ro", uri=True)
+    try:
+        return con.execute("SELECT version FROM schema_version").fetchone()[0]
+    finally:
+        con.close()
+
+def test_search_leaves_shards_untouched_and_merge_reads_old_ones(tmp_path: Path):
+    fp = _shard(tmp_path, "hostA", range(1))
+    before = fp.read_bytes()
+    assert len(shards.search([fp], "budget", limit=None)) == 3
+    assert fp.read_bytes() == before and not any(w.stat().st_size for w in fp.parent.glob("*-wal"))
+
+    old = tmp_path / "shards" / "old.sqlite"
+    con = _at_version(old, 4)                   # before words, analyzer and per-mode stats
+    fid = insert_file(con, tmp_path / "Old" / "a.mp3", tmp_path / "Old", 9.0, "en")
+    con.execute('INSERT INTO segments(file_id,start,"end",text,sentiment,tones) VALUES (?,0,5,"budget old","neutral","")', (fid,))
+    con.execute("INSERT INTO preset_stats(preset, model, compute_type, device, audio_s, decode_s, runs) "
+                "VALUES ('short','tiny','int8','cpu',9.0,1.0,1)")
+    con.commit()
+    con.close()
+    with pytest.raises(ValueError, match="schema version 4"):  # read-only: not upgraded to be searched
+        shards.search([old], "budget")
+    central = open_db(tmp_path / "central.sqlite")
+    assert shards.merge(central, old) == (1, 1)
+    assert central.execute("SELECT mode, runs FROM preset_stats").fetchall() == [("sequential", 1)]
+    assert [h["text"] for h in search_phrase(central, "budget", limit=None)] == ["budget old"]
+    assert _version(old) == 4                   # only the merge target is migrated
@@ -0,0 +1,29 @@
+import os, re, subprocess, sys
+
+import pytest
+
+# Modules `sttfast find --help` must not load: they belong to decoding, sentiment or analytics.
+HEAVY = {"faster_whisper", "ctranslate2", "av", "numpy", "vaderSentiment", "pydantic", "torch"}
+# import-time budget: generous by default (about 4x the ~200 ms it takes on an idle machine, so
+# a loaded CI box still passes); tighten it on a dedicated perf job, or set 0 to skip the check
+BUDGET_MS = float(os.environ.get("STTFAST_STARTUP_BUDGET_MS", "800"))
+LINE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|( +)(\S+)")
+
+def test_find_help_skips_heavy_imports_and_fits_budget():
+    runs = []
+    for _ in range(3 if BUDGET_MS else 1):  # best of three: the first run may still be compiling .pyc files
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                               "from sttfast.cli import app; app(['find', '--help'])"], capture_output=True, text=True)
+        assert proc.returncode == 0, proc.stderr[-2000:]
+        names, total = set(), 0
+        for line in proc.stderr.splitlines():
+            m = LINE.match(line)
+            if m:
+                names.add(m.group(3).split(".")[0])
+                if len(m.group(2)) == 1 and m.group(3) != "site":     # site/.pth cost is not ours
+                    total += int(m.group(1))
+        runs.append(total / 1000)
+    assert not names & HEAVY, sorted(names & HEAVY)
+    if not BUDGET_MS:
+        pytest.skip(f"import-time budget disabled (STTFAST_STARTUP_BUDGET_MS=0); took {runs[0]:.0f} ms")
+    assert min(runs) <= BUDGET_MS, f"find --help imports took {min(runs):.0f} ms (budget {BUDGET_MS:.0f} ms)"
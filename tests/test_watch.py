@@ -0,0 +1,106 @@
+import threading, time
+from pathlib import Path
+
+from sttfast.watch import DirWatcher
+
+def _probe(paths):
+    return {p: {"duration": float(p.stem.split("_")[-1]), "has_audio": True} for p in paths}
+
+def _watcher(root, **kw):
+    return DirWatcher(root, {".wav"}, _probe, settle_s=0.2, poll_s=0.02, use_events=False, **kw).start()
+
+def test_settled_files_come_out_shortest_first(tmp_path: Path):
+    for name in ("long_90.wav", "short_3.wav", "mid_20.wav", "notes_1.txt"):
+        (tmp_path / name).write_bytes(b"x" * 10)
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "tiny_1.wav").write_bytes(b"x")
+    w = _watcher(tmp_path)
+    try:
+        it = w.ready()
+        got = [next(it) for _ in range(4)]
+    finally:
+        w.stop()
+    assert [p.name for p, _ in got] == ["tiny_1.wav", "short_3.wav", "mid_20.wav", "long_90.wav"]
+    assert got[0][1]["duration"] == 1.0
+    assert list(it) == []               # stopped: the iterator ends
+
+def test_growing_file_waits_until_written(tmp_path: Path):
+    out = tmp_path / "out"
+    out.mkdir()
+    (out / "ignored_1.wav").write_bytes(b"x")       # output tree under the watched folder
+    (tmp_path / "old_5.wav").write_bytes(b"x")
+    w = _watcher(tmp_path, existing=False, ignore=[out])
+    f = tmp_path / "rec_60.wav"
+    last = [0.0]
+
+    def record():
+        with f.open("ab") as fh:
+            for _ in range(8):
+                fh.write(b"y" * 100)
+                fh.flush()
+                last[0] = time.monotonic()
+                time.sleep(0.06)
+
+    t = threading.Thread(target=record)
+    t.start()
+    try:
+        p, _ = next(w.ready())
+        released = time.monotonic()
+    finally:
+        t.join()
+        w.stop()
+    assert p == f and f.stat().st_size == 800
+    assert released - last[0] >= 0.2
+
+class FlakyASR:
+    """Streams one segment per file; files named bad_* crash after it."""
+    def stream_path(self, path, audio=None, **kw):
+        def segs():
+            yield {"start": 0.0, "end": 1.0, "text": f"hello from {path.stem}"}
+            if path.stem.startswith("bad"):
+                raise RuntimeError("decoder crashed")
+        return {"language": "en", "duration": 1.0, "preset_used": kw["preset"]}, segs()
+
+def _watch_run(tmp_path: Path, monkeypatch, names):
+    """Feed `names` (saved into one folder, in order) through _run_batch as watch arrivals."""
+    from sttfast import cli
+    from sttfast.manifest import Manifest
+    monkeypatch.setattr(cli, "_load_asr", lambda **_: FlakyASR())
+    monkeypatch.setattr(cli.S, "stream_chunk", 1)           # a bad file's first segment gets indexed
+    src = tmp_path / "in"
+    src.mkdir()
+
+    def arrivals():
+        for name in names:
+            (src / name).write_bytes(b"x")
+            yield src / name, {"duration": 1.0, "has_audio": True}
+    run = tmp_path / "run"
+    run.mkdir()
+    opts = dict(copy=True, mode="short", language="en", long_beam=1, long_best_of=1, workers=1, devices=None,
+                batch_size=0, no_cache=True, db=str(tmp_path / "t.sqlite"))
+    cli._run_batch(run, Manifest.create(run, opts, []), feed=arrivals())
+    return run, Manifest(run)
+
+def test_failed_arrival_is_skipped_and_later_ones_still_transcribed(tmp_path: Path, monkeypatch):
+    from sttfast.db import open_db
+    run, manifest = _watch_run(tmp_path, monkeypatch, ["bad_1.wav", "good_2.wav"])
+    states = {Path(s).name: e for s, e in manifest.files.items()}
+    assert "indexed" in states["good_2.wav"]["states"]
+    assert "indexed" not in states["bad_1.wav"]["states"] and "decoder crashed" in states["bad_1.wav"]["error"]
+    con = open_db(tmp_path / "t.sqlite")
+    assert [r[0] for r in con.execute("SELECT text FROM segments")] == ["hello from good_2"]
+    assert [Path(r[0]).name for r in con.execute("SELECT path FROM files")] == ["good_2.wav"]
+    assert {p.stem for p in (run / "transcripts").iterdir() if p.is_file()} == {"good_2"}
+
+def test_same_filename_arriving_twice_is_its_own_job(tmp_path: Path, monkeypatch):
+    from sttfast.db import open_db
+    run, manifest = _watch_run(tmp_path, monkeypatch, ["clip.wav", "clip.wav"])
+    entries = list(manifest.files.values())
+    assert [Path(e["key"]).name for e in entries] == ["clip.wav", "clip.wav#2"]
+    assert {e["src"] for e in entries} == {str(tmp_path / "in" / "clip.wav")}
+    assert [Path(e["placed"]).name for e in entries] == ["clip.wav", "clip_2.wav"]
+    assert all(set(e["states"]) == {"placed", "decoded", "analyzed", "indexed"} for e in entries)
+    assert manifest.pending() == []
+    con = open_db(tmp_path / "t.sqlite")
+    assert sorted(Path(r[0]).name for r in con.execute("SELECT path FROM files")) == ["clip.wav", "clip_2.wav"]
+    assert con.execute("SELECT preset, mode, runs FROM preset_stats").fetchall() == [("short", "sequential", 2)]
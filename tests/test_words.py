@@ -0,0 +1,26 @@
+from pathlib import Path
+
+from sttfast.db import open_db, insert_file, insert_segments
+from sttfast.search import search_phrase, iter_segments
+from sttfast.words import pack, unpack, word_at
+
+SEG = {"start": 100.0, "end": 106.0, "text": "So, the budget meeting moved again.",
+       "words": [[100.0, 100.3, "So,"], [100.4, 100.6, "the"], [100.6, 101.2, "budget"],
+                 [101.3, 101.9, "meeting"], [102.0, 102.4, "moved"], [102.5, 105.8, "again."]]}
+
+def test_pack_roundtrip_is_compact():
+    blob = pack(SEG)
+    assert len(blob) == 6 * len(SEG["words"])
+    assert unpack(blob, SEG["text"], SEG["start"]) == SEG["words"]
+    assert word_at(blob, SEG["start"], SEG["text"].index("meeting") + 2) == 101.3
+    assert pack({"start": 0.0, "end": 1.0, "text": "x"}) is None and word_at(None, 0.0, 0) is None
+
+def test_search_seeks_to_the_matched_word(tmp_path: Path):
+    con = open_db(tmp_path / "t.sqlite")
+    fid = insert_file(con, tmp_path / "a.wav", tmp_path, 200.0, "en")
+    insert_segments(con, fid, [SEG, {"start": 0.0, "end": 5.0, "text": "an untimed meeting"}])
+    hits = {h["start"]: h for h in search_phrase(con, '"meeting moved"', limit=None)}
+    assert hits[100.0]["seek"] == 101.3
+    assert {h["start"]: h["seek"] for h in search_phrase(con, "meeting", limit=None)} == {100.0: 101.3, 0.0: 0.0}
+    rows = list(iter_segments(con, file_ids=[fid]))
+    assert "words" not in rows[0] and rows[1]["words"] == SEG["words"]
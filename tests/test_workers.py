@@ -0,0 +1,13 @@
+from sttfast.workers import parse_devices, longest_first, cpu_threads_for
+
+def test_parse_devices_spec():
+    assert parse_devices("cuda:0, cuda:1,cpu", 1, "cuda") == [("cuda", 0), ("cuda", 1), ("cpu", 0)]
+
+def test_parse_devices_cpu_workers():
+    devs = parse_devices(None, 4, "cpu")
+    assert devs == [("cpu", 0)] * 4
+    assert cpu_threads_for(devs) >= 1
+
+def test_longest_first_puts_unknown_first():
+    durs = {"a": 5.0, "b": None, "c": 120.0, "d": 30.0}
+    assert longest_first(durs, durs.get) == ["b", "c", "d", "a"]